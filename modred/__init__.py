@@ -11,7 +11,7 @@ from ._version import __version__
 # confusion.
 
 from .pod import (
-    PODHandles,
+    PODHandles, IncrementalPODArrays,
     compute_POD_arrays_direct_method, compute_POD_arrays_snaps_method
 )
 
@@ -41,8 +41,9 @@ from .vectorspace import VectorSpaceHandles, VectorSpaceArrays
 
 from .vectors import (
     Vector, VecHandle,
-    VecHandlePickle, VecHandleInMemory, VecHandleArrayText,
-    InnerProductTrapz, inner_product_array_uniform
+    VecHandlePickle, VecHandleInMemory, VecHandleArrayText, VecHandleNpy,
+    VecHandleNpyColumn, create_npy_column_file, add_scaled, scale_in_place,
+    InnerProductTrapz, InnerProductBlockArrays, inner_product_array_uniform
 )
 
 from . import parallel
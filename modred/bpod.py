@@ -165,6 +165,11 @@ class BPODHandles(object):
 
         ``verbosity``: 1 prints progress and warnings, 0 prints almost nothing.
 
+        ``vec_space_kwargs``: Dictionary of further keyword arguments for
+        :py:class:`vectorspace.VectorSpaceHandles`, e.g.,
+        ``block_inner_product``, ``prefetch_depth``, ``IP_cache_path``, or
+        ``checkpoint_dir``.
+
     Computes direct and adjoint BPOD modes from direct and adjoint vector
     objects (or handles).  Uses :py:class:`vectorspace.VectorSpaceHandles` for
     low level functions.
@@ -180,7 +185,8 @@ class BPODHandles(object):
     """
     def __init__(
         self, inner_product=None, put_array=util.save_array_text,
-        get_array=util.load_array_text,max_vecs_per_node=None, verbosity=1):
+        get_array=util.load_array_text,max_vecs_per_node=None, verbosity=1,
+        vec_space_kwargs=None):
         """Constructor """
         self.get_array = get_array
         self.put_array = put_array
@@ -192,7 +198,7 @@ class BPODHandles(object):
         # Class that contains all of the low-level vec operations
         self.vec_space = VectorSpaceHandles(
             inner_product=inner_product, max_vecs_per_node=max_vecs_per_node,
-            verbosity=verbosity)
+            verbosity=verbosity, **(vec_space_kwargs or {}))
         self.direct_vec_handles = None
         self.adjoint_vec_handles = None
 
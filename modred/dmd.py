@@ -235,7 +235,8 @@ def compute_DMD_arrays_snaps_method(
 
 def compute_DMD_arrays_direct_method(
     vecs, adv_vecs=None, mode_indices=None, inner_product_weights=None,
-    atol=1e-13, rtol=None, max_num_eigvals=None):
+    atol=1e-13, rtol=None, max_num_eigvals=None, svd_method='exact',
+    seed=None):
     """Computes DMD modes using data stored in arrays, using direct method.
 
     Args:
@@ -267,6 +268,12 @@ def compute_DMD_arrays_direct_method(
         array. If set to None, no truncation will be performed, and the
         maximum possible number of DMD eigenvalues will be computed.
 
+        ``svd_method``: ``'exact'`` or ``'randomized'``.  The randomized SVD
+        requires ``max_num_eigvals`` and is much faster when it is small
+        compared to the dimensions of the data.  See :py:func:`util.svd`.
+
+        ``seed``: Seed for the randomized SVD, for reproducible results.
+
     Returns:
         ``res``: Results of DMD computation, stored in a namedtuple with
         the following attributes:
@@ -355,7 +362,8 @@ def compute_DMD_arrays_direct_method(
     # and advanced vectors overlap.
     if adv_vecs is None:
         U, sing_vals, correlation_array_eigvecs = util.svd(
-            vecs_weighted[:, :-1], atol=atol, rtol=rtol)
+            vecs_weighted[:, :-1], atol=atol, rtol=rtol,
+            num_modes=max_num_eigvals, method=svd_method, seed=seed)
 
         # Truncate if necessary
         if max_num_eigvals is not None and (
@@ -383,7 +391,8 @@ def compute_DMD_arrays_direct_method(
         if vecs.shape != adv_vecs.shape:
             raise ValueError(('vecs and adv_vecs are not the same shape.'))
         U, sing_vals, correlation_array_eigvecs = util.svd(
-            vecs_weighted, atol=atol, rtol=rtol)
+            vecs_weighted, atol=atol, rtol=rtol, num_modes=max_num_eigvals,
+            method=svd_method, seed=seed)
 
         # Truncate if necessary
         if max_num_eigvals is not None and (
@@ -499,6 +508,16 @@ class DMDHandles(object):
 
         ``verbosity``: 1 prints progress and warnings, 0 prints almost nothing.
 
+        ``distributed_eigh``: If True, eigendecompositions of correlation
+        arrays truncated with ``max_num_eigvals`` are computed cooperatively by
+        all MPI workers using :py:func:`parallel.distributed_eigh`, rather
+        than by rank zero alone.
+
+        ``vec_space_kwargs``: Dictionary of further keyword arguments for
+        :py:class:`vectorspace.VectorSpaceHandles`, e.g.,
+        ``block_inner_product``, ``prefetch_depth``, ``IP_cache_path``, or
+        ``checkpoint_dir``.
+
     Computes DMD modes from vector objects (or handles).  It uses
     :py:class:`vectorspace.VectorSpaceHandles` for low level functions.
 
@@ -513,14 +532,17 @@ class DMDHandles(object):
     """
     def __init__(
         self, inner_product=None, get_array=util.load_array_text,
-        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1):
+        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1,
+        distributed_eigh=False, vec_space_kwargs=None):
         """Constructor"""
         self.get_array = get_array
         self.put_array = put_array
         self.verbosity = verbosity
+        self.distributed_eigh = distributed_eigh
         self.eigvals = None
         self.correlation_array = None
         self.cross_correlation_array = None
+        self.expanded_correlation_array = None
         self.correlation_array_eigvals = None
         self.correlation_array_eigvecs = None
         self.low_order_linear_map = None
@@ -529,9 +551,10 @@ class DMDHandles(object):
         self.spectral_coeffs = None
         self.proj_coeffs = None
         self.adv_proj_coeffs = None
+        self.proj_vec_coeffs = None
         self.vec_space = VectorSpaceHandles(
             inner_product=inner_product, max_vecs_per_node=max_vecs_per_node,
-            verbosity=verbosity)
+            verbosity=verbosity, **(vec_space_kwargs or {}))
         self.vec_handles = None
         self.adv_vec_handles = None
 
@@ -721,6 +744,20 @@ class DMDHandles(object):
         self.vec_space.sanity_check(test_vec_handle)
 
 
+    def _correlation_eigh(self, correlation_array, atol, max_num_eigvals):
+        """Computes eigendecomposition of a correlation array, either on rank
+        zero or distributed among all MPI workers."""
+        if self.distributed_eigh and max_num_eigvals is not None:
+            start, end = parallel.get_row_block_bounds(
+                correlation_array.shape[0])
+            return parallel.distributed_eigh(
+                correlation_array[start:end], max_num_eigvals, atol=atol,
+                rtol=None, is_positive_definite=True)
+        return parallel.call_and_bcast(
+            util.eigh, correlation_array, atol=atol, rtol=None,
+            is_positive_definite=True, num_eigvals=max_num_eigvals)
+
+
     def compute_eigendecomp(self, atol=1e-13, rtol=None, max_num_eigvals=None):
         """Computes eigendecompositions of correlation array and approximating
         low-order linear map.
@@ -782,9 +819,8 @@ class DMDHandles(object):
         """
         # Compute eigendecomposition of correlation array
         self.correlation_array_eigvals, self.correlation_array_eigvecs =\
-            parallel.call_and_bcast(
-            util.eigh, self.correlation_array, atol=atol, rtol=None,
-            is_positive_definite=True)
+            self._correlation_eigh(
+                self.correlation_array, atol, max_num_eigvals)
 
         # Truncate if necessary
         if max_num_eigvals is not None and (
@@ -855,6 +891,25 @@ class DMDHandles(object):
             ``correlation_array_eigvecs``: Array whose columns are eigenvectors
             of correlation array.
         """
+        self._set_vec_handles(vec_handles, adv_vec_handles)
+        self._compute_correlation_arrays(adv_vec_handles)
+
+        # Compute eigendecomposition of low-order linear map.
+        self.compute_eigendecomp(
+            atol=atol, rtol=rtol, max_num_eigvals=max_num_eigvals)
+
+        # Return values
+        return (
+            self.eigvals,
+            self.R_low_order_eigvecs,
+            self.L_low_order_eigvecs,
+            self.correlation_array_eigvals,
+            self.correlation_array_eigvecs)
+
+
+    def _set_vec_handles(self, vec_handles, adv_vec_handles):
+        """Sets the handles for the vector objects and, if given, for the
+        vector objects advanced in time."""
         self.vec_handles = vec_handles
         if adv_vec_handles is not None:
             self.adv_vec_handles = adv_vec_handles
@@ -862,30 +917,230 @@ class DMDHandles(object):
                 raise ValueError(('Number of vec_handles and adv_vec_handles'
                     ' is not equal.'))
 
+
+    def _compute_correlation_arrays(
+        self, adv_vec_handles, proj_vec_handles=None,
+        adv_correlation=False):
+        """Computes the correlation and cross-correlation arrays, and returns
+        the array of inner products of the (unadvanced) vector objects with
+        the vector objects in ``proj_vec_handles``.  If ``adv_correlation`` is
+        True, also returns the correlation array of the advanced vector
+        objects."""
+        if proj_vec_handles is None:
+            proj_vec_handles = []
+
         # For a sequential dataset, compute correlation array for all vectors.
         # This is more efficient because only one call is made to the inner
         # product routine, even though we don't need the last row/column yet.
         # Later we need all but the last element of the last column, so it is
         # faster to compute all of this now.  Only one extra element is
         # computed, since this is a symmetric inner product array.  Then
-        # slice the expanded correlation array accordingly.
+        # slice the expanded correlation array accordingly.  The inner
+        # products with the vector objects to project are computed in the same
+        # pass.
         if adv_vec_handles is None:
+            self.expanded_correlation_array, proj_IP_array =\
+                self.vec_space.compute_inner_product_arrays(
+                    [self.vec_handles, proj_vec_handles], [(0, 0), (0, 1)])
+            self.correlation_array = self.expanded_correlation_array[:-1, :-1]
+            self.cross_correlation_array = self.expanded_correlation_array[
+                :-1, 1:]
+            proj_IP_array = proj_IP_array[:-1]
+            if adv_correlation:
+                return (
+                    proj_IP_array, self.expanded_correlation_array[1:, 1:])
+            return proj_IP_array
+
+        # For non-sequential data, compute the correlation and
+        # cross-correlation arrays (and the inner products with the vector
+        # objects to project) in one pass, so that each chunk of unadvanced
+        # vector objects is retrieved once and used for all of them.
+        index_pairs = [(0, 0), (0, 1), (0, 2)]
+        if adv_correlation:
+            index_pairs.append((1, 1))
+        IP_arrays = self.vec_space.compute_inner_product_arrays(
+            [self.vec_handles, self.adv_vec_handles, proj_vec_handles],
+            index_pairs)
+        self.correlation_array = IP_arrays[0]
+        self.cross_correlation_array = IP_arrays[1]
+        if adv_correlation:
+            return IP_arrays[2], IP_arrays[3]
+        return IP_arrays[2]
+
+
+    def compute_decomp_and_modes(
+        self, vec_handles, mode_indices, mode_handles, adv_vec_handles=None,
+        proj_vec_handles=None, mode_type='exact', atol=1e-13, rtol=None,
+        max_num_eigvals=None):
+        """Computes the decomposition, DMD modes, and the projections of other
+        vector objects onto the modes, with as few passes over the vector
+        objects as possible.
+
+        Args:
+            ``vec_handles``: List of handles for vector objects.
+
+            ``mode_indices``: List of indices describing which modes to
+            compute, e.g. ``range(10)`` or ``[3, 0, 5]``.
+
+            ``mode_handles``: List of handles for modes to compute.
+
+        Kwargs:
+            ``adv_vec_handles``: List of handles for vector objects advanced in
+            time.  See :py:meth:`compute_decomp`.
+
+            ``proj_vec_handles``: List of handles for vector objects to
+            project onto the DMD modes.
+
+            ``mode_type``: Which modes to compute: ``'exact'``, ``'proj'``
+            (projected), or ``'adjoint'``.
+
+            ``atol``: Level below which DMD eigenvalues are truncated.
+
+            ``rtol``: Maximum relative difference between largest and smallest
+            DMD eigenvalues.  Smaller ones are truncated.
+
+            ``max_num_eigvals``: Maximum number of DMD eigenvalues that will be
+            computed.  See :py:meth:`compute_decomp`.
+
+        Returns:
+            ``eigvals``: 1D array of eigenvalues of low-order linear map, i.e.,
+            the DMD eigenvalues.
+
+            ``R_low_order_eigvecs``: Array whose columns are right
+            eigenvectors of approximating low-order linear map.
+
+            ``L_low_order_eigvecs``: Array whose columns are left eigenvectors
+            of approximating low-order linear map.
+
+            ``proj_vec_coeffs``: Array of projection coefficients for the
+            vector objects in ``proj_vec_handles``, expressed as a linear
+            combination of DMD modes (as in :py:meth:`compute_proj_coeffs`).
+            Columns correspond to vector objects, rows correspond to DMD modes.
+            None if ``proj_vec_handles`` is not given.
+
+        This is equivalent to calling :py:meth:`compute_decomp` and one of the
+        methods that compute modes, then projecting the vector objects in
+        ``proj_vec_handles`` onto the modes.  However, the inner products of
+        the vector objects with those to project are computed together with
+        the correlation array, while each vector object is in memory.  The
+        projection coefficients follow from these, without retrieving the
+        modes.  The other arrays of the decomposition are attributes, as after
+        :py:meth:`compute_decomp`.
+        """
+        if mode_type not in ['exact', 'proj', 'adjoint']:
+            raise ValueError('mode_type must be "exact", "proj" or "adjoint"')
+        if proj_vec_handles is None:
+            proj_vec_handles = []
+        proj_vec_handles = list(util.make_iterable(proj_vec_handles))
+        self._set_vec_handles(vec_handles, adv_vec_handles)
+        proj_IP_array = self._compute_correlation_arrays(
+            adv_vec_handles, proj_vec_handles)
+        self.compute_eigendecomp(
+            atol=atol, rtol=rtol, max_num_eigvals=max_num_eigvals)
+
+        if mode_type == 'exact':
+            self.compute_exact_modes(mode_indices, mode_handles)
+        elif mode_type == 'proj':
+            self.compute_proj_modes(mode_indices, mode_handles)
+        else:
+            self.compute_adjoint_modes(mode_indices, mode_handles)
+
+        self.proj_vec_coeffs = None
+        if len(proj_vec_handles) > 0:
+            self.proj_vec_coeffs = self._compute_proj_vec_coeffs(proj_IP_array)
+        return (
+            self.eigvals,
+            self.R_low_order_eigvecs,
+            self.L_low_order_eigvecs,
+            self.proj_vec_coeffs)
+
+
+    def _compute_proj_vec_coeffs(self, proj_IP_array):
+        """Computes the projection coefficients of vector objects onto the DMD
+        modes from their inner products with the (unadvanced) vector objects,
+        as for ``adv_proj_coeffs`` in :py:meth:`compute_proj_coeffs`."""
+        return self.L_low_order_eigvecs.conj().T.dot(
+            np.diag(self.correlation_array_eigvals ** -0.5).dot(
+                self.correlation_array_eigvecs.conj().T.dot(proj_IP_array)))
+
+
+    def _extend_correlation_arrays(self, new_vec_handles, new_adv_vec_handles):
+        """Appends rows and columns for new vector objects to the correlation
+        and cross-correlation arrays, and appends the new handles."""
+        if new_adv_vec_handles is None:
+            if self.adv_vec_handles is not None:
+                raise ValueError(
+                    'new_adv_vec_handles must be given for a non-sequential '
+                    'dataset.')
             self.expanded_correlation_array =\
-                self.vec_space.compute_symm_inner_product_array(
-                self.vec_handles)
+                self.vec_space.extend_symm_inner_product_array(
+                    self.expanded_correlation_array, self.vec_handles,
+                    new_vec_handles)
             self.correlation_array = self.expanded_correlation_array[:-1, :-1]
             self.cross_correlation_array = self.expanded_correlation_array[
                 :-1, 1:]
-        # For non-sequential data, compute the correlation array from the
-        # unadvanced snapshots only.  Compute the cross correlation array
-        # involving the unadvanced and advanced snapshots separately.
         else:
+            if self.adv_vec_handles is None:
+                raise ValueError(
+                    'new_adv_vec_handles cannot be given for a sequential '
+                    'dataset.')
+            if len(new_vec_handles) != len(new_adv_vec_handles):
+                raise ValueError(('Number of new_vec_handles and '
+                    'new_adv_vec_handles is not equal.'))
             self.correlation_array =\
-                self.vec_space.compute_symm_inner_product_array(
-                    self.vec_handles)
+                self.vec_space.extend_symm_inner_product_array(
+                    self.correlation_array, self.vec_handles, new_vec_handles)
             self.cross_correlation_array =\
-                self.vec_space.compute_inner_product_array(
-                self.vec_handles, self.adv_vec_handles)
+                self.vec_space.extend_inner_product_array(
+                    self.cross_correlation_array, self.vec_handles,
+                    self.adv_vec_handles, new_row_vec_handles=new_vec_handles,
+                    new_col_vec_handles=new_adv_vec_handles)
+            self.adv_vec_handles = (
+                list(self.adv_vec_handles) + new_adv_vec_handles)
+        self.vec_handles = list(self.vec_handles) + new_vec_handles
+
+
+    def update_decomp(
+        self, new_vec_handles, new_adv_vec_handles=None, atol=1e-13,
+        rtol=None, max_num_eigvals=None):
+        """Appends vector objects to the dataset, updating the correlation
+        arrays and recomputing the eigendecomposition of the low-order linear
+        map.
+
+        Args:
+            ``new_vec_handles``: List of handles for vector objects to append.
+
+        Kwargs:
+            ``new_adv_vec_handles``: List of handles for vector objects
+            advanced in time to append.  Must be given if and only if
+            ``adv_vec_handles`` was given to :py:meth:`compute_decomp`.  For a
+            sequential dataset, ``new_vec_handles`` simply continues the
+            time-series.
+
+            ``atol``: Level below which DMD eigenvalues are truncated.
+
+            ``rtol``: Maximum relative difference between largest and smallest
+            DMD eigenvalues.  Smaller ones are truncated.
+
+            ``max_num_eigvals``: Maximum number of DMD eigenvalues that will be
+            computed.  See :py:meth:`compute_decomp`.
+
+        Returns:
+            Same as :py:meth:`compute_decomp`.
+
+        Only the inner products involving the new vector objects are computed;
+        the existing correlation and cross-correlation arrays are reused.  If
+        no decomposition has been computed yet, this is equivalent to
+        :py:meth:`compute_decomp`.
+        """
+        new_vec_handles = list(util.make_iterable(new_vec_handles))
+        if new_adv_vec_handles is not None:
+            new_adv_vec_handles = list(util.make_iterable(new_adv_vec_handles))
+        if self.correlation_array is None or self.vec_handles is None:
+            return self.compute_decomp(
+                new_vec_handles, adv_vec_handles=new_adv_vec_handles,
+                atol=atol, rtol=rtol, max_num_eigvals=max_num_eigvals)
+        self._extend_correlation_arrays(new_vec_handles, new_adv_vec_handles)
 
         # Compute eigendecomposition of low-order linear map.
         self.compute_eigendecomp(
@@ -1627,6 +1882,16 @@ class TLSqrDMDHandles(DMDHandles):
 
         ``verbosity``: 1 prints progress and warnings, 0 prints almost nothing.
 
+        ``distributed_eigh``: If True, eigendecompositions of correlation
+        arrays truncated with ``max_num_eigvals`` are computed cooperatively by
+        all MPI workers using :py:func:`parallel.distributed_eigh`, rather
+        than by rank zero alone.
+
+        ``vec_space_kwargs``: Dictionary of further keyword arguments for
+        :py:class:`vectorspace.VectorSpaceHandles`, e.g.,
+        ``block_inner_product``, ``prefetch_depth``, ``IP_cache_path``, or
+        ``checkpoint_dir``.
+
     Computes Total-Least-Squares DMD modes from vector objects (or handles).
     It uses :py:class:`vectorspace.VectorSpaceHandles` for low level functions.
 
@@ -1664,14 +1929,17 @@ class TLSqrDMDHandles(DMDHandles):
     """
     def __init__(
         self, inner_product=None, get_array=util.load_array_text,
-        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1):
+        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1,
+        distributed_eigh=False, vec_space_kwargs=None):
         """Constructor"""
         self.get_array = get_array
         self.put_array = put_array
         self.verbosity = verbosity
+        self.distributed_eigh = distributed_eigh
         self.eigvals = None
         self.correlation_array = None
         self.cross_correlation_array = None
+        self.expanded_correlation_array = None
         self.adv_correlation_array = None
         self.sum_correlation_array = None
         self.sum_correlation_array_eigvals = None
@@ -1685,8 +1953,10 @@ class TLSqrDMDHandles(DMDHandles):
         self.spectral_coeffs = None
         self.proj_coeffs = None
         self.adv_proj_coeffs = None
+        self.proj_vec_coeffs = None
         self.vec_space = VectorSpaceHandles(inner_product=inner_product,
-            max_vecs_per_node=max_vecs_per_node, verbosity=verbosity)
+            max_vecs_per_node=max_vecs_per_node, verbosity=verbosity,
+            **(vec_space_kwargs or {}))
         self.vec_handles = None
         self.adv_vec_handles = None
 
@@ -1762,9 +2032,8 @@ class TLSqrDMDHandles(DMDHandles):
         self.sum_correlation_array = (
             self.correlation_array + self.adv_correlation_array)
         (self.sum_correlation_array_eigvals,
-        self.sum_correlation_array_eigvecs) = parallel.call_and_bcast(
-            util.eigh, self.sum_correlation_array,
-            atol=atol, rtol=None, is_positive_definite=True)
+        self.sum_correlation_array_eigvecs) = self._correlation_eigh(
+            self.sum_correlation_array, atol, max_num_eigvals)
 
         # Truncate if necessary
         if max_num_eigvals is not None and (
@@ -1781,9 +2050,8 @@ class TLSqrDMDHandles(DMDHandles):
                     self.sum_correlation_array_eigvecs.dot(
                         self.sum_correlation_array_eigvecs.conj().T))))
         (self.proj_correlation_array_eigvals,
-        self.proj_correlation_array_eigvecs) = parallel.call_and_bcast(
-            util.eigh, self.proj_correlation_array,
-            atol=atol, rtol=None, is_positive_definite=True)
+        self.proj_correlation_array_eigvecs) = self._correlation_eigh(
+            self.proj_correlation_array, atol, max_num_eigvals)
 
         # Truncate if necessary
         if max_num_eigvals is not None and (
@@ -1871,41 +2139,100 @@ class TLSqrDMDHandles(DMDHandles):
         for over-constrained datasets, but must be enforced by the user for
         under-constrined datasets.
         """
-        self.vec_handles = vec_handles
-        if adv_vec_handles is not None:
-            self.adv_vec_handles = adv_vec_handles
-            if len(self.vec_handles) != len(self.adv_vec_handles):
-                raise ValueError(('Number of vec_handles and adv_vec_handles'
-                    ' is not equal.'))
+        self._set_vec_handles(vec_handles, adv_vec_handles)
+        self._compute_correlation_arrays(adv_vec_handles)
 
-        # For a sequential dataset, compute correlation array for all vectors.
-        # This is more efficient because only one call is made to the inner
-        # product routine, even though we don't need the last row/column yet.
-        # Later we need all but the last element of the last column, so it is
-        # faster to compute all of this now.  Only one extra element is
-        # computed, since this is a symmetric inner product array.  Then
-        # slice the expanded correlation array accordingly.
-        if adv_vec_handles is None:
-            self.expanded_correlation_array =\
-                self.vec_space.compute_symm_inner_product_array(
-                    self.vec_handles)
-            self.correlation_array = self.expanded_correlation_array[:-1, :-1]
-            self.cross_correlation_array = self.expanded_correlation_array[
-                :-1, 1:]
-            self.adv_correlation_array = self.expanded_correlation_array[1:, 1:]
-        # For non-sequential data, compute the correlation array from the
-        # unadvanced snapshots only.  Compute the cross correlation array
-        # involving the unadvanced and advanced snapshots separately.
+        # Compute eigendecomposition of low-order linear map.
+        self.compute_eigendecomp(
+            atol=atol, rtol=rtol, max_num_eigvals=max_num_eigvals)
+
+        # Return values
+        return (
+            self.eigvals,
+            self.R_low_order_eigvecs,
+            self.L_low_order_eigvecs,
+            self.sum_correlation_array_eigvals,
+            self.sum_correlation_array_eigvecs,
+            self.proj_correlation_array_eigvals,
+            self.proj_correlation_array_eigvecs)
+
+
+    def _compute_correlation_arrays(
+        self, adv_vec_handles, proj_vec_handles=None):
+        """Computes the correlation, cross-correlation, and advanced
+        correlation arrays, and returns the array of inner products of the
+        (unadvanced) vector objects with the vector objects in
+        ``proj_vec_handles``.  All are computed in one pass over the vector
+        objects."""
+        proj_IP_array, self.adv_correlation_array =\
+            DMDHandles._compute_correlation_arrays(
+                self, adv_vec_handles, proj_vec_handles=proj_vec_handles,
+                adv_correlation=True)
+        return proj_IP_array
+
+
+    def _compute_proj_vec_coeffs(self, proj_IP_array):
+        """Computes the projection coefficients of vector objects onto the DMD
+        modes from their inner products with the (unadvanced) vector objects,
+        as for ``adv_proj_coeffs`` in :py:meth:`compute_proj_coeffs`."""
+        return self.L_low_order_eigvecs.conj().T.dot(
+            np.diag(self.proj_correlation_array_eigvals ** -0.5).dot(
+                self.proj_correlation_array_eigvecs.conj().T.dot(
+                    self.sum_correlation_array_eigvecs.dot(
+                        self.sum_correlation_array_eigvecs.conj().T.dot(
+                            proj_IP_array)))))
+
+
+    def _extend_correlation_arrays(self, new_vec_handles, new_adv_vec_handles):
+        """Appends rows and columns for new vector objects to the correlation,
+        cross-correlation, and advanced correlation arrays."""
+        old_adv_vec_handles = self.adv_vec_handles
+        DMDHandles._extend_correlation_arrays(
+            self, new_vec_handles, new_adv_vec_handles)
+        if new_adv_vec_handles is None:
+            self.adv_correlation_array = self.expanded_correlation_array[
+                1:, 1:]
         else:
-            self.correlation_array =\
-                self.vec_space.compute_symm_inner_product_array(
-                    self.vec_handles)
-            self.cross_correlation_array =\
-                self.vec_space.compute_inner_product_array(
-                self.vec_handles, self.adv_vec_handles)
             self.adv_correlation_array =\
-                self.vec_space.compute_symm_inner_product_array(
-                    self.adv_vec_handles)
+                self.vec_space.extend_symm_inner_product_array(
+                    self.adv_correlation_array, old_adv_vec_handles,
+                    new_adv_vec_handles)
+
+
+    def update_decomp(
+        self, new_vec_handles, new_adv_vec_handles=None, atol=1e-13,
+        rtol=None, max_num_eigvals=None):
+        """Appends vector objects to the dataset, updating the correlation
+        arrays and recomputing the eigendecomposition of the low-order linear
+        map.
+
+        Args:
+            ``new_vec_handles``: List of handles for vector objects to append.
+
+        Kwargs:
+            ``new_adv_vec_handles``: List of handles for vector objects
+            advanced in time to append.  Must be given if and only if
+            ``adv_vec_handles`` was given to :py:meth:`compute_decomp`.
+
+            ``atol``: Level below which DMD eigenvalues are truncated.
+
+            ``rtol``: Maximum relative difference between largest and smallest
+            DMD eigenvalues.  Smaller ones are truncated.
+
+            ``max_num_eigvals``: Maximum number of DMD eigenvalues that will be
+            computed.  See :py:meth:`compute_decomp`.
+
+        Returns:
+            Same as :py:meth:`compute_decomp`.
+        """
+        new_vec_handles = list(util.make_iterable(new_vec_handles))
+        if new_adv_vec_handles is not None:
+            new_adv_vec_handles = list(util.make_iterable(new_adv_vec_handles))
+        if self.correlation_array is None or self.vec_handles is None:
+            return self.compute_decomp(
+                new_vec_handles, adv_vec_handles=new_adv_vec_handles,
+                atol=atol, rtol=rtol, max_num_eigvals=max_num_eigvals)
+        self._extend_correlation_arrays(new_vec_handles, new_adv_vec_handles)
 
         # Compute eigendecomposition of low-order linear map.
         self.compute_eigendecomp(
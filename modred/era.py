@@ -161,7 +161,9 @@ class ERA(object):
         self.Markovs = None
 
 
-    def compute_model(self, Markovs, num_states, mc=None, mo=None):
+    def compute_model(
+        self, Markovs, num_states, mc=None, mo=None, svd_method='exact',
+        seed=None):
         """Computes the A, B, and C arrays of the linear time-invariant (LTI)
         reduced-order model (ROM).
 
@@ -178,6 +180,14 @@ class ERA(object):
             ``mo``: Number of Markov parameters for observable dimension of
             Hankel array.
 
+            ``svd_method``: ``'exact'`` or ``'randomized'``.  The randomized
+            SVD computes only the leading ``num_states`` singular values of the
+            Hankel array, which is much faster for large Hankel arrays.  In
+            that case ``sing_vals`` only holds those values.  See
+            :py:func:`util.svd`.
+
+            ``seed``: Seed for the randomized SVD, for reproducible results.
+
         Assembles the Hankel arrays from self.Markovs and computes a singular
         value decomposition. Uses the results to form the A, B, and C arrays.
 
@@ -195,7 +205,9 @@ class ERA(object):
 
         self._assemble_Hankel()
         self.L_sing_vecs, self.sing_vals, self.R_sing_vecs = util.svd(
-            self.Hankel_array)
+            self.Hankel_array, num_modes=(
+                num_states if svd_method == 'randomized' else None),
+            method=svd_method, seed=seed)
 
         # Truncate arrays
         Ur = self.L_sing_vecs[:, :num_states]
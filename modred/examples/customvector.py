@@ -27,11 +27,31 @@ class CustomVector(mr.Vector):
         return mult_vec
 
 
+    def __iadd__(self, other):
+        """Add other to self in place (optional)"""
+        self.data_array += other.data_array
+        return self
+
+
+    def __imul__(self, scalar):
+        """Multiply self by scalar in place (optional)"""
+        self.data_array *= scalar
+        return self
+
+
+    def axpy(self, scalar, other):
+        """Add ``other * scalar`` to self in place (optional)"""
+        self.data_array += scalar * other.data_array
+
+
     def inner_product(self, other):
         return self.weighted_ip(self.data_array, other.data_array)
 
 
 class CustomVecHandle(mr.VecHandle):
+    # Each call to _get reads a new vector object from file
+    get_returns_new_vec = True
+
     def __init__(self, vec_path, base_handle=None, scale=None):
         mr.VecHandle.__init__(self, base_handle, scale)
         self.vec_path = vec_path
@@ -4,7 +4,7 @@ import numpy as np
 from . import parallel
 from . import util
 from .py2to3 import range
-from .vectors import VecHandleInMemory
+from .vectors import VecHandleInMemory, scale_in_place
 from .vectorspace import VectorSpaceArrays, VectorSpaceHandles
 
 
@@ -48,7 +48,8 @@ def compute_derivs_handles(vec_handles, adv_vec_handles, deriv_vec_handles, dt):
     for i in vec_index_tasks:
         vec = vec_handles[i].get()
         vec_dt = adv_vec_handles[i].get()
-        deriv_vec_handles[i].put((1. / dt) * (vec_dt - vec))
+        # The difference is a new vector object, so scale it in place
+        deriv_vec_handles[i].put(scale_in_place(vec_dt - vec, 1. / dt))
     parallel.barrier()
 
 
@@ -1,16 +1,18 @@
 """Parallel class and functions for distributed memory"""
 import socket
 import codecs
+import pickle
 
 import numpy as np
+import scipy.linalg
 
+from . import util
 from .py2to3 import range
 
 
 # Check to see if MPI is available by importing MPI-related modules
 try:
     from mpi4py import MPI
-    from .reductions import Intracomm
     _MPI_avail = True
 except ImportError:
     _MPI_avail = False
@@ -26,16 +28,12 @@ _hostname = socket.gethostname()
 # of the host name).
 _node_ID = int(codecs.encode(_hostname.encode(), 'hex'), base=16)
 
-# If MPI is available, gather MPI data
-if _MPI_avail:
-
-    # Determine number of nodes
-    comm = MPI.COMM_WORLD
-    _num_nodes = len(set(comm.allgather(_node_ID)))
-
-    # Must use custom_comm for reduce commands! This is
-    # more scalable, see reductions.py for more details
-    custom_comm = Intracomm(comm)
+def _set_comm(new_comm):
+    """Sets the communicator of the processors/MPI workers among which the
+    work is divided."""
+    global comm, _num_MPI_workers, _rank, _is_distributed, _tag_ub
+    comm = new_comm
+    _tag_ub = comm.Get_attr(MPI.TAG_UB)
 
     # To adjust number of procs, use submission script/mpiexec
     _num_MPI_workers = comm.Get_size()
@@ -44,13 +42,33 @@ if _MPI_avail:
         _is_distributed = True
     else:
         _is_distributed = False
+
+
+# If MPI is available, gather MPI data
+if _MPI_avail:
+
+    # Determine number of nodes
+    world_comm = MPI.COMM_WORLD
+    _num_nodes = len(set(world_comm.allgather(_node_ID)))
+    _world_rank = world_comm.Get_rank()
+    _is_world_distributed = world_comm.Get_size() > 1
+
+    # Without groups (see init_groups), each MPI worker is a group of its own
+    group_comm = MPI.COMM_SELF
+    _set_comm(world_comm)
 else:
     _num_nodes = 1
     _num_MPI_workers = 1
     _rank = 0
+    _world_rank = 0
     _is_distributed = False
+    _is_world_distributed = False
+    world_comm = None
+    group_comm = None
     comm = None
-    custom_comm = None
+    _tag_ub = None
+_group_rank = 0
+_group_size = 1
 
 
 def get_hostname():
@@ -92,15 +110,103 @@ def is_distributed():
 
 
 def is_rank_zero():
-    """Returns True if rank is zero, False if not."""
-    return _rank == 0
+    """Returns True if rank is zero, False if not.  With groups, only the MPI
+    worker of rank zero in group zero is rank zero."""
+    return _rank == 0 and _group_rank == 0
+
+
+def get_world_rank():
+    """Returns rank of this MPI worker among all MPI workers."""
+    return _world_rank
+
+
+def get_group_rank():
+    """Returns rank of this MPI worker within its group (see
+    :py:func:`init_groups`)."""
+    return _group_rank
+
+
+def get_group_size():
+    """Returns number of MPI workers in each group (see
+    :py:func:`init_groups`)."""
+    return _group_size
+
+
+def init_groups(group_size):
+    """Divides the MPI workers into groups that each act as one processor.
+
+    Args:
+        ``group_size``: Number of MPI workers in each group.  It must divide
+        the number of MPI workers.
+
+    Groups are made of consecutive ranks.  Afterwards, the functions of this
+    module (and the modred classes that use them) treat each group as one
+    processor/MPI worker: :py:func:`get_rank` returns the index of the group
+    and :py:func:`get_num_procs` the number of groups.  The MPI workers of a
+    group perform the same tasks together, so a user vector object can be
+    distributed among them.  Each MPI worker holds its own part of each vector,
+    and vector handles must ``get`` and ``put`` these parts collectively within
+    the group.  Inner products computed from the parts are summed over the
+    group by :py:class:`vectorspace.VectorSpaceHandles` (see
+    :py:func:`group_allreduce`).  Vectors are passed between groups by the MPI
+    workers with the same rank in each group.
+
+    All MPI workers must call this together, before creating any modred
+    objects.  Since the gets of a group are collective, vectors cannot be
+    retrieved in a background thread, i.e., the ``prefetch_depth`` of
+    :py:class:`vectorspace.VectorSpaceHandles` must be 0.
+    """
+    global group_comm, _group_rank, _group_size
+    if not _MPI_avail:
+        if group_size != 1:
+            raise ValueError('Groups of MPI workers require mpi4py')
+        return
+    num_world_procs = world_comm.Get_size()
+    if group_size < 1 or num_world_procs % group_size != 0:
+        raise ValueError((
+            'Group size (%d) must divide the number of MPI workers (%d)') %
+            (group_size, num_world_procs))
+    _group_size = group_size
+    _group_rank = _world_rank % group_size
+    group_comm = world_comm.Split(
+        color=_world_rank // group_size, key=_world_rank)
+
+    # Workers with the same rank in their groups communicate with each other
+    _set_comm(world_comm.Split(color=_group_rank, key=_world_rank))
+
+
+def group_allreduce(vals, op=None):
+    """Reduces values over the MPI workers of a group (see
+    :py:func:`init_groups`), e.g., to sum the inner products of the parts of a
+    distributed vector.
+
+    Args:
+        ``vals``: Value on this MPI worker.  Numpy arrays are reduced as raw
+        buffers, other values are pickled.
+
+    Kwargs:
+        ``op``: MPI reduction operation.  Default is ``MPI.SUM``.
+
+    Returns:
+        ``vals``: Reduced value.  Without groups, ``vals`` is returned as is.
+    """
+    if _group_size == 1:
+        return vals
+    if op is None:
+        op = MPI.SUM
+    if _is_buffer_array(vals):
+        vals = np.ascontiguousarray(vals)
+        reduced_vals = np.empty_like(vals)
+        group_comm.Allreduce(vals, reduced_vals, op=op)
+        return reduced_vals
+    return group_comm.allreduce(vals, op=op)
 
 
 def barrier():
     """Wrapper for Barrier(); forces all processors/MPI workers to
     synchronize."""
-    if _is_distributed:
-        comm.Barrier()
+    if _is_world_distributed:
+        world_comm.Barrier()
 
 
 def print_from_rank_zero(msg, output_channel='stdout'):
@@ -145,11 +251,296 @@ def bcast(vals):
         outputs = vals
     else:
         outputs = None
-    if _is_distributed:
-        outputs = comm.bcast(outputs, root=0)
+    if _is_world_distributed:
+        outputs = world_comm.bcast(outputs, root=0)
     return outputs
 
 
+def allreduce_min(vals):
+    """Returns the minimum of ``vals`` over all processors/MPI workers.
+
+    Args:
+        ``vals``: Value on this processor/MPI worker.
+
+    Returns:
+        ``min_vals``: Minimum value over all processors/MPI workers.
+    """
+    if _is_world_distributed:
+        return world_comm.allreduce(vals, op=MPI.MIN)
+    return vals
+
+
+# Pickle protocol 5 (Python 3.8+) passes the memory of numpy arrays out of band,
+# so that it can be sent and received directly.
+_pickle_out_of_band = pickle.HIGHEST_PROTOCOL >= 5
+
+
+class _SendRequest(object):
+    """Request for an object being sent by :py:func:`isend`."""
+    def __init__(self, requests, bufs):
+        self._requests = requests
+        self._bufs = bufs
+
+
+    def wait(self):
+        """Waits until the object has been sent."""
+        MPI.Request.Waitall(self._requests)
+        self._requests = []
+        self._bufs = None
+
+
+class _RecvRequest(object):
+    """Request for an object being received by :py:func:`irecv`."""
+    def __init__(self, source, tag, bufs):
+        self._source = source
+        self._tag = tag
+        self.bufs = bufs
+        self._requests = None
+        self._views = None
+
+        # Start receiving the buffers now if the message with their sizes has
+        # already arrived, without waiting for it otherwise
+        message = comm.improbe(source=source, tag=tag)
+        if message is not None:
+            self._post_recvs(message.recv())
+
+
+    def _post_recvs(self, sizes):
+        """Starts receiving the buffers of the object, given their sizes,
+        reusing the buffers in ``bufs`` that are large enough."""
+        bufs = self.bufs
+        if bufs is None:
+            bufs = []
+        self.bufs = [
+            bufs[buf_index] if (
+                buf_index < len(bufs) and len(bufs[buf_index]) >= size)
+            else bytearray(size)
+            for buf_index, size in enumerate(sizes)]
+        self._views = [
+            memoryview(buf)[:size] for buf, size in zip(self.bufs, sizes)]
+        self._requests = [
+            comm.Irecv([view, MPI.BYTE], source=self._source, tag=self._tag)
+            for view in self._views]
+
+
+    def wait(self):
+        """Waits until the object has been received, and returns it."""
+        if self._requests is None:
+            self._post_recvs(comm.recv(source=self._source, tag=self._tag))
+        MPI.Request.Waitall(self._requests)
+        if _pickle_out_of_band:
+            obj = pickle.loads(self._views[0], buffers=self._views[1:])
+        else:
+            obj = pickle.loads(bytes(self._views[0]))
+        self._views = None
+        return obj
+
+
+def _as_plain_arrays(obj):
+    """Returns ``obj`` with its numpy arrays (also in lists and tuples) that
+    cannot be pickled out of band, i.e., array subclasses such as
+    ``np.memmap`` and non-contiguous arrays, replaced by contiguous
+    ``np.ndarray`` copies."""
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            return obj
+        if type(obj) is not np.ndarray or not (
+            obj.flags.c_contiguous or obj.flags.f_contiguous):
+            return np.ascontiguousarray(obj).view(np.ndarray)
+        return obj
+    if type(obj) in (list, tuple):
+        return type(obj)(_as_plain_arrays(item) for item in obj)
+    return obj
+
+
+def _check_tag(tag):
+    """Returns ``tag`` after checking that it is a valid MPI message tag."""
+    if tag < 0 or (_tag_ub is not None and tag > _tag_ub):
+        raise ValueError((
+            'Message tag %d is not between 0 and the largest tag allowed by '
+            'MPI (%d)') % (tag, _tag_ub))
+    return tag
+
+
+def isend(obj, dest, tag):
+    """Starts sending an object to another processor/MPI worker, without
+    waiting for it to be received.
+
+    Args:
+        ``obj``: Object to send.  Must be picklable.
+
+        ``dest``: Rank of the receiving processor/MPI worker.
+
+        ``tag``: Message tag.
+
+    Returns:
+        ``request``: Request whose ``wait()`` method waits until ``obj`` has
+        been sent.
+
+    A small message with the sizes of the buffers is sent first, so that
+    :py:func:`irecv` can post receives for the whole object before it arrives.
+    All messages of the object have the same tag, which is safe since MPI
+    messages with the same source, communicator, and tag are received in the
+    order they were sent.  MPI also matches messages by source, so the tag
+    only needs to tell apart the exchanges between the same processors/MPI
+    workers that may overlap.
+    With Python 3.8+, the memory of contiguous numpy arrays in ``obj`` is sent
+    directly, as separate buffers, rather than being copied into the pickled
+    object.  Memory-mapped and non-contiguous arrays (also in lists and
+    tuples) are first copied into contiguous arrays, since they would
+    otherwise be pickled in band.
+    """
+    _check_tag(tag)
+    bufs = []
+    if _pickle_out_of_band:
+        data = pickle.dumps(
+            _as_plain_arrays(obj), protocol=5, buffer_callback=bufs.append)
+        bufs = [buf.raw() for buf in bufs]
+    else:
+        data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    bufs.insert(0, data)
+    sizes = [memoryview(buf).nbytes for buf in bufs]
+    return _SendRequest(
+        [comm.isend(sizes, dest=dest, tag=tag)] + [
+            comm.Isend([buf, MPI.BYTE], dest=dest, tag=tag) for buf in bufs],
+        bufs)
+
+
+def irecv(source, tag, bufs=None):
+    """Starts receiving an object sent by :py:func:`isend`.
+
+    Args:
+        ``source``: Rank of the sending processor/MPI worker.
+
+        ``tag``: Message tag.
+
+    Kwargs:
+        ``bufs``: Receive buffers of a previous request (its ``bufs``
+        attribute), which are reused when they are large enough.  The object
+        received by that request must no longer be used.
+
+    Returns:
+        ``request``: Request whose ``wait()`` method waits until the object
+        has been received and returns it.
+
+    Does not wait.  If the message with the sizes of the buffers has already
+    arrived, receives for the whole object are posted, so that it is received
+    while the caller does other work.  Otherwise they are posted by
+    ``wait()``.  Thus processors/MPI workers passing objects around a ring do
+    not wait for their neighbors at each step.  Each request must be waited
+    for before the next object with the same source and tag is received.
+    """
+    return _RecvRequest(source, _check_tag(tag), bufs)
+
+
+def bcast_array(array):
+    """Broadcasts a numpy array from rank zero processor/MPI worker to all
+    others, using buffer-based ``Bcast`` rather than pickling.
+
+    Args:
+        ``array``: Array to broadcast.  Ignored on other processors/MPI
+        workers.
+
+    Returns:
+        ``array``: Broadcasted array.
+    """
+    if not _is_distributed:
+        return array
+    if _rank == 0:
+        array = np.ascontiguousarray(array)
+        header = (array.shape, array.dtype.str)
+    else:
+        header = None
+    shape, dtype = comm.bcast(header, root=0)
+    if _rank != 0:
+        array = np.empty(shape, dtype=dtype)
+    comm.Bcast([array, MPI.BYTE], root=0)
+    return array
+
+
+def allgather_array_blocks(array, blocks, max_num_bytes=None):
+    """Fills in an array with blocks computed on other processors/MPI
+    workers, sending only the elements of the blocks as raw buffers.
+
+    Args:
+        ``array``: Array in which this processor/MPI worker computed the
+        elements of ``blocks``.  It is modified in place.
+
+        ``blocks``: List of index tuples (e.g., pairs of slices) of the blocks
+        of ``array`` computed on this processor/MPI worker.  Blocks of
+        different processors/MPI workers must not overlap.
+
+    Kwargs:
+        ``max_num_bytes``: Maximum number of bytes sent by each processor/MPI
+        worker in one ``Allgatherv``.  If None, the only limit is that MPI
+        counts and displacements fit in 32-bit integers.
+
+    Returns:
+        ``array``: Array with the blocks of all processors/MPI workers.
+
+    Elements not in any block are left as they are.  Unlike a sum over all
+    processors/MPI workers, the communication is proportional to the size of
+    the blocks, not of the whole array.  The blocks of all processors/MPI
+    workers are gathered with one ``Allgatherv``, which is only split into
+    several when the counts would overflow.
+    """
+    if not _is_distributed:
+        return array
+    array = np.asarray(array)
+    values = np.concatenate(
+        [array[block].ravel() for block in blocks] +
+        [np.zeros(0, dtype=array.dtype)])
+    all_blocks = comm.allgather(blocks)
+    counts = np.array([
+        sum(array[block].size for block in proc_blocks)
+        for proc_blocks in all_blocks])
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    all_values = np.empty(counts.sum(), dtype=array.dtype)
+
+    # Counts and displacements of each Allgatherv must fit in 32-bit integers
+    max_num_vals = (2**31 - 1) // _num_MPI_workers
+    if max_num_bytes is not None:
+        max_num_vals = min(
+            max_num_vals, max(max_num_bytes // array.itemsize, 1))
+    if counts.max() <= max_num_vals:
+        comm.Allgatherv(values, [all_values, (counts, offsets)])
+    else:
+        for start_index in range(0, counts.max(), max_num_vals):
+            piece_counts = np.clip(counts - start_index, 0, max_num_vals)
+            piece_offsets = np.concatenate(
+                ([0], np.cumsum(piece_counts)[:-1]))
+            piece_values = np.empty(
+                piece_counts.sum(), dtype=array.dtype)
+            comm.Allgatherv(
+                values[start_index:start_index + max_num_vals],
+                [piece_values, (piece_counts, piece_offsets)])
+            for offset, piece_count, piece_offset in zip(
+                offsets, piece_counts, piece_offsets):
+                all_values[
+                    offset + start_index:
+                    offset + start_index + piece_count] = piece_values[
+                        piece_offset:piece_offset + piece_count]
+
+    # Fill in the blocks of the other processors/MPI workers
+    for source_rank, source_blocks in enumerate(all_blocks):
+        if source_rank == _rank:
+            continue
+        start_index = offsets[source_rank]
+        for block in source_blocks:
+            block_shape = array[block].shape
+            block_size = int(np.prod(block_shape))
+            array[block] = all_values[
+                start_index:start_index + block_size].reshape(block_shape)
+            start_index += block_size
+    return array
+
+
+def _is_buffer_array(obj):
+    """Returns True if ``obj`` is a numpy array that can be sent as a raw
+    buffer."""
+    return isinstance(obj, np.ndarray) and not obj.dtype.hasobject
+
+
 def call_and_bcast(func, *args, **kwargs):
     """Calls function on rank zero processor/MPI worker and broadcasts
     outputs to all others.
@@ -167,14 +558,238 @@ def call_and_bcast(func, *args, **kwargs):
       # ``outputs==1`` on all processors/MPI workers.
       outputs = parallel.call_and_bcast(lambda x: x+1, parallel.get_rank())
 
+    Numpy arrays in the outputs (either the output itself or elements of an
+    output tuple) are broadcast with :py:func:`bcast_array`; everything else
+    is pickled.
     """
-    if is_rank_zero():
+    if _rank == 0:
         outputs = func(*args, **kwargs)
     else:
         outputs = None
+    if not _is_distributed:
+        return outputs
+
+    # Broadcast everything but the arrays, then the arrays themselves
+    if _rank == 0:
+        is_tuple = isinstance(outputs, tuple)
+        items = list(outputs) if is_tuple else [outputs]
+        is_array = [_is_buffer_array(item) for item in items]
+        header = (
+            is_tuple, is_array,
+            [None if arr else item for item, arr in zip(items, is_array)])
+    else:
+        header = None
+    is_tuple, is_array, items = comm.bcast(header, root=0)
+    if _rank == 0:
+        items = list(outputs) if is_tuple else [outputs]
+    items = [
+        bcast_array(item) if arr else item
+        for item, arr in zip(items, is_array)]
+    return tuple(items) if is_tuple else items[0]
+
+
+def get_row_block_bounds(num_rows):
+    """Returns the bounds of the block of consecutive rows of an array that
+    belongs to this processor/MPI worker, e.g., for
+    :py:func:`distributed_eigh`.
+
+    Args:
+        ``num_rows``: Number of rows of the array.
+
+    Returns:
+        ``start``: Index of the first row of the block.
+
+        ``end``: Index after the last row of the block.
+
+    The rows are split as evenly as possible, in order of rank.
+    """
+    row_bounds = np.linspace(0, num_rows, _num_MPI_workers + 1).astype(int)
+    return row_bounds[_rank], row_bounds[_rank + 1]
+
+
+def _allreduce_sum_array(array):
+    """Returns the sum of a numpy array over all processors/MPI workers,
+    using buffer-based ``Allreduce``."""
+    array = np.ascontiguousarray(array)
+    if not _is_distributed:
+        return array
+    sum_array = np.empty_like(array)
+    comm.Allreduce(array, sum_array, op=MPI.SUM)
+    return sum_array
+
+
+def _allgather_rows(local_rows, row_counts):
+    """Returns the array made of the blocks of rows of all processors/MPI
+    workers, which have ``row_counts`` rows, using buffer-based
+    ``Allgatherv``."""
+    local_rows = np.ascontiguousarray(local_rows)
+    if not _is_distributed:
+        return local_rows
+    array = np.empty(
+        (row_counts.sum(),) + local_rows.shape[1:], dtype=local_rows.dtype)
+    row_size = int(np.prod(local_rows.shape[1:]))
+    comm.Allgatherv(local_rows, [array, row_counts * row_size])
+    return array
+
+
+def _gather_rows(local_rows, row_counts):
+    """Returns the array made of the blocks of rows of all processors/MPI
+    workers on rank zero, and None on the others."""
+    local_rows = np.ascontiguousarray(local_rows)
+    if not _is_distributed:
+        return local_rows
+    if _rank != 0:
+        comm.Gatherv(local_rows, None, root=0)
+        return None
+    array = np.empty(
+        (row_counts.sum(),) + local_rows.shape[1:], dtype=local_rows.dtype)
+    comm.Gatherv(
+        local_rows,
+        [array, row_counts * int(np.prod(local_rows.shape[1:]))], root=0)
+    return array
+
+
+def _cholesky_qr(local_rows, shift=False):
+    """Orthonormalizes the columns of an array distributed by blocks of rows
+    among processors/MPI workers, by a Cholesky QR factorization, and returns
+    this processor/MPI worker's block of rows of the orthonormal basis.  With
+    ``shift``, the Gram array is shifted so that its Cholesky factorization
+    exists even if it is ill-conditioned, which makes the basis only nearly
+    orthonormal.  Raises ``np.linalg.LinAlgError`` if the Gram array is not
+    positive definite."""
+    gram_array = _allreduce_sum_array(local_rows.conj().T.dot(local_rows))
+    gram_array = 0.5 * (gram_array + gram_array.conj().T)
+    if shift:
+        num_rows = _allreduce_sum_array(np.array(local_rows.shape[0]))
+        num_cols = local_rows.shape[1]
+        gram_array = gram_array + np.eye(num_cols) * (
+            11. * (num_rows * num_cols + num_cols * (num_cols + 1)) *
+            np.finfo(float).eps * np.abs(np.trace(gram_array)))
+    R = call_and_bcast(np.linalg.cholesky, gram_array).conj().T
+    return scipy.linalg.solve_triangular(
+        R, local_rows.T, trans='T', lower=False).T
+
+
+def distributed_eigh(
+    local_rows, num_eigvals, atol=1e-13, rtol=None, is_positive_definite=False,
+    num_extra_vecs=10, tol=1e-10, max_num_iters=1000):
+    """Computes the leading eigenvalues and eigenvectors of a Hermitian array
+    cooperatively on all processors/MPI workers, using subspace iteration.
+
+    Args:
+        ``local_rows``: This processor/MPI worker's block of consecutive rows
+        of a Hermitian array, e.g., given by :py:func:`get_row_block_bounds`.
+        The blocks of all processors/MPI workers, in order of rank, make up
+        the array.  Some may be empty.
+
+        ``num_eigvals``: Number of eigenvalues (of largest magnitude) to
+        compute.
+
+    Kwargs:
+        ``atol``, ``rtol``, ``is_positive_definite``: Truncation options, as
+        in :py:func:`util.eigh`.
+
+        ``num_extra_vecs``: Number of vectors beyond ``num_eigvals`` in the
+        iterated subspace.  More vectors speed up convergence.
+
+        ``tol``: Iteration stops when the residual norm of every computed
+        eigenpair is below ``tol`` times the largest eigenvalue magnitude.
+
+        ``max_num_iters``: Maximum number of iterations.
+
+    Returns:
+        ``eigvals``: 1D array of eigenvalues, sorted in descending order (of
+        magnitude).
+
+        ``eigvecs``: Array whose columns are eigenvectors, the same on all
+        processors/MPI workers.
+
+    Each processor/MPI worker holds its block of rows of the array and of
+    the basis of the subspace, and multiplies its block of rows of the array
+    by the basis, whose blocks it gathers from the others.  The projected
+    array, the residuals, and the orthonormalization of the basis (by shifted
+    Cholesky QR) only need sums of small arrays over all processors/MPI
+    workers.  For a basis of :math:`p` vectors, the work per iteration and
+    processor/MPI worker is thus :math:`O(n^2 p / P + n p^2 / P)`, and only
+    :math:`O(n p)` elements are communicated, rather than the :math:`O(n^3)`
+    work of a full eigendecomposition on rank zero.  If the iteration does
+    not converge within ``max_num_iters`` iterations, or the basis becomes
+    rank deficient, a warning is printed and the array is gathered on rank
+    zero and decomposed with :py:func:`util.eigh`.
+    """
+    local_rows = np.asarray(local_rows)
     if _is_distributed:
-        outputs = comm.bcast(outputs, root=0)
-    return outputs
+        row_counts = np.array(comm.allgather(local_rows.shape[0]))
+    else:
+        row_counts = np.array([local_rows.shape[0]])
+    num_rows = row_counts.sum()
+    if local_rows.ndim != 2 or local_rows.shape[1] != num_rows:
+        raise ValueError(
+            'The blocks of rows do not make up a square array')
+    start_row = row_counts[:_rank].sum()
+    num_vecs = min(num_eigvals + num_extra_vecs, num_rows)
+
+    def gathered_eigh():
+        return call_and_bcast(
+            util.eigh, _gather_rows(local_rows, row_counts), atol=atol,
+            rtol=rtol, is_positive_definite=is_positive_definite,
+            num_eigvals=num_eigvals)
+    if num_vecs == num_rows:
+        return gathered_eigh()
+
+    # Start from the same random basis on all processors/MPI workers, of
+    # which each keeps its block of rows
+    dtype = np.result_type(local_rows, float)
+    local_basis = np.random.RandomState(0).standard_normal(
+        (num_rows, num_vecs))[start_row:start_row + local_rows.shape[0]]
+    local_basis = local_basis.astype(dtype)
+    is_converged = False
+    try:
+        local_basis = _cholesky_qr(local_basis)
+        for iter_num in range(max_num_iters):
+            local_prod = local_rows.dot(
+                _allgather_rows(local_basis, row_counts))
+
+            # Check the residuals of the Ritz pairs
+            projected_array = _allreduce_sum_array(
+                local_basis.conj().T.dot(local_prod))
+            projected_array = 0.5 * (
+                projected_array + projected_array.conj().T)
+            ritz_vals, ritz_vecs = call_and_bcast(
+                np.linalg.eigh, projected_array)
+            order = np.argsort(np.abs(ritz_vals))[::-1][:num_eigvals]
+            local_residuals = (
+                local_prod.dot(ritz_vecs[:, order]) -
+                local_basis.dot(ritz_vecs[:, order]) * ritz_vals[order])
+            residual_norms = np.sqrt(_allreduce_sum_array(
+                np.sum(np.abs(local_residuals) ** 2, axis=0)))
+            is_converged = bcast(
+                residual_norms.max() <= tol * abs(ritz_vals[order[0]]))
+            if is_converged:
+                break
+
+            # Orthonormalize the product by shifted Cholesky QR, followed by
+            # two Cholesky QRs that make it orthonormal to machine precision
+            local_basis = _cholesky_qr(local_prod, shift=True)
+            local_basis = _cholesky_qr(_cholesky_qr(local_basis))
+    except np.linalg.LinAlgError:
+        print_from_rank_zero(
+            'Warning: The basis of the subspace iteration became rank '
+            'deficient; computing the full eigendecomposition instead')
+        return gathered_eigh()
+    if not is_converged:
+        print_from_rank_zero((
+            'Warning: Subspace iteration did not converge in %d iterations; '
+            'computing the full eigendecomposition instead') % max_num_iters)
+        return gathered_eigh()
+
+    # Rayleigh-Ritz projection onto the final basis
+    eigvals, eigvecs = call_and_bcast(
+        util.eigh, projected_array, atol=atol, rtol=rtol,
+        is_positive_definite=is_positive_definite)
+    eigvals = eigvals[:num_eigvals]
+    return eigvals, _allgather_rows(
+        local_basis.dot(eigvecs[:, :eigvals.size]), row_counts)
 
 
 def find_assignments(tasks, task_weights=None):
@@ -100,7 +100,8 @@ def compute_POD_arrays_snaps_method(
 
 
 def compute_POD_arrays_direct_method(
-    vecs, mode_indices=None, inner_product_weights=None, atol=1e-13, rtol=None):
+    vecs, mode_indices=None, inner_product_weights=None, atol=1e-13, rtol=None,
+    num_modes=None, svd_method='exact', seed=None):
     """Computes POD modes using data stored in an array, using direct method.
 
     Args:
@@ -120,6 +121,15 @@ def compute_POD_arrays_direct_method(
         ``rtol``: Maximum relative difference between largest and smallest
         eigenvalues of correlation array.  Smaller ones are truncated.
 
+        ``num_modes``: Maximum number of modes (singular values) to compute.
+        If None, all that satisfy ``atol`` and ``rtol`` are computed.
+
+        ``svd_method``: ``'exact'`` or ``'randomized'``.  The randomized SVD
+        requires ``num_modes`` and is much faster when it is small compared to
+        the dimensions of :math:`X`.  See :py:func:`util.svd`.
+
+        ``seed``: Seed for the randomized SVD, for reproducible results.
+
         ``return_all``: Return more objects; see below. Default is false.
 
     Returns:
@@ -166,7 +176,9 @@ def compute_POD_arrays_direct_method(
 
     # If no inner product weights, compute SVD directly
     if inner_product_weights is None:
-        modes, sing_vals, eigvecs = util.svd(vecs, atol=atol, rtol=rtol)
+        modes, sing_vals, eigvecs = util.svd(
+            vecs, atol=atol, rtol=rtol, num_modes=num_modes,
+            method=svd_method, seed=seed)
         if mode_indices is None:
             mode_indices = range(sing_vals.size)
         modes = modes[:, mode_indices]
@@ -176,7 +188,8 @@ def compute_POD_arrays_direct_method(
         sqrt_weights = inner_product_weights ** 0.5
         vecs_weighted = np.diag(sqrt_weights).dot(vecs)
         modes_weighted, sing_vals, eigvecs = util.svd(
-            vecs_weighted, atol=atol, rtol=rtol)
+            vecs_weighted, atol=atol, rtol=rtol, num_modes=num_modes,
+            method=svd_method, seed=seed)
         if mode_indices is None:
             mode_indices = range(sing_vals.size)
         modes = np.diag(sqrt_weights ** -1.).dot(
@@ -189,7 +202,8 @@ def compute_POD_arrays_direct_method(
         sqrt_weights = np.linalg.cholesky(inner_product_weights).conj().T
         vecs_weighted = sqrt_weights.dot(vecs)
         modes_weighted, sing_vals, eigvecs = util.svd(
-            vecs_weighted, atol=atol, rtol=rtol)
+            vecs_weighted, atol=atol, rtol=rtol, num_modes=num_modes,
+            method=svd_method, seed=seed)
         if mode_indices is None:
             mode_indices = range(sing_vals.size)
         #modes = np.linalg.solve(sqrt_weights, modes_weighted[:, mode_indices])
@@ -208,6 +222,194 @@ def compute_POD_arrays_direct_method(
         eigvals=eigvals, modes=modes, proj_coeffs=proj_coeffs, eigvecs=eigvecs)
 
 
+class IncrementalPODArrays(object):
+    """Proper Orthogonal Decomposition computed incrementally, for data
+    vectors that arrive one at a time or in small batches.
+
+    Kwargs:
+        ``max_num_modes``: Maximum number of modes to keep.  If None, all
+        modes that satisfy ``atol`` and ``rtol`` are kept.
+
+        ``inner_product_weights``: 1D or 2D array of inner product weights.
+        Corresponds to :math:`W` in inner product :math:`v_1^* W v_2`.
+
+        ``atol``: Level below which singular values are truncated.
+
+        ``rtol``: Maximum relative difference between largest and smallest
+        singular values.  Smaller ones are truncated.
+
+        ``store_eigvecs``: Keep the right singular vectors (eigenvectors of the
+        correlation array), which are needed for projection coefficients.
+        Their size grows with the number of data vectors.
+
+    Only a truncated SVD :math:`U S V^*` of the (weighted) data vectors seen so
+    far is kept in memory.  For each new batch :math:`C`, the part of
+    :math:`C` outside the span of :math:`U` is orthonormalized,
+    :math:`QR = C - U U^* C`, and the small array
+
+    .. math::
+
+      \\begin{bmatrix} S & U^* C \\\\ 0 & R \\end{bmatrix}
+
+    is decomposed to rotate and truncate the basis (Brand, 2002).  Each update
+    costs :math:`O(m (r + k)^2)` for vectors with :math:`m` elements, a rank
+    :math:`r` basis, and a batch of :math:`k` vectors.  Truncation makes the
+    result an approximation of :py:func:`compute_POD_arrays_direct_method`,
+    which is exact if no singular values are discarded.
+
+    Usage::
+
+      my_POD = IncrementalPODArrays(max_num_modes=20)
+      for vec in vecs_from_simulation:
+          my_POD.update(vec)
+      modes = my_POD.compute_modes()
+
+    This class does not run in parallel.
+    """
+    def __init__(
+        self, max_num_modes=None, inner_product_weights=None, atol=1e-13,
+        rtol=None, store_eigvecs=True):
+        if parallel.is_distributed():
+            raise RuntimeError('Cannot run in parallel.')
+        self.max_num_modes = max_num_modes
+        self.atol = atol
+        self.rtol = rtol
+        self.store_eigvecs = store_eigvecs
+        self.num_vecs = 0
+        self.basis = None
+        self.sing_vals = None
+        self.eigvals = None
+        self.eigvecs = None
+
+        # Inner product weights are applied as W^{1/2}, as in the direct method
+        if inner_product_weights is None:
+            self.sqrt_weights = None
+        else:
+            inner_product_weights = np.array(inner_product_weights)
+            if inner_product_weights.ndim == 1:
+                self.sqrt_weights = inner_product_weights ** 0.5
+            elif inner_product_weights.ndim == 2:
+                self.sqrt_weights = np.linalg.cholesky(
+                    inner_product_weights).conj().T
+            else:
+                raise ValueError('Weights must be 1D or 2D.')
+
+
+    def _weight(self, vecs):
+        if self.sqrt_weights is None:
+            return vecs
+        if self.sqrt_weights.ndim == 1:
+            return self.sqrt_weights[:, np.newaxis] * vecs
+        return self.sqrt_weights.dot(vecs)
+
+
+    def _unweight(self, vecs):
+        if self.sqrt_weights is None:
+            return vecs
+        if self.sqrt_weights.ndim == 1:
+            return vecs / self.sqrt_weights[:, np.newaxis]
+        return np.linalg.solve(self.sqrt_weights, vecs)
+
+
+    def _truncate(self, U, S, V):
+        if self.max_num_modes is not None:
+            U = U[:, :self.max_num_modes]
+            S = S[:self.max_num_modes]
+            V = V[:, :self.max_num_modes]
+        return U, S, V
+
+
+    def update(self, vecs):
+        """Adds data vectors to the decomposition.
+
+        Args:
+            ``vecs``: 1D array for a single data vector, or array whose columns
+            are data vectors.
+
+        Returns:
+            ``eigvals``: 1D array of eigenvalues of correlation array for all
+            of the data vectors added so far.
+        """
+        vecs = self._weight(util.atleast_2d_col(np.array(vecs)))
+        num_new_vecs = vecs.shape[1]
+
+        # First batch, decompose directly
+        if self.basis is None:
+            U, S, V = self._truncate(
+                *util.svd(vecs, atol=self.atol, rtol=self.rtol))
+            if U.shape[1] > 0:
+                self.basis, self.sing_vals = U, S
+                self.eigvals = S ** 2.
+                # Earlier vectors, if any, were all zero
+                if self.store_eigvecs:
+                    self.eigvecs = np.vstack((
+                        np.zeros((self.num_vecs, S.size), dtype=V.dtype), V))
+            self.num_vecs += num_new_vecs
+            return self.eigvals
+
+        # Project out the current basis.  Doing so twice keeps the residual
+        # orthogonal to the basis in floating point.
+        proj = self.basis.conj().T.dot(vecs)
+        residual = vecs - self.basis.dot(proj)
+        proj_correction = self.basis.conj().T.dot(residual)
+        residual -= self.basis.dot(proj_correction)
+        proj += proj_correction
+        residual_basis, residual_coeffs = np.linalg.qr(residual)
+
+        # Decompose the small core array and rotate the basis
+        num_modes = self.sing_vals.size
+        core = np.zeros(
+            (num_modes + num_new_vecs, num_modes + num_new_vecs),
+            dtype=np.result_type(proj, residual_coeffs))
+        core[:num_modes, :num_modes] = np.diag(self.sing_vals)
+        core[:num_modes, num_modes:] = proj
+        core[num_modes:, num_modes:] = residual_coeffs
+        core_U, S, core_V = self._truncate(
+            *util.svd(core, atol=self.atol, rtol=self.rtol))
+        self.basis = np.hstack((self.basis, residual_basis)).dot(core_U)
+        self.sing_vals = S
+        self.eigvals = S ** 2.
+        if self.store_eigvecs:
+            self.eigvecs = np.vstack((
+                self.eigvecs.dot(core_V[:num_modes]), core_V[num_modes:]))
+        self.num_vecs += num_new_vecs
+        return self.eigvals
+
+
+    def compute_modes(self, mode_indices=None):
+        """Computes POD modes from the current decomposition.
+
+        Kwargs:
+            ``mode_indices``: List of indices describing which modes to
+            compute.  If None, all modes are computed.
+
+        Returns:
+            ``modes``: Array whose columns are POD modes.
+        """
+        if self.basis is None:
+            raise RuntimeError('No data vectors have been added.')
+        if mode_indices is None:
+            mode_indices = range(self.sing_vals.size)
+        return self._unweight(self.basis[:, list(mode_indices)])
+
+
+    def compute_proj_coeffs(self):
+        """Computes orthogonal projection of the data vectors added so far onto
+        the POD modes.
+
+        Returns:
+            ``proj_coeffs``: Array of projection coefficients for data vectors,
+            expressed as a linear combination of POD modes.  Columns correspond
+            to data vectors, rows correspond to POD modes.
+        """
+        if not self.store_eigvecs:
+            raise RuntimeError(
+                'Projection coefficients require store_eigvecs=True.')
+        if self.basis is None:
+            raise RuntimeError('No data vectors have been added.')
+        return np.diag(self.sing_vals).dot(self.eigvecs.conj().T)
+
+
 class PODHandles(object):
     """Proper Orthogonal Decomposition implemented for large datasets.
 
@@ -226,6 +428,16 @@ class PODHandles(object):
 
         ``verbosity``: 1 prints progress and warnings, 0 prints almost nothing.
 
+        ``distributed_eigh``: If True, eigendecompositions of correlation
+        arrays truncated with ``max_num_eigvals`` are computed cooperatively by
+        all MPI workers using :py:func:`parallel.distributed_eigh`, rather
+        than by rank zero alone.
+
+        ``vec_space_kwargs``: Dictionary of further keyword arguments for
+        :py:class:`vectorspace.VectorSpaceHandles`, e.g.,
+        ``block_inner_product``, ``prefetch_depth``, ``IP_cache_path``, or
+        ``checkpoint_dir``.
+
     Computes POD modes from vector objects (or handles).  Uses
     :py:class:`vectorspace.VectorSpaceHandles` for low level functions.
 
@@ -240,18 +452,21 @@ class PODHandles(object):
     """
     def __init__(
         self, inner_product=None, get_array=util.load_array_text,
-        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1):
+        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1,
+        distributed_eigh=False, vec_space_kwargs=None):
         self.get_array = get_array
         self.put_array = put_array
         self.verbosity = verbosity
+        self.distributed_eigh = distributed_eigh
         self.eigvecs = None
         self.eigvals = None
 
         self.vec_space = VectorSpaceHandles(inner_product=inner_product,
             max_vecs_per_node=max_vecs_per_node,
-            verbosity=verbosity)
+            verbosity=verbosity, **(vec_space_kwargs or {}))
         self.vec_handles = None
         self.correlation_array = None
+        self.proj_vec_coeffs = None
 
 
     def get_decomp(self, eigvals_src, eigvecs_src):
@@ -342,7 +557,7 @@ class PODHandles(object):
         self.vec_space.sanity_check(test_vec_handle)
 
 
-    def compute_eigendecomp(self, atol=1e-13, rtol=None):
+    def compute_eigendecomp(self, atol=1e-13, rtol=None, max_num_eigvals=None):
         """Computes eigendecomposition of correlation array.
 
         Kwargs:
@@ -352,6 +567,11 @@ class PODHandles(object):
             ``rtol``: Maximum relative difference between largest and smallest
             eigenvalues of correlation array.  Smaller ones are truncated.
 
+            ``max_num_eigvals``: Maximum number of eigenvalues of correlation
+            array to compute.  Only the leading eigenvalues are computed, which
+            is much faster when this is small compared to the number of
+            vectors.  If None, all are computed.
+
         Useful if you already have the correlation array and to want to avoid
         recomputing it.
 
@@ -361,12 +581,20 @@ class PODHandles(object):
           POD.compute_eigendecomp()
           POD.compute_modes(range(10), mode_handles, vec_handles=vec_handles)
         """
-        self.eigvals, self.eigvecs = parallel.call_and_bcast(
-            util.eigh, self.correlation_array, atol=atol, rtol=rtol,
-            is_positive_definite=True)
-
-
-    def compute_decomp(self, vec_handles, atol=1e-13, rtol=None):
+        if self.distributed_eigh and max_num_eigvals is not None:
+            start, end = parallel.get_row_block_bounds(
+                self.correlation_array.shape[0])
+            self.eigvals, self.eigvecs = parallel.distributed_eigh(
+                self.correlation_array[start:end], max_num_eigvals, atol=atol,
+                rtol=rtol, is_positive_definite=True)
+        else:
+            self.eigvals, self.eigvecs = parallel.call_and_bcast(
+                util.eigh, self.correlation_array, atol=atol, rtol=rtol,
+                is_positive_definite=True, num_eigvals=max_num_eigvals)
+
+
+    def compute_decomp(
+        self, vec_handles, atol=1e-13, rtol=None, max_num_eigvals=None):
         """Computes correlation array :math:`X^*WX` and its eigendecomposition.
 
         Args:
@@ -379,6 +607,9 @@ class PODHandles(object):
             ``rtol``: Maximum relative difference between largest and smallest
             eigenvalues of correlation array.  Smaller ones are truncated.
 
+            ``max_num_eigvals``: Maximum number of eigenvalues of correlation
+            array to compute.  See :py:meth:`compute_eigendecomp`.
+
         Returns:
             ``eigvals``: 1D array of eigenvalues of correlation array.
 
@@ -389,7 +620,123 @@ class PODHandles(object):
         self.correlation_array =\
             self.vec_space.compute_symm_inner_product_array(
                 self.vec_handles)
-        self.compute_eigendecomp(atol=atol, rtol=rtol)
+        self.compute_eigendecomp(
+            atol=atol, rtol=rtol, max_num_eigvals=max_num_eigvals)
+        return self.eigvals, self.eigvecs
+
+
+    def compute_decomp_and_modes(
+        self, vec_handles, mode_indices, mode_handles, proj_vec_handles=None,
+        atol=1e-13, rtol=None, max_num_eigvals=None):
+        """Computes the decomposition, POD modes, and the projections of other
+        vector objects onto the modes, with as few passes over the vector
+        objects as possible.
+
+        Args:
+            ``vec_handles``: List of handles for vector objects.
+
+            ``mode_indices``: List of indices describing which modes to
+            compute, e.g. ``range(10)`` or ``[3, 0, 5]``.
+
+            ``mode_handles``: List of handles for modes to compute.
+
+        Kwargs:
+            ``proj_vec_handles``: List of handles for vector objects to
+            project onto the POD modes.
+
+            ``atol``: Level below which eigenvalues of correlation array are
+            truncated.
+
+            ``rtol``: Maximum relative difference between largest and smallest
+            eigenvalues of correlation array.  Smaller ones are truncated.
+
+            ``max_num_eigvals``: Maximum number of eigenvalues of correlation
+            array to compute.  See :py:meth:`compute_eigendecomp`.
+
+        Returns:
+            ``eigvals``: 1D array of eigenvalues of correlation array.
+
+            ``eigvecs``: Array whose columns are eigenvectors of correlation
+            array.
+
+            ``proj_vec_coeffs``: Array of projection coefficients for the
+            vector objects in ``proj_vec_handles``, expressed as a linear
+            combination of POD modes.  Columns correspond to vector objects,
+            rows correspond to POD modes.  None if ``proj_vec_handles`` is not
+            given.
+
+        This is equivalent to calling :py:meth:`compute_decomp` and
+        :py:meth:`compute_modes`, then projecting the vector objects in
+        ``proj_vec_handles`` onto the modes.  However, the inner products of
+        the vector objects with those to project are computed together with
+        the correlation array, while each chunk of vector objects is in memory,
+        and the inner products among those to project are not computed.  The
+        projection coefficients follow from these, without retrieving the
+        modes.  Thus the vector objects are only retrieved once to compute
+        inner products, and once to compute the modes.
+        """
+        if proj_vec_handles is None:
+            proj_vec_handles = []
+        proj_vec_handles = list(util.make_iterable(proj_vec_handles))
+        self.vec_handles = vec_handles
+
+        # The inner products with the vector objects to project are computed
+        # in the same pass as the correlation array.
+        self.correlation_array, proj_IP_array =\
+            self.vec_space.compute_inner_product_arrays(
+                [self.vec_handles, proj_vec_handles], [(0, 0), (0, 1)])
+        self.compute_eigendecomp(
+            atol=atol, rtol=rtol, max_num_eigvals=max_num_eigvals)
+        self.compute_modes(mode_indices, mode_handles)
+
+        # Since the modes are orthonormal, the projection coefficients are
+        # their inner products with the vector objects.
+        self.proj_vec_coeffs = None
+        if len(proj_vec_handles) > 0:
+            self.proj_vec_coeffs = np.diag(self.eigvals ** -0.5).dot(
+                self.eigvecs.conj().T.dot(proj_IP_array))
+        return self.eigvals, self.eigvecs, self.proj_vec_coeffs
+
+
+    def update_decomp(
+        self, new_vec_handles, atol=1e-13, rtol=None, max_num_eigvals=None):
+        """Appends vector objects to the dataset, updating the correlation
+        array :math:`X^*WX` and recomputing its eigendecomposition.
+
+        Args:
+            ``new_vec_handles``: List of handles for vector objects to append.
+
+        Kwargs:
+            ``atol``: Level below which eigenvalues of correlation array are
+            truncated.
+
+            ``rtol``: Maximum relative difference between largest and smallest
+            eigenvalues of correlation array.  Smaller ones are truncated.
+
+            ``max_num_eigvals``: Maximum number of eigenvalues of correlation
+            array to compute.  See :py:meth:`compute_eigendecomp`.
+
+        Returns:
+            ``eigvals``: 1D array of eigenvalues of correlation array.
+
+            ``eigvecs``: Array whose columns are eigenvectors of correlation
+            array.
+
+        Only the inner products involving the new vector objects are computed;
+        the existing correlation array is reused.  If no decomposition has been
+        computed yet, this is equivalent to :py:meth:`compute_decomp`.
+        """
+        new_vec_handles = list(util.make_iterable(new_vec_handles))
+        if self.correlation_array is None or self.vec_handles is None:
+            return self.compute_decomp(
+                new_vec_handles, atol=atol, rtol=rtol,
+                max_num_eigvals=max_num_eigvals)
+        self.correlation_array =\
+            self.vec_space.extend_symm_inner_product_array(
+                self.correlation_array, self.vec_handles, new_vec_handles)
+        self.vec_handles = list(self.vec_handles) + new_vec_handles
+        self.compute_eigendecomp(
+            atol=atol, rtol=rtol, max_num_eigvals=max_num_eigvals)
         return self.eigvals, self.eigvecs
 
 
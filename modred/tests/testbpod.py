@@ -316,6 +316,13 @@ class TestBPODHandles(unittest.TestCase):
         for k,v in util.get_data_members(my_BPOD).items():
             self.assertEqual(v, data_members_modified[k])
 
+        # Other options are passed to the vector space
+        my_BPOD = bpod.BPODHandles(
+            inner_product=my_IP, verbosity=0,
+            vec_space_kwargs={'prefetch_depth': 2, 'symm_schedule': 'tiles'})
+        self.assertEqual(my_BPOD.vec_space.prefetch_depth, 2)
+        self.assertEqual(my_BPOD.vec_space.symm_schedule, 'tiles')
+
 
     #@unittest.skip('Testing something else.')
     def test_puts_gets(self):
@@ -270,12 +270,15 @@ class TestDMDHandles(unittest.TestCase):
         data_members_default = {
             'put_array': util.save_array_text,
             'get_array': util.load_array_text,
-            'verbosity': 0, 'eigvals': None, 'correlation_array': None,
+            'verbosity': 0, 'distributed_eigh': False, 'eigvals': None,
+            'correlation_array': None,
             'cross_correlation_array': None, 'correlation_array_eigvals': None,
+            'expanded_correlation_array': None,
             'correlation_array_eigvecs': None, 'low_order_linear_map': None,
             'L_low_order_eigvecs': None, 'R_low_order_eigvecs': None,
             'spectral_coeffs': None, 'proj_coeffs': None, 'adv_proj_coeffs':
-            None, 'vec_handles': None, 'adv_vec_handles': None, 'vec_space':
+            None, 'proj_vec_coeffs': None, 'vec_handles': None,
+            'adv_vec_handles': None, 'vec_space':
             VectorSpaceHandles(inner_product=my_IP, verbosity=0)}
 
         # Get default data member values
@@ -317,6 +320,13 @@ class TestDMDHandles(unittest.TestCase):
         for k,v in util.get_data_members(my_DMD).items():
             self.assertEqual(v, data_members_modified[k])
 
+        # Other options are passed to the vector space
+        my_DMD = dmd.DMDHandles(
+            inner_product=my_IP, verbosity=0,
+            vec_space_kwargs={'prefetch_depth': 2, 'symm_schedule': 'tiles'})
+        self.assertEqual(my_DMD.vec_space.prefetch_depth, 2)
+        self.assertEqual(my_DMD.vec_space.symm_schedule, 'tiles')
+
 
     #@unittest.skip('Testing something else.')
     def test_puts_gets(self):
@@ -501,6 +511,91 @@ class TestDMDHandles(unittest.TestCase):
             self.adv_vec_handles[:-1])
 
 
+    #@unittest.skip('Testing something else.')
+    def test_update_decomp(self):
+        """Test appending vectors gives the same decomposition."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_old = 6
+
+        # Sequential dataset
+        DMD = dmd.DMDHandles(inner_product=np.vdot, verbosity=0)
+        DMD.compute_decomp(self.vec_handles[:num_old])
+        eigvals = DMD.update_decomp(self.vec_handles[num_old:])[0]
+        DMD_full = dmd.DMDHandles(inner_product=np.vdot, verbosity=0)
+        eigvals_full = DMD_full.compute_decomp(self.vec_handles)[0]
+        self.assertEqual(DMD.vec_handles, self.vec_handles)
+        for attr in ['correlation_array', 'cross_correlation_array']:
+            np.testing.assert_allclose(
+                getattr(DMD, attr), getattr(DMD_full, attr),
+                rtol=rtol, atol=atol)
+        np.testing.assert_allclose(
+            np.sort_complex(eigvals), np.sort_complex(eigvals_full),
+            rtol=rtol, atol=atol)
+
+        # Non-sequential dataset
+        DMD = dmd.DMDHandles(inner_product=np.vdot, verbosity=0)
+        DMD.compute_decomp(
+            self.vec_handles[:num_old],
+            adv_vec_handles=self.adv_vec_handles[:num_old])
+        eigvals = DMD.update_decomp(
+            self.vec_handles[num_old:],
+            new_adv_vec_handles=self.adv_vec_handles[num_old:])[0]
+        DMD_full = dmd.DMDHandles(inner_product=np.vdot, verbosity=0)
+        eigvals_full = DMD_full.compute_decomp(
+            self.vec_handles, adv_vec_handles=self.adv_vec_handles)[0]
+        self.assertEqual(DMD.adv_vec_handles, self.adv_vec_handles)
+        for attr in ['correlation_array', 'cross_correlation_array']:
+            np.testing.assert_allclose(
+                getattr(DMD, attr), getattr(DMD_full, attr),
+                rtol=rtol, atol=atol)
+        np.testing.assert_allclose(
+            np.sort_complex(eigvals), np.sort_complex(eigvals_full),
+            rtol=rtol, atol=atol)
+
+        # Mixing sequential and non-sequential data is an error
+        self.assertRaises(ValueError, DMD.update_decomp, self.vec_handles[:1])
+
+
+    #@unittest.skip('Testing something else.')
+    def test_compute_decomp_and_modes(self):
+        """Test the decomposition, modes, and projections at once."""
+        rtol = 1e-8
+        atol = 1e-10
+        proj_vec_handles = self.adv_vec_handles[:3]
+        for adv_vec_handles in [None, self.adv_vec_handles]:
+            DMD_true = dmd.DMDHandles(inner_product=np.vdot, verbosity=0)
+            eigvals_true = DMD_true.compute_decomp(
+                self.vec_handles, adv_vec_handles=adv_vec_handles,
+                max_num_eigvals=None)[0]
+            DMD = dmd.DMDHandles(inner_product=np.vdot, verbosity=0)
+            mode_idxs = range(eigvals_true.size)
+            mode_handles = [
+                VecHandlePickle(self.adjoint_mode_path % i) for i in mode_idxs]
+            eigvals, R_low_order_eigvecs, L_low_order_eigvecs, \
+                proj_vec_coeffs = DMD.compute_decomp_and_modes(
+                    self.vec_handles, mode_idxs, mode_handles,
+                    adv_vec_handles=adv_vec_handles,
+                    proj_vec_handles=proj_vec_handles, mode_type='adjoint',
+                    max_num_eigvals=None)
+            np.testing.assert_allclose(
+                eigvals, eigvals_true, rtol=rtol, atol=atol)
+            for attr in ['correlation_array', 'cross_correlation_array']:
+                np.testing.assert_allclose(
+                    getattr(DMD, attr), getattr(DMD_true, attr),
+                    rtol=rtol, atol=atol)
+
+            # The projection coefficients are the inner products of the
+            # adjoint modes with the projected vecs
+            np.testing.assert_allclose(
+                proj_vec_coeffs, DMD.vec_space.compute_inner_product_array(
+                    mode_handles, proj_vec_handles),
+                rtol=rtol, atol=atol)
+        self.assertRaises(
+            ValueError, DMD.compute_decomp_and_modes, self.vec_handles,
+            mode_idxs, mode_handles, mode_type='other')
+
+
     #@unittest.skip('Testing something else.')
     def test_compute_modes(self):
         """Test building of modes."""
@@ -1074,8 +1169,10 @@ class TestTLSqrDMDHandles(unittest.TestCase):
         data_members_default = {
             'put_array': util.save_array_text,
             'get_array': util.load_array_text,
-            'verbosity': 0, 'eigvals': None, 'correlation_array': None,
+            'verbosity': 0, 'distributed_eigh': False, 'eigvals': None,
+            'correlation_array': None,
             'cross_correlation_array': None, 'adv_correlation_array': None,
+            'expanded_correlation_array': None,
             'sum_correlation_array': None, 'proj_correlation_array': None,
             'sum_correlation_array_eigvals': None,
             'sum_correlation_array_eigvecs': None,
@@ -1084,7 +1181,8 @@ class TestTLSqrDMDHandles(unittest.TestCase):
             'low_order_linear_map': None,
             'L_low_order_eigvecs': None, 'R_low_order_eigvecs': None,
             'spectral_coeffs': None, 'proj_coeffs': None, 'adv_proj_coeffs':
-            None, 'vec_handles': None, 'adv_vec_handles': None, 'vec_space':
+            None, 'proj_vec_coeffs': None, 'vec_handles': None,
+            'adv_vec_handles': None, 'vec_space':
             VectorSpaceHandles(inner_product=my_IP, verbosity=0)}
 
         # Get default data member values
@@ -1125,6 +1223,13 @@ class TestTLSqrDMDHandles(unittest.TestCase):
         for k,v in util.get_data_members(my_DMD).items():
             self.assertEqual(v, data_members_modified[k])
 
+        # Other options are passed to the vector space
+        my_DMD = dmd.TLSqrDMDHandles(
+            inner_product=my_IP, verbosity=0,
+            vec_space_kwargs={'prefetch_depth': 2, 'symm_schedule': 'tiles'})
+        self.assertEqual(my_DMD.vec_space.prefetch_depth, 2)
+        self.assertEqual(my_DMD.vec_space.symm_schedule, 'tiles')
+
 
     #@unittest.skip('Testing something else.')
     def test_puts_gets(self):
@@ -1424,6 +1529,77 @@ class TestTLSqrDMDHandles(unittest.TestCase):
             self.adv_vec_handles[:-1])
 
 
+    #@unittest.skip('Testing something else.')
+    def test_update_decomp(self):
+        """Test appending vectors gives the same correlation arrays."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_old = 6
+        attrs = [
+            'correlation_array', 'cross_correlation_array',
+            'adv_correlation_array', 'sum_correlation_array_eigvals']
+        for adv_vec_handles in [None, self.adv_vec_handles]:
+            TLSqrDMD = dmd.TLSqrDMDHandles(inner_product=np.vdot, verbosity=0)
+            TLSqrDMD_full = dmd.TLSqrDMDHandles(
+                inner_product=np.vdot, verbosity=0)
+            if adv_vec_handles is None:
+                TLSqrDMD.compute_decomp(self.vec_handles[:num_old])
+                TLSqrDMD.update_decomp(self.vec_handles[num_old:])
+                TLSqrDMD_full.compute_decomp(self.vec_handles)
+            else:
+                TLSqrDMD.compute_decomp(
+                    self.vec_handles[:num_old],
+                    adv_vec_handles=adv_vec_handles[:num_old])
+                TLSqrDMD.update_decomp(
+                    self.vec_handles[num_old:],
+                    new_adv_vec_handles=adv_vec_handles[num_old:])
+                TLSqrDMD_full.compute_decomp(
+                    self.vec_handles, adv_vec_handles=adv_vec_handles)
+            for attr in attrs:
+                np.testing.assert_allclose(
+                    getattr(TLSqrDMD, attr), getattr(TLSqrDMD_full, attr),
+                    rtol=rtol, atol=atol)
+
+
+    #@unittest.skip('Testing something else.')
+    def test_compute_decomp_and_modes(self):
+        """Test the decomposition, modes, and projections at once."""
+        rtol = 1e-8
+        atol = 1e-10
+        proj_vec_handles = self.adv_vec_handles[:3]
+        for adv_vec_handles in [None, self.adv_vec_handles]:
+            DMD_true = dmd.TLSqrDMDHandles(inner_product=np.vdot, verbosity=0)
+            eigvals_true = DMD_true.compute_decomp(
+                self.vec_handles, adv_vec_handles=adv_vec_handles,
+                max_num_eigvals=self.num_vecs // 2)[0]
+            DMD = dmd.TLSqrDMDHandles(inner_product=np.vdot, verbosity=0)
+            mode_idxs = range(eigvals_true.size)
+            mode_handles = [
+                VecHandlePickle(self.adjoint_mode_path % i) for i in mode_idxs]
+            eigvals, R_low_order_eigvecs, L_low_order_eigvecs, \
+                proj_vec_coeffs = DMD.compute_decomp_and_modes(
+                    self.vec_handles, mode_idxs, mode_handles,
+                    adv_vec_handles=adv_vec_handles,
+                    proj_vec_handles=proj_vec_handles, mode_type='adjoint',
+                    max_num_eigvals=self.num_vecs // 2)
+            np.testing.assert_allclose(
+                eigvals, eigvals_true, rtol=rtol, atol=atol)
+            for attr in ['correlation_array', 'cross_correlation_array']:
+                np.testing.assert_allclose(
+                    getattr(DMD, attr), getattr(DMD_true, attr),
+                    rtol=rtol, atol=atol)
+
+            # The projection coefficients are the inner products of the
+            # adjoint modes with the projected vecs
+            np.testing.assert_allclose(
+                proj_vec_coeffs, DMD.vec_space.compute_inner_product_array(
+                    mode_handles, proj_vec_handles),
+                rtol=rtol, atol=atol)
+        self.assertRaises(
+            ValueError, DMD.compute_decomp_and_modes, self.vec_handles,
+            mode_idxs, mode_handles, mode_type='other')
+
+
     #@unittest.skip('Testing something else.')
     def test_compute_modes(self):
         """Test building of modes."""
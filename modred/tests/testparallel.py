@@ -5,6 +5,8 @@ import os
 from os.path import join
 import copy
 
+import numpy as np
+
 from modred import parallel
 
 
@@ -113,6 +115,159 @@ class TestParallel(unittest.TestCase):
             add_and_scale, parallel.get_rank() + 1, 2, scale=3)
         self.assertEqual(outputs, (True, 9))
 
+        # Arrays are broadcast as buffers, alone or within tuples
+        array = parallel.call_and_bcast(
+            lambda rank: np.arange(6.).reshape(2, 3) * (rank + 1j),
+            parallel.get_rank())
+        np.testing.assert_equal(array, np.arange(6.).reshape(2, 3) * 1j)
+        outputs = parallel.call_and_bcast(
+            lambda rank: (np.ones(3) * rank, 'a', np.array(['b', None])),
+            parallel.get_rank())
+        np.testing.assert_equal(outputs[0], np.zeros(3))
+        self.assertEqual(outputs[1], 'a')
+        self.assertEqual(list(outputs[2]), ['b', None])
+
+
+    def test_allgather_array_blocks(self):
+        """Gather the blocks of an array computed by different MPI workers."""
+        num_procs = parallel.get_num_procs()
+        array_true = (
+            np.arange(num_procs * 12.).reshape(num_procs * 3, 4) * (1 + 2j))
+
+        # Each MPI worker computes the first three columns of three rows, and
+        # rank zero also the last column.  Messages are sent at once or split
+        # into pieces.
+        blocks = [(slice(self.rank * 3, (self.rank + 1) * 3), slice(None, 3))]
+        if self.rank == 0:
+            blocks.append((slice(None), slice(3, 4)))
+        for max_num_bytes in [None, 40]:
+            array = np.zeros(array_true.shape, dtype=complex)
+            for block in blocks:
+                array[block] = array_true[block]
+            array = parallel.allgather_array_blocks(
+                array, blocks, max_num_bytes=max_num_bytes)
+            np.testing.assert_equal(array, array_true)
+
+
+    def test_distributed_eigh(self):
+        """Compute leading eigenpairs of a Hermitian array on all workers."""
+        num_rows = 60
+        num_eigvals = 4
+        for is_complex in [False, True]:
+            # Same array, with decaying spectrum, on all MPI workers
+            def make_array():
+                rand_array = np.random.random((num_rows, num_rows))
+                if is_complex:
+                    rand_array = rand_array + 1j * np.random.random(
+                        (num_rows, num_rows))
+                basis = np.linalg.qr(rand_array)[0]
+                return basis.dot(np.diag(0.8 ** np.arange(num_rows))).dot(
+                    basis.conj().T)
+            array = parallel.call_and_bcast(make_array)
+            start, end = parallel.get_row_block_bounds(num_rows)
+
+            # Without convergence, the full array is decomposed instead
+            for max_num_iters in [1000, 1]:
+                eigvals, eigvecs = parallel.distributed_eigh(
+                    array[start:end], num_eigvals, is_positive_definite=True,
+                    max_num_iters=max_num_iters)
+                np.testing.assert_allclose(
+                    eigvals, 0.8 ** np.arange(num_eigvals), rtol=1e-8)
+                np.testing.assert_allclose(
+                    array.dot(eigvecs), eigvecs.dot(np.diag(eigvals)),
+                    atol=1e-8)
+
+                # Results are the same on all MPI workers
+                np.testing.assert_equal(
+                    parallel.call_and_bcast(lambda: eigvecs), eigvecs)
+
+        # The blocks of rows must make up a square array
+        self.assertRaises(
+            ValueError, parallel.distributed_eigh, np.zeros((2, 3)), 1)
+
+
+    def test_bcast_array(self):
+        """Broadcast an array from rank zero as a raw buffer."""
+        array_true = np.arange(6.).reshape(2, 3) * (1 + 1j)
+        array = parallel.bcast_array(array_true * (parallel.get_rank() + 1))
+        np.testing.assert_equal(array, array_true)
+
+
+    def test_tags(self):
+        """Test that message tags beyond the MPI limit are not allowed."""
+        tag_ub = parallel._tag_ub
+        try:
+            parallel._tag_ub = 10
+            with self.assertRaises(ValueError):
+                parallel.isend(None, dest=self.rank, tag=11)
+            with self.assertRaises(ValueError):
+                parallel.irecv(source=self.rank, tag=-1)
+        finally:
+            parallel._tag_ub = tag_ub
+
+
+    @unittest.skipIf(not distributed, 'Only test in parallel')
+    def test_irecv_before_isend(self):
+        """Test that receives can be started before the objects are sent."""
+        num_procs = parallel.get_num_procs()
+        dest = (self.rank + 1) % num_procs
+        source = (self.rank - 1) % num_procs
+        for step in range(3):
+            recv_request = parallel.irecv(source=source, tag=1)
+            send_request = parallel.isend(
+                np.ones(4) * self.rank + step, dest=dest, tag=1)
+            np.testing.assert_equal(
+                recv_request.wait(), np.ones(4) * source + step)
+            send_request.wait()
+
+
+    @unittest.skipIf(not distributed, 'Only test in parallel')
+    def test_isend_irecv(self):
+        """Pass arrays and other objects around a ring of MPI workers."""
+        num_procs = parallel.get_num_procs()
+        dest = (self.rank + 1) % num_procs
+        source = (self.rank - 1) % num_procs
+        memmap_path = 'files_parallel_memmap_DELETE_ME_%d.npy' % self.rank
+        bufs = None
+        try:
+            for num_rows in [3, 2, 4]:
+                objs = [
+                    (np.arange(num_rows * 5.).reshape(num_rows, 5) + rank,
+                    [np.ones(3, dtype=complex) * rank, 'vec', None],
+                    np.asfortranarray(np.ones((3, 2)) * rank),
+                    np.arange(12.).reshape(3, 4)[:, 1] + rank)
+                    for rank in [self.rank, source]]
+
+                # Memory-mapped arrays and non-contiguous views, like the
+                # vecs of the npy handles, are sent as raw buffers too
+                memmap = np.lib.format.open_memmap(
+                    memmap_path, mode='w+', shape=(num_rows, 6))
+                memmap[:] = np.arange(num_rows * 6.).reshape(num_rows, 6)
+                send_obj = objs[0] + (memmap, memmap[:, ::2])
+                send_request = parallel.isend(
+                    send_obj, dest=dest, tag=self.rank)
+                if parallel._pickle_out_of_band:
+                    self.assertEqual(len(send_request._bufs), 7)
+                recv_request = parallel.irecv(
+                    source=source, tag=source, bufs=bufs)
+                obj_recv = recv_request.wait()
+                send_request.wait()
+                np.testing.assert_equal(obj_recv[0], objs[1][0])
+                np.testing.assert_equal(obj_recv[1][0], objs[1][1][0])
+                self.assertEqual(obj_recv[1][1:], objs[1][1][1:])
+                np.testing.assert_equal(obj_recv[2], objs[1][2])
+                np.testing.assert_equal(obj_recv[3], objs[1][3])
+                np.testing.assert_equal(obj_recv[4], memmap)
+                self.assertIs(type(obj_recv[4]), np.ndarray)
+                np.testing.assert_equal(obj_recv[5], memmap[:, ::2])
+                del memmap, send_obj
+
+                # Reuse the receive buffers for the next object
+                bufs = recv_request.bufs
+        finally:
+            if os.path.exists(memmap_path):
+                os.remove(memmap_path)
+
 
 if __name__ == '__main__':
     unittest.main()
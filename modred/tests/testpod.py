@@ -101,6 +101,85 @@ class TestPODArraysFunctions(unittest.TestCase):
                         rtol=rtol, atol=atol)
 
 
+    def test_direct_method_randomized(self):
+        # Nearly rank 3 data, so the randomized SVD is accurate
+        vecs_array = (
+            np.random.random((self.num_states, 3)).dot(
+                np.random.random((3, self.num_vecs))) +
+            1e-10 * np.random.random((self.num_states, self.num_vecs)))
+        POD_res = pod.compute_POD_arrays_direct_method(vecs_array)
+        POD_res_rand = pod.compute_POD_arrays_direct_method(
+            vecs_array, num_modes=2, svd_method='randomized', seed=0)
+        self.assertEqual(POD_res_rand.modes.shape, (self.num_states, 2))
+        np.testing.assert_allclose(
+            POD_res_rand.eigvals, POD_res.eigvals[:2], rtol=1e-8)
+        np.testing.assert_allclose(
+            np.abs(POD_res_rand.modes.conj().T.dot(POD_res.modes[:, :2])),
+            np.identity(2), atol=1e-8)
+
+
+#@unittest.skip('Testing something else.')
+@unittest.skipIf(parallel.is_distributed(), 'Serial only.')
+class TestIncrementalPODArrays(unittest.TestCase):
+    def setUp(self):
+        self.num_states = 30
+        self.num_vecs = 10
+
+
+    def test_update(self):
+        rtol = 1e-10
+        atol = 1e-12
+
+        # Generate weights to test different inner products.
+        weights_1D = np.random.random(self.num_states)
+        weights_2D = np.identity(self.num_states, dtype=np.complex128)
+        weights_2D[0, 0] = 2.
+        weights_2D[2, 1] = 0.3j
+        weights_2D[1, 2] = weights_2D[2, 1].conj()
+        vecs_array = (
+            np.random.random((self.num_states, self.num_vecs)) +
+            1j * np.random.random((self.num_states, self.num_vecs)))
+
+        # Without truncation, adding vectors one at a time or in batches
+        # should reproduce the direct method.
+        for weights in [None, weights_1D, weights_2D]:
+            POD_res = pod.compute_POD_arrays_direct_method(
+                vecs_array, inner_product_weights=weights)
+            for batch_size in [1, 3]:
+                my_POD = pod.IncrementalPODArrays(
+                    inner_product_weights=weights)
+                for start in range(0, self.num_vecs, batch_size):
+                    my_POD.update(vecs_array[:, start:start + batch_size])
+                self.assertEqual(my_POD.num_vecs, self.num_vecs)
+                np.testing.assert_allclose(
+                    my_POD.eigvals, POD_res.eigvals, rtol=rtol, atol=atol)
+                modes = my_POD.compute_modes()
+                np.testing.assert_allclose(
+                    modes.dot(my_POD.compute_proj_coeffs()), vecs_array,
+                    rtol=rtol, atol=atol)
+
+                # Modes match up to a phase
+                vec_space = VectorSpaceArrays(weights=weights)
+                np.testing.assert_allclose(
+                    np.abs(vec_space.compute_inner_product_array(
+                        modes, POD_res.modes)),
+                    np.identity(self.num_vecs), rtol=rtol, atol=atol)
+
+        # Data that is nearly rank 3 is captured by a rank 3 basis
+        low_rank_vecs = (
+            np.random.random((self.num_states, 3)).dot(
+                np.random.random((3, self.num_vecs))) +
+            1e-8 * np.random.random((self.num_states, self.num_vecs)))
+        my_POD = pod.IncrementalPODArrays(max_num_modes=3, store_eigvecs=False)
+        for idx in range(self.num_vecs):
+            my_POD.update(low_rank_vecs[:, idx])
+        POD_res = pod.compute_POD_arrays_direct_method(low_rank_vecs)
+        self.assertEqual(my_POD.compute_modes().shape, (self.num_states, 3))
+        np.testing.assert_allclose(
+            my_POD.eigvals, POD_res.eigvals[:3], rtol=1e-6)
+        self.assertRaises(RuntimeError, my_POD.compute_proj_coeffs)
+
+
 #@unittest.skip('Testing something else.')
 class TestPODHandles(unittest.TestCase):
     def setUp(self):
@@ -148,8 +227,10 @@ class TestPODHandles(unittest.TestCase):
 
         data_members_default = {
             'put_array': util.save_array_text, 'get_array':util.load_array_text,
-            'verbosity': 0, 'eigvecs': None, 'eigvals': None,
+            'verbosity': 0, 'distributed_eigh': False, 'eigvecs': None,
+            'eigvals': None,
             'correlation_array': None, 'vec_handles': None, 'vecs': None,
+            'proj_vec_coeffs': None,
             'vec_space': VectorSpaceHandles(inner_product=my_IP, verbosity=0)}
         for k,v in util.get_data_members(
             pod.PODHandles(inner_product=my_IP, verbosity=0)).items():
@@ -189,6 +270,13 @@ class TestPODHandles(unittest.TestCase):
         for k,v in util.get_data_members(my_POD).items():
             self.assertEqual(v, data_members_modified[k])
 
+        # Other options are passed to the vector space
+        my_POD = pod.PODHandles(
+            inner_product=my_IP, verbosity=0,
+            vec_space_kwargs={'prefetch_depth': 2, 'symm_schedule': 'tiles'})
+        self.assertEqual(my_POD.vec_space.prefetch_depth, 2)
+        self.assertEqual(my_POD.vec_space.symm_schedule, 'tiles')
+
 
     #@unittest.skip('Testing something else.')
     def test_puts_gets(self):
@@ -262,6 +350,83 @@ class TestPODHandles(unittest.TestCase):
         np.testing.assert_equal(eigvecs, POD.eigvecs)
 
 
+    #@unittest.skip('Testing something else.')
+    def test_update_decomp(self):
+        """Test appending vectors gives the same decomposition."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_old = 6
+
+        POD = pod.PODHandles(inner_product=np.vdot, verbosity=0)
+        POD.compute_decomp(self.vec_handles[:num_old])
+        eigvals, eigvecs = POD.update_decomp(self.vec_handles[num_old:])
+        self.assertEqual(POD.vec_handles, self.vec_handles)
+        np.testing.assert_allclose(
+            POD.correlation_array,
+            POD.vec_space.compute_symm_inner_product_array(self.vec_handles),
+            rtol=rtol, atol=atol)
+        np.testing.assert_allclose(
+            self.vecs_array.conj().T.dot(self.vecs_array.dot(eigvecs)),
+            eigvecs.dot(np.diag(eigvals)), rtol=rtol, atol=atol)
+
+        # With no previous decomposition, this is the same as compute_decomp
+        POD = pod.PODHandles(inner_product=np.vdot, verbosity=0)
+        POD.update_decomp(self.vec_handles)
+        self.assertEqual(POD.vec_handles, self.vec_handles)
+
+
+    #@unittest.skip('Testing something else.')
+    def test_compute_decomp_and_modes(self):
+        """Test the decomposition, modes, and projections at once."""
+        rtol = 1e-10
+        atol = 1e-12
+        proj_vec_handles = [
+            VecHandlePickle(join(self.test_dir, 'proj_vec_%03d.pkl' % i))
+            for i in range(3)]
+        proj_vecs_array = parallel.call_and_bcast(
+            np.random.random, (self.num_states, len(proj_vec_handles)))
+        if parallel.is_rank_zero():
+            for idx, hdl in enumerate(proj_vec_handles):
+                hdl.put(proj_vecs_array[:, idx])
+        parallel.barrier()
+
+        # The inner products among the projected vecs are not needed, so they
+        # are not computed
+        proj_vecs_bytes = [
+            proj_vecs_array[:, idx].tobytes()
+            for idx in range(proj_vecs_array.shape[1])]
+        def checking_IP(vec1, vec2):
+            self.assertFalse(
+                vec1.tobytes() in proj_vecs_bytes and
+                vec2.tobytes() in proj_vecs_bytes)
+            return np.vdot(vec1, vec2)
+
+        POD_true = pod.PODHandles(inner_product=np.vdot, verbosity=0)
+        eigvals_true = POD_true.compute_decomp(self.vec_handles)[0]
+        POD = pod.PODHandles(inner_product=checking_IP, verbosity=0)
+        mode_idxs = range(eigvals_true.size)
+        mode_handles = [VecHandlePickle(self.mode_path % i) for i in mode_idxs]
+        eigvals, eigvecs, proj_vec_coeffs = POD.compute_decomp_and_modes(
+            self.vec_handles, mode_idxs, mode_handles,
+            proj_vec_handles=proj_vec_handles)
+        np.testing.assert_allclose(eigvals, eigvals_true, rtol=rtol, atol=atol)
+        np.testing.assert_allclose(
+            POD.correlation_array, POD_true.correlation_array,
+            rtol=rtol, atol=atol)
+
+        # The modes are orthonormal, and the projection coefficients are their
+        # inner products with the projected vecs
+        np.testing.assert_allclose(
+            POD.vec_space.compute_symm_inner_product_array(mode_handles),
+            np.eye(len(mode_handles)), rtol=rtol, atol=atol)
+        np.testing.assert_allclose(
+            proj_vec_coeffs, POD.vec_space.compute_inner_product_array(
+                mode_handles, proj_vec_handles),
+            rtol=rtol, atol=atol)
+        self.assertTrue(POD.compute_decomp_and_modes(
+            self.vec_handles, mode_idxs, mode_handles)[2] is None)
+
+
     #@unittest.skip('Testing something else.')
     def test_compute_modes(self):
         rtol = 1e-10
@@ -97,6 +97,83 @@ class TestUtil(unittest.TestCase):
                             np.testing.assert_equal(array_read, array)
 
 
+    #@unittest.skip('Testing something else.')
+    def test_get_available_memory(self):
+        """Test available memory is a positive number of bytes."""
+        num_bytes = util.get_available_memory()
+        if os.path.isfile('/proc/meminfo'):
+            self.assertTrue(num_bytes > 0)
+        else:
+            self.assertTrue(num_bytes is None or num_bytes >= 0)
+
+
+    #@unittest.skip('Testing something else.')
+    def test_make_temp_file(self):
+        """Test temporary files get the permissions of other new files."""
+        parallel.barrier()
+        file_desc, path = util.make_temp_file(
+            suffix='.txt', dir=self.test_dir)
+        os.close(file_desc)
+        other_path = join(self.test_dir, 'other_%d.txt' % parallel.get_rank())
+        open(other_path, 'w').close()
+        self.assertTrue(path.endswith('.txt'))
+        self.assertEqual(
+            os.path.abspath(os.path.dirname(path)),
+            os.path.abspath(self.test_dir))
+        self.assertEqual(
+            os.stat(path).st_mode & 0o777, os.stat(other_path).st_mode & 0o777)
+        os.remove(path)
+
+
+    #@unittest.skip('Testing something else.')
+    @unittest.skipIf(parallel.is_distributed(), 'Serial only')
+    def test_get_cgroup_available_memory(self):
+        """Test the memory limits of nested cgroups are found."""
+        # A batch job's cgroup, nested in a slice, in a cgroup v2 hierarchy,
+        # and a v1 memory hierarchy mounted from a container's cgroup
+        proc_dir = join(self.test_dir, 'proc')
+        v2_dir = os.path.abspath(join(self.test_dir, 'cgroup2'))
+        v1_dir = os.path.abspath(join(self.test_dir, 'memory'))
+        job_path = '/system.slice/job_5'
+        os.makedirs(proc_dir)
+        with open(join(proc_dir, 'cgroup'), 'w') as cgroup_file:
+            cgroup_file.write(
+                '4:memory:/container%s\n0::%s\n' % (job_path, job_path))
+        with open(join(proc_dir, 'mountinfo'), 'w') as mountinfo_file:
+            mountinfo_file.write(
+                '42 32 0:38 / %s rw,relatime - cgroup2 cgroup2 rw\n'
+                '36 32 0:32 /container %s rw,relatime - cgroup cgroup '
+                'rw,memory\n' % (v2_dir, v1_dir))
+        def write_cgroup(cgroup_dir, limit_name, limit, usage_name, usage):
+            if not os.path.isdir(cgroup_dir):
+                os.makedirs(cgroup_dir)
+            with open(join(cgroup_dir, limit_name), 'w') as limit_file:
+                limit_file.write('%s\n' % limit)
+            with open(join(cgroup_dir, usage_name), 'w') as usage_file:
+                usage_file.write('%d\n' % usage)
+        write_cgroup(
+            v2_dir + '/system.slice', 'memory.max', 'max', 'memory.current',
+            5000)
+        write_cgroup(
+            v2_dir + job_path, 'memory.max', 1000, 'memory.current', 400)
+        self.assertEqual(util._get_cgroup_available_memory(proc_dir), 600)
+
+        # The smallest remaining memory of the cgroup and its parents
+        write_cgroup(
+            v2_dir + '/system.slice', 'memory.max', 5300, 'memory.current',
+            5000)
+        self.assertEqual(util._get_cgroup_available_memory(proc_dir), 300)
+        write_cgroup(
+            v1_dir + job_path, 'memory.limit_in_bytes', 500,
+            'memory.usage_in_bytes', 400)
+        self.assertEqual(util._get_cgroup_available_memory(proc_dir), 100)
+
+        # Without limits
+        rmtree(v1_dir)
+        rmtree(v2_dir)
+        self.assertTrue(util._get_cgroup_available_memory(proc_dir) is None)
+
+
     #@unittest.skip('Testing something else.')
     @unittest.skipIf(parallel.is_distributed(), 'Only load arrays in serial')
     def test_svd(self):
@@ -176,6 +253,48 @@ class TestUtil(unittest.TestCase):
                                     > rtol))
 
 
+    #@unittest.skip('Testing something else.')
+    @unittest.skipIf(parallel.is_distributed(), 'Serial only')
+    def test_svd_randomized(self):
+        num_rows = 200
+        num_cols = 80
+        num_modes = 5
+
+        # Build an array with rapidly decaying singular values, for which a
+        # few power iterations give an accurate truncated SVD.
+        for is_complex in [False, True]:
+            left = np.linalg.qr(np.random.random((num_rows, num_cols)))[0]
+            right = np.linalg.qr(np.random.random((num_cols, num_cols)))[0]
+            if is_complex:
+                left = np.linalg.qr(
+                    left + 1j * np.random.random((num_rows, num_cols)))[0]
+            sing_vals_true = 2. ** -np.arange(num_cols)
+            array = left.dot(np.diag(sing_vals_true)).dot(right.T)
+
+            U, S, V = util.svd(
+                array, num_modes=num_modes, method='randomized', seed=1)
+            self.assertEqual(U.shape, (num_rows, num_modes))
+            self.assertEqual(V.shape, (num_cols, num_modes))
+            np.testing.assert_allclose(S, sing_vals_true[:num_modes])
+            np.testing.assert_allclose(
+                U.conj().T.dot(U), np.identity(num_modes), atol=1e-10)
+            np.testing.assert_allclose(
+                array.dot(V), U.dot(np.diag(S)), atol=1e-8)
+
+            # Same seed, same result
+            np.testing.assert_equal(
+                util.svd(
+                    array, num_modes=num_modes, method='randomized',
+                    seed=1)[1], S)
+
+            # The exact method also honors num_modes
+            np.testing.assert_allclose(
+                util.svd(array, num_modes=num_modes)[1], S)
+
+        self.assertRaises(ValueError, util.svd, array, method='randomized')
+        self.assertRaises(ValueError, util.svd, array, method='unknown')
+
+
     #@unittest.skip('Testing something else.')
     @unittest.skipIf(parallel.is_distributed(), 'Only load arrays in serial')
     def test_eigh(self):
@@ -279,6 +398,35 @@ class TestUtil(unittest.TestCase):
                             self.assertTrue(abs(eigvals).min() > atol)
 
 
+    #@unittest.skip('Testing something else.')
+    @unittest.skipIf(parallel.is_distributed(), 'Serial only')
+    def test_eigh_num_eigvals(self):
+        num_rows = 100
+
+        # Positive definite and indefinite Hermitian arrays
+        rand_array = (
+            np.random.random((num_rows, num_rows)) +
+            1j * np.random.random((num_rows, num_rows)))
+        pos_def_array = rand_array.dot(rand_array.conj().T)
+        indef_array = rand_array + rand_array.conj().T
+        for array, is_pos_def in [
+            (pos_def_array, True), (indef_array, False)]:
+            eigvals_full, eigvecs_full = util.eigh(
+                array, is_positive_definite=is_pos_def)
+
+            # Small counts use Lanczos, larger ones use subset_by_index
+            for num_eigvals in [5, 30, 60]:
+                eigvals, eigvecs = util.eigh(
+                    array, is_positive_definite=is_pos_def,
+                    num_eigvals=num_eigvals)
+                self.assertEqual(eigvals.size, num_eigvals)
+                np.testing.assert_allclose(
+                    eigvals, eigvals_full[:num_eigvals], rtol=1e-10)
+                np.testing.assert_allclose(
+                    array.dot(eigvecs), eigvecs.dot(np.diag(eigvals)),
+                    atol=1e-8)
+
+
     #@unittest.skip('Testing something else.')
     @unittest.skipIf(parallel.is_distributed(), 'Only load arrays in serial')
     def test_eig_biorthog(self):
@@ -10,7 +10,9 @@ import numpy as np
 
 from modred import vectorspace as vspc, parallel, util
 from modred.py2to3 import range
-from modred.vectors import Vector, VecHandleInMemory, VecHandlePickle
+from modred.vectors import (
+    Vector, VecHandleInMemory, VecHandlePickle, InnerProductBlockArrays,
+    VecHandleNpyColumn, create_npy_column_file)
 
 
 #@unittest.skip('Testing other things')
@@ -138,7 +140,13 @@ class TestVectorSpaceHandles(unittest.TestCase):
             'inner_product': np.vdot, 'max_vecs_per_node': 10000,
             'max_vecs_per_proc': (
                 10000 * parallel.get_num_nodes() // parallel.get_num_procs()),
-            'verbosity': 0, 'print_interval': 10, 'prev_print_time': 0.}
+            'verbosity': 0, 'print_interval': 10, 'prev_print_time': 0.,
+            'block_inner_product': None, 'sizeof': None, 'prefetch_depth': 0,
+            'bidirectional_ring': False, 'symm_schedule': 'rows',
+            'lin_combine_schedule': 'ring', 'pass_time': None,
+            'IP_cache_path': None, 'inner_product_key': None,
+            'checkpoint_dir': None, 'checkpoint_interval': 600,
+            'prev_checkpoint_time': 0.}
         parallel.barrier()
 
 
@@ -167,6 +175,559 @@ class TestVectorSpaceHandles(unittest.TestCase):
         self.assertEqual(util.get_data_members(vec_space), data_members)
 
 
+    #@unittest.skip('Testing other things')
+    @unittest.skipIf(parallel.is_distributed(), 'Serial only')
+    def test_plan_chunks(self):
+        """Test that memory is split between rows and columns."""
+        self.vec_space.max_vecs_per_proc = 10
+
+        # All rows fit in memory, so the rest is used for columns
+        plan = self.vec_space.plan_chunks(5, 20)
+        self.assertEqual(plan.num_rows_per_proc_chunk, 5)
+        self.assertEqual(plan.num_cols_per_proc_chunk, 5)
+        self.assertEqual(plan.num_row_get_loops, 1)
+        self.assertEqual(plan.num_col_get_loops, 4)
+        self.assertEqual(plan.num_gets_per_proc, 25)
+
+        # Rows don't fit, so columns only get memory that doesn't increase the
+        # number of row chunks.
+        plan = self.vec_space.plan_chunks(30, 20)
+        self.assertEqual(plan.num_rows_per_proc_chunk, 8)
+        self.assertEqual(plan.num_cols_per_proc_chunk, 2)
+        self.assertEqual(plan.num_row_get_loops, 4)
+        self.assertEqual(plan.num_gets_per_proc, 30 + 4 * 20)
+
+        # Copies of the col chunk take memory from the rows
+        plan = self.vec_space.plan_chunks(5, 20, num_extra_col_buffers=1)
+        self.assertEqual(plan.num_rows_per_proc_chunk, 6)
+        self.assertEqual(plan.num_cols_per_proc_chunk, 2)
+        self.assertEqual(plan.num_gets_per_proc, 25)
+
+        # No plan fits one row and the prefetched col chunks in memory
+        self.vec_space.max_vecs_per_proc = 3
+        self.vec_space.prefetch_depth = 2
+        self.assertRaises(ValueError, self.vec_space.plan_chunks, 5, 20)
+        self.vec_space.prefetch_depth = 1
+        plan = self.vec_space.plan_chunks(5, 20)
+        self.assertEqual(plan.num_rows_per_proc_chunk, 1)
+        self.assertEqual(plan.num_cols_per_proc_chunk, 1)
+
+
+    #@unittest.skip('Testing other things')
+    def test_max_vecs_auto(self):
+        """Test max_vecs_per_node is set from memory when first needed."""
+        vecs = parallel.call_and_bcast(np.random.random, (4, 10))
+        vec_handles = [VecHandleInMemory(vec) for vec in vecs]
+        IP_array_true = np.array([[np.vdot(v1, v2) for v2 in vecs]
+            for v1 in vecs])
+
+        # Huge vecs, so only the minimum of three vecs per proc fits
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot, max_vecs_per_node='auto', verbosity=0,
+            sizeof=lambda vec: 1e30)
+        self.assertIsNone(vec_space.max_vecs_per_proc)
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(vec_handles),
+            IP_array_true)
+        self.assertEqual(vec_space.max_vecs_per_proc, 3)
+
+        # Small vecs, limit is given by nbytes and the available memory
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot, max_vecs_per_node='auto', verbosity=0)
+        max_vecs_per_node = vec_space.set_max_vecs_from_memory(
+            vec_handles[0], num_scratch_vecs=0)
+        if util.get_available_memory() is not None:
+            self.assertTrue(
+                max_vecs_per_node <=
+                0.5 * util.get_available_memory() / vecs[0].nbytes + 1e3)
+        self.assertTrue(vec_space.max_vecs_per_proc >= 3)
+
+        self.assertRaises(
+            ValueError, vspc.VectorSpaceHandles, inner_product=np.vdot,
+            max_vecs_per_node='all', verbosity=0)
+
+
+    #@unittest.skip('Testing other things')
+    def test_prefetcher(self):
+        """Test chunks of vecs are retrieved in order and within budget."""
+        handle_chunks = [
+            [VecHandleInMemory(np.array([i, j])) for j in range(num_vecs)]
+            for i, num_vecs in enumerate([2, 1, 4, 0, 2])]
+        num_loaded = []
+        def get_vecs(handles):
+            num_loaded.append(prefetcher._num_loaded_vecs)
+            return [handle.get() for handle in handles]
+
+        for max_num_vecs in [0, 1, 2, 3]:
+            num_loaded = []
+            prefetcher = vspc._VecPrefetcher(
+                get_vecs, handle_chunks, max_num_vecs)
+            for chunk_index, handles in enumerate(handle_chunks):
+                vecs = prefetcher.get_vecs()
+                self.assertEqual(len(vecs), len(handles))
+                for vec_index, vec in enumerate(vecs):
+                    np.testing.assert_equal(vec, [chunk_index, vec_index])
+            prefetcher.close()
+
+            # Chunks larger than the budget are only retrieved on request,
+            # when nothing else is retrieved ahead of time.
+            if max_num_vecs > 0:
+                self.assertTrue(max(num_loaded) <= max(max_num_vecs, 4))
+
+        # Errors are raised when the failed chunk is requested
+        def get_vecs_error(handles):
+            if len(handles) == 4:
+                raise RuntimeError('Failed get')
+            return [handle.get() for handle in handles]
+        prefetcher = vspc._VecPrefetcher(get_vecs_error, handle_chunks, 10)
+        prefetcher.get_vecs()
+        prefetcher.get_vecs()
+        self.assertRaises(RuntimeError, prefetcher.get_vecs)
+        prefetcher.close()
+
+
+    #@unittest.skip('Testing other things')
+    def test_handle_loop_options(self):
+        """Test results are unchanged when prefetching vecs or passing them
+        in both directions."""
+        num_vecs = self.total_num_vecs_in_mem + 3
+        vecs = parallel.call_and_bcast(
+            lambda: [np.random.random(5) for i in range(num_vecs)])
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        if parallel.is_rank_zero():
+            for vec, handle in zip(vecs, vec_handles):
+                handle.put(vec)
+        parallel.barrier()
+        coeff_array = parallel.call_and_bcast(
+            np.random.random, (num_vecs, num_vecs // 2))
+        sum_vec_handles = [
+            VecHandlePickle(join(self.test_dir, 'sum_%03d.pkl' % i))
+            for i in range(num_vecs // 2)]
+
+        IP_array_true = np.array([[np.vdot(v1, v2) for v2 in vecs]
+            for v1 in vecs])
+        for prefetch_depth, bidirectional_ring in [
+            (1, False), (2, False), (0, True), (1, True)]:
+            vec_space = vspc.VectorSpaceHandles(
+                inner_product=np.vdot, verbosity=0,
+                prefetch_depth=prefetch_depth,
+                bidirectional_ring=bidirectional_ring)
+            vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+            np.testing.assert_allclose(
+                vec_space.compute_inner_product_array(
+                    vec_handles[:num_vecs // 2], vec_handles),
+                IP_array_true[:num_vecs // 2])
+            np.testing.assert_allclose(
+                vec_space.compute_symm_inner_product_array(vec_handles),
+                IP_array_true)
+            vec_space.lin_combine(sum_vec_handles, vec_handles, coeff_array)
+            parallel.barrier()
+            np.testing.assert_allclose(
+                np.array([handle.get() for handle in sum_vec_handles]),
+                np.array(vecs).T.dot(coeff_array).T)
+
+
+    #@unittest.skip('Testing other things')
+    def test_npy_column_handles(self):
+        """Test computations with vecs stored as columns of one file."""
+        num_vecs = self.total_num_vecs_in_mem + 3
+        vec_shape = (2, 3)
+        vecs = parallel.call_and_bcast(
+            lambda: [np.random.random(vec_shape) for i in range(num_vecs)])
+        vec_path = join(self.test_dir, 'vecs.npy')
+        vec_handles = [
+            VecHandleNpyColumn(vec_path, i) for i in range(num_vecs)]
+        if parallel.is_rank_zero():
+            create_npy_column_file(vec_path, vec_shape, num_vecs)
+        parallel.barrier()
+        for i in parallel.find_assignments(
+            list(range(num_vecs)))[parallel.get_rank()]:
+            vec_handles[i].put(vecs[i])
+        parallel.barrier()
+
+        IP_array_true = np.array([[np.vdot(v1, v2) for v2 in vecs]
+            for v1 in vecs])
+        for block_inner_product in [None, InnerProductBlockArrays()]:
+            vec_space = vspc.VectorSpaceHandles(
+                inner_product=np.vdot, verbosity=0,
+                block_inner_product=block_inner_product)
+            vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+            np.testing.assert_allclose(
+                vec_space.compute_symm_inner_product_array(vec_handles),
+                IP_array_true)
+
+
+    #@unittest.skip('Testing other things')
+    def test_symm_tiles(self):
+        """Test tiled computation of symmetric inner product arrays."""
+        # Every tile of the upper triangle is computed once, and consecutive
+        # tiles share a block
+        self.vec_space.prefetch_depth = 1
+        num_vecs = 23
+        plan = self.vec_space.plan_symm_tiles(num_vecs)
+        self.assertEqual(plan.tile_size, self.max_vecs_per_proc // 3)
+        num_blocks = int(np.ceil(num_vecs * 1. / plan.tile_size))
+        all_tiles = parallel.comm.allgather(plan.proc_tiles) if (
+            parallel.is_distributed()) else [plan.proc_tiles]
+        self.assertEqual(
+            sorted(tile for tiles in all_tiles for tile in tiles),
+            [(row_block, col_block) for row_block in range(num_blocks)
+            for col_block in range(row_block, num_blocks)])
+        for tile_loads in plan.proc_block_loads[1:]:
+            self.assertTrue(len(tile_loads) <= 1)
+        if not parallel.is_distributed():
+            self.assertEqual(
+                plan.num_gets_per_proc,
+                sum(min(plan.tile_size, num_vecs - block * plan.tile_size)
+                for tile_loads in plan.proc_block_loads
+                for block in tile_loads))
+
+        # A block inner product that stacks vecs gets room for its copies
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot, verbosity=0, prefetch_depth=1,
+            block_inner_product=InnerProductBlockArrays())
+        vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+        self.assertEqual(
+            vec_space.plan_symm_tiles(num_vecs).tile_size,
+            self.max_vecs_per_proc // 4)
+
+        num_vecs = self.total_num_vecs_in_mem + 3
+        vecs = parallel.call_and_bcast(
+            lambda: [
+                np.random.random(5) + 1j * np.random.random(5)
+                for i in range(num_vecs)])
+        vec_handles = [VecHandleInMemory(vec) for vec in vecs]
+        IP_array_true = np.array([[np.vdot(v1, v2) for v2 in vecs]
+            for v1 in vecs])
+        for block_inner_product in [None, InnerProductBlockArrays()]:
+            vec_space = vspc.VectorSpaceHandles(
+                inner_product=np.vdot, verbosity=0,
+                block_inner_product=block_inner_product,
+                symm_schedule='tiles')
+            vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+            np.testing.assert_allclose(
+                vec_space.compute_symm_inner_product_array(vec_handles),
+                IP_array_true)
+
+        self.assertRaises(
+            ValueError, vspc.VectorSpaceHandles, inner_product=np.vdot,
+            verbosity=0, symm_schedule='columns')
+
+
+    #@unittest.skip('Testing other things')
+    def test_IP_cache(self):
+        """Test inner products are reused from and added to the cache."""
+        num_vecs = 10
+        vecs = parallel.call_and_bcast(
+            lambda: [np.random.random(4) + 1j * np.random.random(4)
+            for i in range(num_vecs)])
+        vec_handles = [
+            VecHandlePickle(join(self.test_dir, 'cache_vec_%d.pkl' % i))
+            for i in range(num_vecs)]
+        if parallel.is_rank_zero():
+            for vec, vec_handle in zip(vecs, vec_handles):
+                vec_handle.put(vec)
+        parallel.barrier()
+        IP_array_true = np.array(
+            [[np.vdot(v1, v2) for v2 in vecs] for v1 in vecs])
+
+        # Count the distinct inner products computed by all MPI workers
+        computed_IPs = set()
+        def counting_IP(vec1, vec2):
+            computed_IPs.add((vec1.tobytes(), vec2.tobytes()))
+            return np.vdot(vec1, vec2)
+        def get_num_IPs():
+            all_computed_IPs = set(computed_IPs)
+            if parallel.is_distributed():
+                for proc_computed_IPs in parallel.comm.allgather(computed_IPs):
+                    all_computed_IPs |= proc_computed_IPs
+            computed_IPs.clear()
+            return len(all_computed_IPs)
+
+        cache_path = join(self.test_dir, 'IP_cache.npz')
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=counting_IP, verbosity=0, IP_cache_path=cache_path,
+            inner_product_key='vdot')
+        vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+
+        # Empty cache, then all inner products reused
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(vec_handles[:6]),
+            IP_array_true[:6, :6])
+        self.assertTrue(get_num_IPs() > 0)
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(vec_handles[5::-1]),
+            IP_array_true[5::-1, 5::-1])
+        self.assertEqual(get_num_IPs(), 0)
+
+        # Partially overlapping sets only compute the new inner products
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(vec_handles[:8]),
+            IP_array_true[:8, :8])
+        self.assertEqual(get_num_IPs(), 16)
+        np.testing.assert_allclose(
+            vec_space.compute_inner_product_array(
+                vec_handles[:3], vec_handles[7:]),
+            IP_array_true[:3, 7:])
+        self.assertEqual(get_num_IPs(), 6)
+        np.testing.assert_allclose(
+            vec_space.compute_inner_product_array(
+                vec_handles[7:], vec_handles[:2]),
+            IP_array_true[7:, :2])
+        self.assertEqual(get_num_IPs(), 0)
+
+        # Changing a vector invalidates its inner products
+        vecs[0] = vecs[0] * 2.
+        IP_array_true[0] *= 2.
+        IP_array_true[:, 0] *= 2.
+        if parallel.is_rank_zero():
+            # Make sure the modification time changes
+            os.utime(vec_handles[0].vec_path, (0, 0))
+            vec_handles[0].put(vecs[0])
+        parallel.barrier()
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(vec_handles[:4]),
+            IP_array_true[:4, :4])
+        self.assertEqual(get_num_IPs(), 4)
+
+        # A different inner product does not use the cache
+        vec_space.inner_product_key = 'other'
+        vec_space.compute_symm_inner_product_array(vec_handles[:2])
+        self.assertTrue(get_num_IPs() > 0)
+
+        # Handles without cache keys are computed without the cache
+        vec_space.compute_symm_inner_product_array(
+            [VecHandleInMemory(vec) for vec in vecs[:2]])
+        self.assertTrue(get_num_IPs() > 0)
+
+        # Several arrays only compute and cache the requested blocks
+        vec_space.IP_cache_path = join(self.test_dir, 'IP_cache_blocks.npz')
+        IP_arrays = vec_space.compute_inner_product_arrays(
+            [vec_handles[:3], vec_handles[3:7]], [(0, 0), (0, 1)])
+        np.testing.assert_allclose(IP_arrays[0], IP_array_true[:3, :3])
+        np.testing.assert_allclose(IP_arrays[1], IP_array_true[:3, 3:7])
+        keys, cache_array = parallel.call_and_bcast(
+            vec_space.get_cached_inner_products)
+        self.assertEqual(cache_array.shape, (7, 7))
+        self.assertEqual(np.isnan(cache_array).sum(), 16)
+
+        # The default key identifies functions by name and callable objects by
+        # their type and weights, and does not change as they are used
+        vec_space.inner_product_key = None
+        self.assertRaises(ValueError, vec_space._get_inner_product_key)
+        vec_space.inner_product = np.vdot
+        self.assertEqual(
+            vec_space._get_inner_product_key(),
+            vspc.VectorSpaceHandles(
+                inner_product=np.vdot, verbosity=0)._get_inner_product_key())
+        block_IP = InnerProductBlockArrays(weights=np.arange(4.))
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=block_IP, verbosity=0)
+        IP_key = vec_space._get_inner_product_key()
+        block_IP(vecs[:2], vecs[:3])
+        block_IP.stack(vecs[:2])
+        self.assertEqual(vec_space._get_inner_product_key(), IP_key)
+        self.assertNotEqual(
+            vspc.VectorSpaceHandles(inner_product=InnerProductBlockArrays(
+                weights=np.ones(4)), verbosity=0)._get_inner_product_key(),
+            IP_key)
+
+
+    #@unittest.skip('Testing other things')
+    def test_checkpoint(self):
+        """Test interrupted computations resume from their checkpoints."""
+        num_vecs = 12
+        vecs = parallel.call_and_bcast(
+            lambda: [np.random.random(4) for i in range(num_vecs)])
+        vec_handles = [
+            VecHandlePickle(join(self.test_dir, 'ckpt_vec_%d.pkl' % i))
+            for i in range(num_vecs)]
+        if parallel.is_rank_zero():
+            for vec, vec_handle in zip(vecs, vec_handles):
+                vec_handle.put(vec)
+        parallel.barrier()
+        IP_array_true = np.array(
+            [[np.vdot(v1, v2) for v2 in vecs] for v1 in vecs])
+
+        # Count the distinct inner products computed by all MPI workers
+        computed_IPs = set()
+        def counting_IP(vec1, vec2):
+            computed_IPs.add((vec1.tobytes(), vec2.tobytes()))
+            return np.vdot(vec1, vec2)
+        def get_num_IPs():
+            all_computed_IPs = set(computed_IPs)
+            if parallel.is_distributed():
+                for proc_computed_IPs in parallel.comm.allgather(computed_IPs):
+                    all_computed_IPs |= proc_computed_IPs
+            computed_IPs.clear()
+            return len(all_computed_IPs)
+
+        # Interrupt all MPI workers after their first checkpoint
+        class Interrupt(Exception):
+            pass
+        checkpoint_dir = join(self.test_dir, 'checkpoints')
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=counting_IP, verbosity=0,
+            checkpoint_dir=checkpoint_dir, checkpoint_interval=0)
+        vec_space.max_vecs_per_proc = 4
+        def interrupted_put_checkpoint(*args, **kwargs):
+            vspc.VectorSpaceHandles._put_checkpoint(
+                vec_space, *args, **kwargs)
+            raise Interrupt()
+
+        def compute_rect():
+            return vec_space.compute_inner_product_array(
+                vec_handles[:8], vec_handles)
+        def compute_symm():
+            return vec_space.compute_symm_inner_product_array(vec_handles)
+        for compute, IP_array_true_case, symm_schedule in [
+            (compute_rect, IP_array_true[:8], 'rows'),
+            (compute_symm, IP_array_true, 'rows'),
+            (compute_symm, IP_array_true, 'tiles')]:
+            vec_space.symm_schedule = symm_schedule
+            compute()
+            num_IPs_full = get_num_IPs()
+            vec_space._put_checkpoint = interrupted_put_checkpoint
+            self.assertRaises(Interrupt, compute)
+            del vec_space._put_checkpoint
+            get_num_IPs()
+            np.testing.assert_allclose(compute(), IP_array_true_case)
+            self.assertTrue(get_num_IPs() < num_IPs_full)
+            parallel.barrier()
+            self.assertEqual(os.listdir(checkpoint_dir), [])
+            parallel.barrier()
+
+        # Linear combinations resume with the partial sums
+        vec_space.max_vecs_per_proc = 3
+        vec_space.lin_combine_schedule = 'ring'
+        coeff_array = parallel.call_and_bcast(
+            np.random.random, (num_vecs, 5))
+        sum_vecs_true = np.array(vecs).T.dot(coeff_array)
+        sum_vec_handles = [
+            VecHandlePickle(join(self.test_dir, 'ckpt_sum_%d.pkl' % i))
+            for i in range(5)]
+        vec_space._put_checkpoint = interrupted_put_checkpoint
+        self.assertRaises(
+            Interrupt, vec_space.lin_combine, sum_vec_handles, vec_handles,
+            coeff_array)
+        del vec_space._put_checkpoint
+        vec_space.lin_combine(sum_vec_handles, vec_handles, coeff_array)
+        for sum_index, sum_vec_handle in enumerate(sum_vec_handles):
+            np.testing.assert_allclose(
+                sum_vec_handle.get(), sum_vecs_true[:, sum_index])
+        parallel.barrier()
+        self.assertEqual(os.listdir(checkpoint_dir), [])
+
+        # With the 'auto' schedule, a computation resumes with the schedule
+        # of its checkpoint, even if passing vecs now seems slow
+        vec_space._put_checkpoint = interrupted_put_checkpoint
+        self.assertRaises(
+            Interrupt, vec_space.lin_combine, sum_vec_handles, vec_handles,
+            coeff_array)
+        del vec_space._put_checkpoint
+        vec_space.lin_combine_schedule = 'auto'
+        vec_space.pass_time = 1e10
+        checkpoint_schedules = []
+        def find_checkpoint_signature(*args):
+            checkpoint_schedules.append(
+                vspc.VectorSpaceHandles._find_checkpoint_signature(
+                    vec_space, *args))
+            return checkpoint_schedules[-1]
+        vec_space._find_checkpoint_signature = find_checkpoint_signature
+        vec_space.lin_combine(sum_vec_handles, vec_handles, coeff_array)
+        self.assertEqual(checkpoint_schedules, ['ring'])
+        for sum_index, sum_vec_handle in enumerate(sum_vec_handles):
+            np.testing.assert_allclose(
+                sum_vec_handle.get(), sum_vecs_true[:, sum_index])
+        parallel.barrier()
+        self.assertEqual(os.listdir(checkpoint_dir), [])
+        del vec_space._find_checkpoint_signature
+
+        # Handles without cache keys do not resume a checkpoint, so a
+        # computation with different vectors is not resumed from another's
+        other_vecs = parallel.call_and_bcast(
+            lambda: [np.random.random(4) for i in range(num_vecs)])
+        vec_space.symm_schedule = 'rows'
+        vec_space.max_vecs_per_proc = 4
+        vec_space._put_checkpoint = interrupted_put_checkpoint
+        self.assertRaises(
+            Interrupt, vec_space.compute_symm_inner_product_array,
+            [VecHandleInMemory(vec) for vec in vecs])
+        del vec_space._put_checkpoint
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(
+                [VecHandleInMemory(vec) for vec in other_vecs]),
+            np.array([[np.vdot(v1, v2) for v2 in other_vecs]
+                for v1 in other_vecs]))
+        parallel.barrier()
+        self.assertEqual(os.listdir(checkpoint_dir), [])
+
+
+    #@unittest.skip('Testing other things')
+    @unittest.skipIf(not parallel.is_distributed(), 'Only test in parallel')
+    def test_groups(self):
+        """Test vectors distributed among the MPI workers of groups."""
+        num_world_procs = parallel.get_num_procs()
+        if num_world_procs % 2 == 0:
+            group_size = 2
+        else:
+            group_size = num_world_procs
+        num_states = 11
+        num_vecs = 9
+        vecs = parallel.call_and_bcast(
+            np.random.random, (num_states, num_vecs))
+        coeff_array = parallel.call_and_bcast(np.random.random, (num_vecs, 4))
+        parallel.init_groups(group_size)
+        try:
+            self.assertEqual(
+                parallel.get_num_procs(), num_world_procs // group_size)
+            self.assertEqual(
+                parallel.get_world_rank(),
+                parallel.get_rank() * group_size + parallel.get_group_rank())
+
+            # Each MPI worker of a group holds some of the states
+            state_slice = slice(
+                parallel.get_group_rank() * num_states // group_size,
+                (parallel.get_group_rank() + 1) * num_states // group_size)
+            vec_handles = [
+                VecHandleInMemory(vecs[state_slice, vec_index])
+                for vec_index in range(num_vecs)]
+            vec_space = vspc.VectorSpaceHandles(
+                inner_product=np.vdot, verbosity=0)
+            vec_space.max_vecs_per_proc = 3
+            np.testing.assert_allclose(
+                vec_space.compute_inner_product_array(
+                    vec_handles[:4], vec_handles),
+                vecs[:, :4].T.dot(vecs))
+            np.testing.assert_allclose(
+                vec_space.compute_symm_inner_product_array(vec_handles),
+                vecs.T.dot(vecs))
+
+            # The parts of the sums are put by the workers of one group
+            sum_vec_handles = [VecHandleInMemory() for i in range(4)]
+            vec_space.lin_combine(sum_vec_handles, vec_handles, coeff_array)
+            sums_true = vecs.dot(coeff_array)
+            num_sums_put = 0
+            for sum_index, sum_vec_handle in enumerate(sum_vec_handles):
+                if sum_vec_handle.vec is not None:
+                    np.testing.assert_allclose(
+                        sum_vec_handle.vec, sums_true[state_slice, sum_index])
+                    num_sums_put += 1
+            self.assertEqual(
+                parallel.world_comm.allreduce(num_sums_put), 4 * group_size)
+
+            # Collective gets cannot run in a background thread
+            if group_size > 1:
+                vec_space.prefetch_depth = 1
+                self.assertRaises(
+                    ValueError, vec_space.compute_symm_inner_product_array,
+                    vec_handles)
+        finally:
+            parallel.init_groups(1)
+        self.assertEqual(parallel.get_num_procs(), num_world_procs)
+
+
     #@unittest.skip('Testing other things')
     def test_sanity_check(self):
         """Tests correctly checks user-supplied objects and functions."""
@@ -359,6 +920,108 @@ class TestVectorSpaceHandles(unittest.TestCase):
             coeffs_array_too_fat)
 
 
+    #@unittest.skip('Testing other things')
+    def test_lin_combine_array_sums(self):
+        """Test linear combinations of arrays as matrix multiplications."""
+        num_bases = 7
+        num_sums = 4
+        basis_vecs = parallel.call_and_bcast(
+            lambda: [np.random.random((3, 2)).astype(np.float32)
+            for i in range(num_bases)])
+        coeff_array = parallel.call_and_bcast(
+            lambda: np.random.random((num_bases, num_sums)) +
+            1j * np.random.random((num_bases, num_sums)))
+        basis_vec_handles = [VecHandleInMemory(vec) for vec in basis_vecs]
+        sum_vec_handles = [VecHandleInMemory() for i in range(num_sums)]
+        vec_space = vspc.VectorSpaceHandles(verbosity=0)
+        vec_space.max_vecs_per_proc = 4
+        vec_space.lin_combine(sum_vec_handles, basis_vec_handles, coeff_array)
+        for sum_index in parallel.find_assignments(
+            list(range(num_sums)))[parallel.get_rank()]:
+            sum_vec = sum_vec_handles[sum_index].get()
+            self.assertEqual(sum_vec.shape, (3, 2))
+            self.assertEqual(sum_vec.dtype, np.complex128)
+
+            # Sums do not keep the block of all sums in memory
+            self.assertIsNone(sum_vec.base)
+            np.testing.assert_allclose(
+                sum_vec, sum(
+                    basis_vec * coeff for basis_vec, coeff in zip(
+                        basis_vecs, coeff_array[:, sum_index])),
+                rtol=1e-6)
+
+        # Array subclasses, e.g., memory-mapped vecs, are stacked too
+        memmap_path = join(self.test_dir, 'memmap_%d.npy' % parallel.get_rank())
+        memmap = np.lib.format.open_memmap(
+            memmap_path, mode='w+', shape=(3, 2))
+        memmap[:] = basis_vecs[0]
+        np.testing.assert_allclose(
+            vspc._add_array_sums(None, [memmap], np.ones((1, 2))),
+            np.tile(basis_vecs[0].reshape(-1, 1), (1, 2)))
+        del memmap
+
+        # Vecs that are not numpy arrays of the same size are not stacked
+        self.assertTrue(vspc._add_array_sums(
+            None, [np.ones(3), np.ones(4)], np.ones((2, 1))) is None)
+        self.assertTrue(vspc._add_array_sums(
+            np.zeros((4, 1)), [np.ones(3)], np.ones((1, 1))) is None)
+        self.assertTrue(vspc._add_array_sums(
+            None, [[1., 2., 3.]], np.ones((1, 1))) is None)
+
+
+    #@unittest.skip('Testing other things')
+    def test_lin_combine_schedules(self):
+        """Test linear combinations with basis vecs passed or streamed."""
+        num_bases = 9
+        num_sums = 5
+        basis_vecs = parallel.call_and_bcast(
+            lambda: [np.random.random(6) for i in range(num_bases)])
+        coeff_array = parallel.call_and_bcast(
+            np.random.random, (num_bases, num_sums))
+
+        # Sums that need only some of the basis vecs, or none of them
+        coeff_array[:5, 1] = 0.
+        coeff_array[4:, 2] = 0.
+        coeff_array[:, 3] = 0.
+        basis_vec_handles = [VecHandleInMemory(vec) for vec in basis_vecs]
+        for schedule in ['ring', 'stream', 'auto']:
+            sum_vec_handles = [VecHandleInMemory() for i in range(num_sums)]
+            vec_space = vspc.VectorSpaceHandles(
+                verbosity=0, lin_combine_schedule=schedule)
+            vec_space.max_vecs_per_proc = 4
+            vec_space.lin_combine(
+                sum_vec_handles, basis_vec_handles, coeff_array)
+            for sum_index in parallel.find_assignments(
+                list(range(num_sums)))[parallel.get_rank()]:
+                np.testing.assert_allclose(
+                    sum_vec_handles[sum_index].get(),
+                    np.array(basis_vecs).T.dot(coeff_array[:, sum_index]))
+
+        # The time to pass vecs is only measured once, and only in parallel
+        pass_time = vec_space.pass_time
+        self.assertEqual(pass_time is None, not parallel.is_distributed())
+        vec_space.lin_combine(sum_vec_handles, basis_vec_handles, coeff_array)
+        self.assertEqual(vec_space.pass_time, pass_time)
+
+        # Only the chosen plan is printed
+        msgs = []
+        vec_space.print_msg = lambda msg, **kwargs: msgs.append(msg)
+        vec_space.lin_combine(sum_vec_handles, basis_vec_handles, coeff_array)
+        self.assertEqual(
+            len([msg for msg in msgs if msg.startswith('Chunking plan')]), 1)
+        del vec_space.print_msg
+
+        # Without passes, all memory is used for one proc's vecs
+        vec_space.max_vecs_per_proc = 10
+        plan = vec_space.plan_chunks(1, 20, pass_cols=False)
+        self.assertEqual(plan.num_cols_per_proc_chunk, 7)
+        self.assertEqual(plan.num_gets_per_proc, 1 + 20)
+        self.assertEqual(plan.num_passes_per_proc, 0)
+        self.assertRaises(
+            ValueError, vspc.VectorSpaceHandles, verbosity=0,
+            lin_combine_schedule='other')
+
+
     #@unittest.skip('Testing other things')
     @unittest.skipIf(parallel.is_distributed(), 'Serial only')
     def test_compute_inner_product_array_types(self):
@@ -474,5 +1137,162 @@ class TestVectorSpaceHandles(unittest.TestCase):
                     product_computed, product_true, rtol=rtol, atol=atol)
 
 
+    #@unittest.skip('Testing other things')
+    def test_compute_inner_product_arrays_block(self):
+        """Test computation of inner products using a block inner product."""
+        rtol = 1e-10
+        atol = 1e-12
+
+        num_row_vecs = self.total_num_vecs_in_mem + 3
+        num_col_vecs = self.total_num_vecs_in_mem // 2 + 1
+        vec_shape = (4, 3)
+        weights = parallel.call_and_bcast(np.random.random, vec_shape)
+
+        row_vec_path = join(self.test_dir, 'row_vec_%03d.pkl')
+        col_vec_path = join(self.test_dir, 'col_vec_%03d.pkl')
+        row_vecs = parallel.call_and_bcast(
+            lambda: [
+                np.random.random(vec_shape) + 1j * np.random.random(vec_shape)
+                for i in range(num_row_vecs)])
+        col_vecs = parallel.call_and_bcast(
+            lambda: [
+                np.random.random(vec_shape) for i in range(num_col_vecs)])
+        row_vec_handles = [
+            VecHandlePickle(row_vec_path % i) for i in range(num_row_vecs)]
+        col_vec_handles = [
+            VecHandlePickle(col_vec_path % i) for i in range(num_col_vecs)]
+        if parallel.is_rank_zero():
+            for vec, handle in zip(row_vecs, row_vec_handles):
+                handle.put(vec)
+            for vec, handle in zip(col_vecs, col_vec_handles):
+                handle.put(vec)
+        parallel.barrier()
+
+        def weighted_IP(vec1, vec2):
+            return np.vdot(vec1, weights * vec2)
+
+        # Use the block inner product alone, and together with a regular
+        # inner product
+        for inner_product in [None, weighted_IP]:
+            vec_space = vspc.VectorSpaceHandles(
+                inner_product=inner_product,
+                block_inner_product=InnerProductBlockArrays(weights=weights),
+                verbosity=0)
+            vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+
+            product_true = np.array([
+                [weighted_IP(row_vec, col_vec) for col_vec in col_vecs]
+                for row_vec in row_vecs])
+            np.testing.assert_allclose(
+                vec_space.compute_inner_product_array(
+                    row_vec_handles, col_vec_handles),
+                product_true, rtol=rtol, atol=atol)
+            np.testing.assert_allclose(
+                vec_space.compute_inner_product_array(
+                    col_vec_handles, row_vec_handles),
+                product_true.conj().T, rtol=rtol, atol=atol)
+
+            symm_product_true = np.array([
+                [weighted_IP(row_vec, col_vec) for col_vec in row_vecs]
+                for row_vec in row_vecs])
+            np.testing.assert_allclose(
+                vec_space.compute_symm_inner_product_array(row_vec_handles),
+                symm_product_true, rtol=rtol, atol=atol)
+
+
+    #@unittest.skip('Testing other things')
+    def test_compute_joint_inner_product_arrays(self):
+        """Test computation of several inner product arrays in one pass."""
+        rtol = 1e-10
+        atol = 1e-12
+
+        num_vecs_list = [
+            self.total_num_vecs_in_mem + 1,
+            self.total_num_vecs_in_mem // 2 + 1,
+            parallel.get_num_procs() + 2]
+        num_states = 7
+        vec_paths = [
+            join(self.test_dir, 'vec_%d_%%03d.pkl' % list_index)
+            for list_index in range(len(num_vecs_list))]
+        vec_arrays = [
+            parallel.call_and_bcast(np.random.random, (num_states, num_vecs))
+            + 1j * parallel.call_and_bcast(
+                np.random.random, (num_states, num_vecs))
+            for num_vecs in num_vecs_list]
+        vec_handles_lists = [
+            [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+            for vec_path, num_vecs in zip(vec_paths, num_vecs_list)]
+        # The last list appears in no pair, so its vecs are not saved.  They
+        # would raise an error if they were retrieved.
+        if parallel.is_rank_zero():
+            for vec_array, vec_handles in zip(
+                vec_arrays[:2], vec_handles_lists[:2]):
+                for i, handle in enumerate(vec_handles):
+                    handle.put(vec_array[:, i])
+        parallel.barrier()
+
+        index_pairs = [(0, 0), (0, 1), (1, 1), (1, 0)]
+        for symm_schedule in ['rows', 'tiles']:
+            vec_space = vspc.VectorSpaceHandles(
+                inner_product=np.vdot, symm_schedule=symm_schedule,
+                verbosity=0)
+            vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+            IP_arrays = vec_space.compute_inner_product_arrays(
+                vec_handles_lists, index_pairs)
+            self.assertEqual(len(IP_arrays), len(index_pairs))
+            for (row_index, col_index), IP_array in zip(
+                index_pairs, IP_arrays):
+                np.testing.assert_allclose(
+                    IP_array,
+                    vec_arrays[row_index].conj().T.dot(vec_arrays[col_index]),
+                    rtol=rtol, atol=atol)
+
+        # Pairs must refer to lists that are given
+        with self.assertRaises(ValueError):
+            self.vec_space.compute_inner_product_arrays(
+                vec_handles_lists[:2], [(0, 2)])
+
+        # Each chunk of rows is retrieved once for all of its blocks, so there
+        # are fewer gets than with separate arrays, and the blocks that are
+        # not requested are not computed
+        num_gets = [0]
+        class CountingVecHandle(VecHandleInMemory):
+            def _get(self):
+                num_gets[0] += 1
+                return VecHandleInMemory._get(self)
+        computed_IPs = []
+        def counting_IP(vec1, vec2):
+            computed_IPs.append((vec1[0], vec2[0]))
+            return np.vdot(vec1, vec2)
+        def get_total(num):
+            if parallel.is_distributed():
+                return parallel.comm.allreduce(num)
+            return num
+        num_vecs = 3 * self.max_vecs_per_proc
+        vec_handles_lists = [
+            [CountingVecHandle(np.array([list_index, i]))
+            for i in range(num_vecs)]
+            for list_index in range(2)]
+        for symm_schedule in ['rows', 'tiles']:
+            vec_space = vspc.VectorSpaceHandles(
+                inner_product=counting_IP, symm_schedule=symm_schedule,
+                verbosity=0)
+            vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+            num_gets[0] = 0
+            IP_arrays = vec_space.compute_inner_product_arrays(
+                vec_handles_lists, [(0, 0), (0, 1)])
+            num_joint_gets = get_total(num_gets[0])
+            self.assertNotIn((1, 1), computed_IPs)
+            num_gets[0] = 0
+            np.testing.assert_equal(
+                IP_arrays[0],
+                vec_space.compute_symm_inner_product_array(
+                    vec_handles_lists[0]))
+            np.testing.assert_equal(
+                IP_arrays[1],
+                vec_space.compute_inner_product_array(*vec_handles_lists))
+            self.assertLess(num_joint_gets, get_total(num_gets[0]))
+
+
 if __name__=='__main__':
     unittest.main()
@@ -1,11 +1,13 @@
 """A group of useful functions"""
 import inspect
 import os
+import tempfile
 
 import numpy as np
 from numpy import polymul, polyadd
 import scipy
 import scipy.linalg
+import scipy.sparse.linalg
 import scipy.signal
 
 from .py2to3 import range
@@ -138,6 +140,165 @@ def get_file_list(directory, file_extension=None):
         return files
 
 
+def make_temp_file(suffix='', dir=None):
+    """Creates a temporary file like :py:func:`tempfile.mkstemp`, but with the
+    permissions of other new files, i.e., ``0o666`` without the bits set in
+    the umask, rather than ``0o600``.
+
+    Kwargs:
+        ``suffix``: End of the file name.
+
+        ``dir``: Directory in which the file is created.
+
+    Returns:
+        ``file_desc``: OS-level handle of the file, open for writing.
+
+        ``path``: Path to the file.
+
+    Files written to a temporary file and then renamed, so that they are never
+    partially written, thus get the usual permissions, e.g., to be shared in a
+    project directory.
+    """
+    file_desc, path = tempfile.mkstemp(suffix=suffix, dir=dir)
+    try:
+        os.chmod(path, 0o666 & ~_get_umask())
+    except:
+        os.close(file_desc)
+        os.remove(path)
+        raise
+    return file_desc, path
+
+
+def _get_umask():
+    """Returns the umask of this process.  It is read from
+    ``/proc/self/status`` where possible, since setting the umask to read it
+    affects other threads."""
+    try:
+        with open('/proc/self/status') as status_file:
+            for line in status_file:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def get_available_memory():
+    """Returns the memory available on this node, in bytes.
+
+    Returns:
+        ``num_bytes``: Available memory, given by ``MemAvailable`` in
+        ``/proc/meminfo`` and limited by the remaining memory of this process's
+        cgroup (e.g., container or batch job) and its parents, if they have
+        limits.  ``None`` if neither can be read.
+    """
+    available = []
+    try:
+        with open('/proc/meminfo') as meminfo_file:
+            meminfo = dict(
+                line.split(':', 1) for line in meminfo_file if ':' in line)
+        for key in ['MemAvailable', 'MemFree']:
+            if key in meminfo:
+                available.append(int(meminfo[key].split()[0]) * 1024)
+                break
+    except (IOError, OSError, ValueError):
+        pass
+    cgroup_available = _get_cgroup_available_memory()
+    if cgroup_available is not None:
+        available.append(cgroup_available)
+    if len(available) == 0:
+        return None
+    return min(available)
+
+
+def _get_cgroup_available_memory(proc_dir='/proc/self'):
+    """Returns the smallest remaining memory, in bytes, of the memory cgroups
+    of the process whose ``/proc`` directory is ``proc_dir`` and of their
+    parents, or None if none of them has a limit.
+
+    The cgroups are found from ``cgroup`` in ``proc_dir``, e.g.,
+    ``/system.slice/slurmstepd.scope/job_5`` for a batch job, and are looked
+    up under the cgroup mounts in ``mountinfo``.  Both cgroup v2
+    (``memory.max``) and v1 (``memory.limit_in_bytes``) are read.  An
+    unlimited cgroup has a limit of "max" (v2) or a very large number (v1).
+    """
+    # Paths of the v2 cgroup and of the v1 memory cgroup
+    cgroup_paths = {}
+    try:
+        with open(os.path.join(proc_dir, 'cgroup')) as cgroup_file:
+            for line in cgroup_file:
+                fields = line.rstrip('\n').split(':', 2)
+                if len(fields) < 3:
+                    continue
+                if fields[0] == '0' and fields[1] == '':
+                    cgroup_paths['cgroup2'] = fields[2]
+                elif 'memory' in fields[1].split(','):
+                    cgroup_paths['cgroup'] = fields[2]
+    except (IOError, OSError):
+        pass
+
+    # Mount points of the cgroup filesystems, with the cgroup at the root of
+    # each mount, which is not "/" in some containers
+    mounts = []
+    try:
+        with open(os.path.join(proc_dir, 'mountinfo')) as mountinfo_file:
+            for line in mountinfo_file:
+                fields = line.split()
+                if '-' not in fields:
+                    continue
+                fs_fields = fields[fields.index('-') + 1:]
+                if len(fs_fields) < 3:
+                    continue
+                if fs_fields[0] == 'cgroup2' or (
+                    fs_fields[0] == 'cgroup' and
+                    'memory' in fs_fields[2].split(',')):
+                    mounts.append((fs_fields[0], fields[4], fields[3]))
+    except (IOError, OSError, IndexError):
+        mounts = [
+            ('cgroup2', '/sys/fs/cgroup', '/'),
+            ('cgroup', '/sys/fs/cgroup/memory', '/')]
+
+    available = []
+    for fs_type, mount_point, mount_root in mounts:
+        if fs_type == 'cgroup2':
+            limit_name, usage_name = 'memory.max', 'memory.current'
+        else:
+            limit_name, usage_name = (
+                'memory.limit_in_bytes', 'memory.usage_in_bytes')
+        cgroup_path = cgroup_paths.get(fs_type, '/')
+        if mount_root != '/' and (
+            cgroup_path == mount_root or
+            cgroup_path.startswith(mount_root + '/')):
+            cgroup_path = cgroup_path[len(mount_root):]
+
+        # Check the cgroup and its parents up to the mount point.  If the
+        # cgroup is not visible (e.g., in a container), only its visible
+        # parents are checked.
+        cgroup_dir = os.path.normpath(
+            os.path.join(mount_point, cgroup_path.lstrip('/')))
+        while True:
+            try:
+                with open(os.path.join(cgroup_dir, limit_name)) as limit_file:
+                    limit = limit_file.read().strip()
+                with open(os.path.join(cgroup_dir, usage_name)) as usage_file:
+                    usage = int(usage_file.read().strip())
+                if limit.isdigit():
+                    available.append(max(int(limit) - usage, 0))
+            except (IOError, OSError, ValueError):
+                pass
+            if (
+                cgroup_dir == os.path.normpath(mount_point) or
+                os.path.dirname(cgroup_dir) == cgroup_dir):
+                break
+            cgroup_dir = os.path.dirname(cgroup_dir)
+
+    if len(available) == 0:
+        return None
+    return min(available)
+
+
 def get_data_members(obj):
     """Returns a dictionary containing data members of ``obj``."""
     data_members = {}
@@ -192,7 +353,9 @@ class InnerProductBlock(object):
         return IP_array
 
 
-def svd(array, atol=1e-13, rtol=None):
+def svd(
+    array, atol=1e-13, rtol=None, num_modes=None, method='exact',
+    oversampling=10, num_power_iters=2, seed=None):
     """Wrapper for ``numpy.linalg.svd``, computes the singular value
     decomposition of an array.
 
@@ -205,6 +368,24 @@ def svd(array, atol=1e-13, rtol=None):
         ``rtol``: Maximum relative difference between largest and smallest
         singular values.  Smaller ones are truncated.
 
+        ``num_modes``: Maximum number of singular values (and vectors) to
+        return.  If None, all that satisfy ``atol`` and ``rtol`` are returned.
+
+        ``method``: ``'exact'`` computes the full (thin) SVD.
+        ``'randomized'`` computes only the leading ``num_modes`` singular
+        values with a randomized range finder, which is much faster when
+        ``num_modes`` is small compared to the dimensions of ``array``.
+
+        ``oversampling``: Number of extra random samples used by the
+        randomized method.
+
+        ``num_power_iters``: Number of power iterations used by the randomized
+        method.  More iterations improve accuracy when the singular values
+        decay slowly.
+
+        ``seed``: Seed for the random number generator used by the randomized
+        method, for reproducible results.
+
     Returns:
         ``U``: Array whose columns are left singular vectors.
 
@@ -214,9 +395,28 @@ def svd(array, atol=1e-13, rtol=None):
 
     Truncates ``U``, ``S``, and ``V`` such that the singular values
     obey both ``atol`` and ``rtol``.
+
+    The randomized method (Halko, Martinsson, and Tropp, 2011) multiplies
+    ``array`` by ``num_modes + oversampling`` random vectors, refines the
+    resulting range with ``num_power_iters`` power iterations, and takes the
+    SVD of ``array`` projected onto that range.  If the number of samples is
+    not smaller than both dimensions of ``array``, the exact SVD is computed
+    instead.
     """
-    # Compute SVD (force data to be array)
-    U, S, V_conj_T = np.linalg.svd(np.array(array), full_matrices=False)
+    array = np.array(array)
+    if method == 'exact':
+        U, S, V_conj_T = np.linalg.svd(array, full_matrices=False)
+    elif method == 'randomized':
+        if num_modes is None:
+            raise ValueError('num_modes must be given for a randomized SVD.')
+        num_samples = num_modes + oversampling
+        if num_samples >= min(array.shape):
+            U, S, V_conj_T = np.linalg.svd(array, full_matrices=False)
+        else:
+            U, S, V_conj_T = _randomized_svd(
+                array, num_samples, num_power_iters, seed)
+    else:
+        raise ValueError('Invalid SVD method %s' % method)
     V = V_conj_T.conj().T
 
     # Figure out how many singular values satisfy the tolerances
@@ -230,6 +430,8 @@ def svd(array, atol=1e-13, rtol=None):
         num_nonzeros = min(num_nonzeros_atol, num_nonzeros_rtol)
     else:
         num_nonzeros = num_nonzeros_atol
+    if num_modes is not None:
+        num_nonzeros = min(num_nonzeros, num_modes)
 
     # Truncate arrays according to tolerances
     U = U[:, :num_nonzeros]
@@ -239,7 +441,32 @@ def svd(array, atol=1e-13, rtol=None):
     return U, S, V
 
 
-def eigh(array, atol=1e-13, rtol=None, is_positive_definite=False):
+def _randomized_svd(array, num_samples, num_power_iters, seed):
+    """Computes an approximate thin SVD of ``array`` from its projection onto
+    a randomized range of dimension ``num_samples``.  Returns ``U``, ``S``,
+    and ``V^*`` like ``numpy.linalg.svd``."""
+    random_state = np.random.RandomState(seed)
+    test_array = random_state.standard_normal((array.shape[1], num_samples))
+    if np.iscomplexobj(array):
+        test_array = test_array + 1j * random_state.standard_normal(
+            test_array.shape)
+
+    # Find an orthonormal basis for the range of the array, re-orthonormalizing
+    # between each multiplication for stability.
+    range_basis = np.linalg.qr(array.dot(test_array))[0]
+    for power_iter in range(num_power_iters):
+        range_basis = np.linalg.qr(array.conj().T.dot(range_basis))[0]
+        range_basis = np.linalg.qr(array.dot(range_basis))[0]
+
+    # Decompose the small projected array
+    U_small, S, V_conj_T = np.linalg.svd(
+        range_basis.conj().T.dot(array), full_matrices=False)
+    return range_basis.dot(U_small), S, V_conj_T
+
+
+def eigh(
+    array, atol=1e-13, rtol=None, is_positive_definite=False,
+    num_eigvals=None):
     """Wrapper for ``numpy.linalg.eigh``. Computes eigendecomposition of a
     Hermitian array.
 
@@ -256,19 +483,36 @@ def eigh(array, atol=1e-13, rtol=None, is_positive_definite=False):
         assumed to be positive definite.  Tolerance will be automatically
         adjusted (if necessary) so that only positive eigenvalues are returned.
 
+        ``num_eigvals``: Maximum number of eigenvalues (and eigenvectors) to
+        compute.  If None, all are computed.
+
     Returns:
         ``eigvals``: 1D array of eigenvalues, sorted in descending order (of
         magnitude).
 
         ``eigvecs``: Array whose columns are eigenvectors.
+
+    When ``num_eigvals`` is smaller than the size of ``array``, only the
+    leading eigenvalues are computed.  A Lanczos solver
+    (``scipy.sparse.linalg.eigsh``) is used when ``num_eigvals`` is at most a
+    tenth of the size, and ``scipy.linalg.eigh`` with ``subset_by_index``
+    otherwise.  For positive definite arrays, the tolerance adjustment
+    described above then only sees the computed eigenvalues.
     """
     # Compute eigendecomposition (force data to be array)
-    eigvals, eigvecs = np.linalg.eigh(np.array(array))
+    array = np.array(array)
+    if num_eigvals is None or num_eigvals >= array.shape[0]:
+        eigvals, eigvecs = np.linalg.eigh(array)
+    else:
+        eigvals, eigvecs = _partial_eigh(
+            array, num_eigvals, is_positive_definite)
 
     # Sort the vecs and eigvals by eigval magnitude.  The first element will
     # have the largest magnitude and the last element will have the smallest
     # magnitude.
     sort_indices = np.argsort(np.abs(eigvals))[::-1]
+    if num_eigvals is not None:
+        sort_indices = sort_indices[:num_eigvals]
     eigvals = eigvals[sort_indices]
     eigvecs = eigvecs[:, sort_indices]
 
@@ -296,6 +540,34 @@ def eigh(array, atol=1e-13, rtol=None, is_positive_definite=False):
     return eigvals, eigvecs
 
 
+def _partial_eigh(array, num_eigvals, is_positive_definite):
+    """Computes at least the ``num_eigvals`` eigenvalues of largest magnitude
+    of a Hermitian array, and the corresponding eigenvectors.  They are not
+    sorted."""
+    num_rows = array.shape[0]
+    if num_eigvals <= num_rows // 10:
+        # Use a fixed starting vector so results are reproducible
+        start_vec = np.random.RandomState(0).random_sample(num_rows)
+        which = 'LA' if is_positive_definite else 'LM'
+        return scipy.sparse.linalg.eigsh(
+            array, k=num_eigvals, which=which, v0=start_vec)
+    if is_positive_definite:
+        return scipy.linalg.eigh(
+            array, subset_by_index=[num_rows - num_eigvals, num_rows - 1])
+
+    # The eigenvalues of largest magnitude may be at either end of the
+    # spectrum.
+    if 2 * num_eigvals >= num_rows:
+        return np.linalg.eigh(array)
+    low_eigvals, low_eigvecs = scipy.linalg.eigh(
+        array, subset_by_index=[0, num_eigvals - 1])
+    high_eigvals, high_eigvecs = scipy.linalg.eigh(
+        array, subset_by_index=[num_rows - num_eigvals, num_rows - 1])
+    return (
+        np.concatenate((low_eigvals, high_eigvals)),
+        np.hstack((low_eigvecs, high_eigvecs)))
+
+
 def eig_biorthog(array, scale_choice='left'):
     """Wrapper for ``numpy.linalg.eig`` that returns both left and right
     eigenvectors. Eigenvalues and eigenvectors are sorted and scaled so that
@@ -4,6 +4,7 @@ We recommend using these functions and classes when possible.
 Otherwise, you can write your own vector class and/or vector handle,
 see documentation :ref:`sec_details`.
 """
+import os
 import pickle
 
 import numpy as np
@@ -11,10 +12,66 @@ import numpy as np
 from . import util
 
 
+def _can_update_in_place(vec, *others):
+    """Returns True unless ``vec`` is a numpy array that cannot hold the
+    result of an operation with ``others`` (e.g., because of its dtype)."""
+    if not isinstance(vec, np.ndarray):
+        return True
+    return (
+        vec.flags.writeable and np.result_type(vec, *others) == vec.dtype and
+        np.broadcast(vec, *others).shape == vec.shape)
+
+
+def add_scaled(sum_vec, scalar, vec):
+    """Returns ``sum_vec + vec * scalar``, computed in place in ``sum_vec``
+    when possible.
+
+    Args:
+        ``sum_vec``: Vector object to add to.  It is modified, so it must not
+        be used elsewhere.
+
+        ``scalar``: Scalar multiplying ``vec``.
+
+        ``vec``: Vector object to scale and add.
+
+    Returns:
+        ``sum_vec``: The sum.
+
+    If the vector object has a method ``axpy(scalar, vec)``, it is called to
+    add ``vec * scalar`` in place, without temporaries.  Otherwise, the sum is
+    computed as ``sum_vec += vec * scalar``, which is in place if the vector
+    object defines ``__iadd__``.
+    """
+    if hasattr(sum_vec, 'axpy'):
+        sum_vec.axpy(scalar, vec)
+        return sum_vec
+    if not _can_update_in_place(sum_vec, vec, scalar):
+        return sum_vec + vec * scalar
+    sum_vec += vec * scalar
+    return sum_vec
+
+
+def scale_in_place(vec, scalar):
+    """Returns ``vec * scalar``, computed in place in ``vec`` when possible,
+    i.e., if the vector object defines ``__imul__``.  ``vec`` must not be used
+    elsewhere."""
+    if not _can_update_in_place(vec, scalar):
+        return vec * scalar
+    vec *= scalar
+    return vec
+
+
 class VecHandle(object):
-    """Recommended base class for vector handles (not required)."""
+    """Recommended base class for vector handles (not required).
+
+    If ``_get`` returns a new vector object each time (e.g., read from a file)
+    rather than one that is used elsewhere, subclasses can set
+    ``get_returns_new_vec`` to True.  Then the base vector is subtracted and
+    the scale factor applied in place, see :py:func:`add_scaled`.
+    """
     cached_base_vec_handle = None
     cached_base_vec = None
+    get_returns_new_vec = False
 
 
     def __init__(self, base_vec_handle=None, scale=None):
@@ -28,16 +85,35 @@ class VecHandle(object):
         specified vector.  Then, if a scale factor is specified, the
         base-subtracted vector will be scaled.  The scaled, base-subtracted
         vector is then returned."""
-        vec = self._get()
+        return self._subtract_base_and_scale(self._get())
+
+
+    @staticmethod
+    def get_vecs(vec_handles):
+        """Gets a list of vectors from a list of handles.
+
+        Subclasses can overwrite this to retrieve many vectors at once, e.g.,
+        with a single read.  :py:class:`vectorspace.VectorSpaceHandles` calls
+        it (from the first handle) for each chunk of vectors."""
+        return [vec_handle.get() for vec_handle in vec_handles]
+
+
+    def _subtract_base_and_scale(self, vec):
+        """Subtracts the base vector (if any) from a vector retrieved by this
+        handle, then scales it (if a scale factor is specified)."""
         if self.__base_vec_handle is None:
-            return self.__scale_vec(vec)
+            return self.__scale_vec(vec, self.get_returns_new_vec)
         if self.__base_vec_handle == VecHandle.cached_base_vec_handle:
             base_vec = VecHandle.cached_base_vec
         else:
             base_vec = self.__base_vec_handle.get()
             VecHandle.cached_base_vec_handle = self.__base_vec_handle
             VecHandle.cached_base_vec = base_vec
-        return self.__scale_vec(vec - base_vec)
+        if self.get_returns_new_vec:
+            vec = add_scaled(vec, -1, base_vec)
+        else:
+            vec = vec - base_vec
+        return self.__scale_vec(vec, True)
 
 
     def put(self, vec):
@@ -46,6 +122,31 @@ class VecHandle(object):
         return self._put(vec)
 
 
+    def cache_key(self):
+        """Returns a string that identifies the vector retrieved by this
+        handle, used to cache inner products, or None if there is none.
+
+        The default uses the handle's ``vec_path`` (if it has one), the size
+        and modification time of that file, the scale factor, and the key of
+        the base vector handle.  Subclasses can overwrite this."""
+        vec_path = getattr(self, 'vec_path', None)
+        if vec_path is None:
+            return None
+        try:
+            file_stat = os.stat(vec_path)
+        except OSError:
+            return None
+        key = '%s:%s:%d:%r:%r' % (
+            type(self).__name__, os.path.abspath(vec_path),
+            file_stat.st_size, file_stat.st_mtime, self.scale)
+        if self.__base_vec_handle is not None:
+            base_key = self.__base_vec_handle.cache_key()
+            if base_key is None:
+                return None
+            key += ':base=' + base_key
+        return key
+
+
     def _get(self):
         """Subclass must overwrite, retrieves a vector."""
         raise NotImplementedError("must be implemented by subclasses")
@@ -56,9 +157,12 @@ class VecHandle(object):
         raise NotImplementedError("must be implemented by subclasses")
 
 
-    def __scale_vec(self, vec):
-        """Scales the vector by a scalar."""
+    def __scale_vec(self, vec, is_new_vec=False):
+        """Scales the vector by a scalar, in place if the vector is not used
+        elsewhere."""
         if self.scale is not None:
+            if is_new_vec:
+                return scale_in_place(vec, self.scale)
             return vec*self.scale
         return vec
 
@@ -88,6 +192,8 @@ class VecHandleInMemory(VecHandle):
 
 class VecHandleArrayText(VecHandle):
     """Gets and puts array vector objects from/in text files."""
+    get_returns_new_vec = True
+
     def __init__(
         self, vec_path, base_vec_handle=None, scale=None, is_complex=False):
         VecHandle.__init__(self, base_vec_handle, scale)
@@ -113,6 +219,8 @@ class VecHandleArrayText(VecHandle):
 
 class VecHandlePickle(VecHandle):
     """Gets and puts any vector object from/in pickle files."""
+    get_returns_new_vec = True
+
     def __init__(self, vec_path, base_vec_handle=None, scale=None):
         VecHandle.__init__(self, base_vec_handle, scale)
         self.vec_path = vec_path
@@ -134,6 +242,214 @@ class VecHandlePickle(VecHandle):
         return self.vec_path == other.vec_path
 
 
+class VecHandleNpy(VecHandle):
+    """Gets and puts array vector objects from/in numpy ``.npy`` files.
+
+    Args:
+        ``vec_path``: Path to the ``.npy`` file.
+
+    Kwargs:
+        ``base_vec_handle``: Handle for a base vector that is subtracted from
+        the vector.
+
+        ``scale``: Scale factor applied to the (base-subtracted) vector.
+
+        ``mmap``: If true, ``get`` returns a read-only memory map of the file
+        rather than reading it into memory.  Pages are read as the vector is
+        used and are shared (via the OS page cache) between processes on a
+        node.
+
+    ``put`` writes to a temporary file in the same directory, then renames it
+    to ``vec_path``, so that a vector file is never partially written.
+    """
+    def __init__(self, vec_path, base_vec_handle=None, scale=None, mmap=True):
+        VecHandle.__init__(self, base_vec_handle, scale)
+        self.vec_path = vec_path
+        self.mmap = mmap
+
+        # Memory maps are read-only, arrays read from the file are new
+        self.get_returns_new_vec = not mmap
+
+
+    def _get(self):
+        """Loads vector from path."""
+        if self.mmap:
+            return np.load(self.vec_path, mmap_mode='r')
+        return np.load(self.vec_path)
+
+
+    def _put(self, vec):
+        """Saves vector to path, replacing any existing file atomically."""
+        file_desc, tmp_path = util.make_temp_file(
+            suffix='.npy', dir=os.path.dirname(os.path.abspath(self.vec_path)))
+        try:
+            with os.fdopen(file_desc, 'wb') as file_obj:
+                np.save(file_obj, np.asarray(vec))
+            # os.replace is not available in Python 2, where os.rename also
+            # replaces existing files on POSIX systems.
+            getattr(os, 'replace', os.rename)(tmp_path, self.vec_path)
+        except:
+            os.remove(tmp_path)
+            raise
+
+
+    def __eq__(self, other):
+        if type(other) != type(self):
+            return False
+        return self.vec_path == other.vec_path
+
+
+def create_npy_column_file(vec_path, vec_shape, num_vecs, dtype=float):
+    """Creates a ``.npy`` file that stores many array vectors as columns, for
+    use with :py:class:`VecHandleNpyColumn`.
+
+    Args:
+        ``vec_path``: Path to the ``.npy`` file.
+
+        ``vec_shape``: Shape of each vector.
+
+        ``num_vecs``: Number of vectors (columns).
+
+    Kwargs:
+        ``dtype``: Data type of the vectors.
+
+    The file holds an array of shape ``vec_shape + (num_vecs,)`` in Fortran
+    (column-major) order, so each vector, and each range of consecutive
+    vectors, is contiguous in the file.  Its elements are initially zero.
+    """
+    array = np.lib.format.open_memmap(
+        vec_path, mode='w+', dtype=dtype,
+        shape=tuple(util.make_iterable(vec_shape)) + (num_vecs,),
+        fortran_order=True)
+    del array
+
+
+class VecHandleNpyColumn(VecHandle):
+    """Gets and puts array vector objects from/in one column of a ``.npy``
+    file holding many vectors.
+
+    Args:
+        ``vec_path``: Path to a ``.npy`` file created by
+        :py:func:`create_npy_column_file`.
+
+        ``col_index``: Index of this vector's column.
+
+    Kwargs:
+        ``base_vec_handle``: Handle for a base vector that is subtracted from
+        the vector.
+
+        ``scale``: Scale factor applied to the (base-subtracted) vector.
+
+        ``elements``: Index or slice (or tuple of them, one per dimension of
+        the vectors) selecting part of each vector, e.g., a subdomain or every
+        other grid point.  Default is the whole vector.
+
+    Storing all vectors in one file avoids opening thousands of files.
+    ``get`` returns a memory-mapped view of the column.  :py:meth:`get_vecs`
+    reads a chunk of columns of the same file in a few large reads, which
+    :py:class:`vectorspace.VectorSpaceHandles` uses for each chunk of vectors.
+    Different processors on the same node can ``put`` different columns of the
+    same file at once.  Processors on different nodes cannot, since network
+    file systems (e.g., NFS) can lose concurrent writes to one file.
+    """
+    def __init__(
+        self, vec_path, col_index, base_vec_handle=None, scale=None,
+        elements=None):
+        VecHandle.__init__(self, base_vec_handle, scale)
+        self.vec_path = vec_path
+        self.col_index = col_index
+        self.elements = elements
+
+
+    def _get_index(self, col_index):
+        """Returns the index of the selected elements of a column (or range
+        of columns) in the stored array."""
+        if self.elements is None:
+            return (Ellipsis, col_index)
+        if isinstance(self.elements, tuple):
+            return self.elements + (col_index,)
+        return (self.elements, Ellipsis, col_index)
+
+
+    def _get(self):
+        """Loads vector from column of file."""
+        array = np.load(self.vec_path, mmap_mode='r')
+        return array[self._get_index(self.col_index)]
+
+
+    def _put(self, vec):
+        """Saves vector to column of file."""
+        array = np.load(self.vec_path, mmap_mode='r+')
+        array[self._get_index(self.col_index)] = vec
+        array.flush()
+        del array
+
+
+    @staticmethod
+    def get_vecs(vec_handles):
+        """Gets a list of vectors from a list of handles.  Vectors in the same
+        file with the same ``elements`` are read at once, as one block of
+        columns if they are evenly spaced, or otherwise as one block for each
+        run of consecutive columns.  Only the requested columns are read, and
+        the vectors are views of the columns of these blocks, which are only
+        copied once from the file."""
+        if len(vec_handles) < 2 or not all(
+            type(vec_handle) == VecHandleNpyColumn and
+            vec_handle.vec_path == vec_handles[0].vec_path and
+            vec_handle.elements == vec_handles[0].elements
+            for vec_handle in vec_handles):
+            return VecHandle.get_vecs(vec_handles)
+        col_indices = [vec_handle.col_index for vec_handle in vec_handles]
+        stride = max(col_indices[1] - col_indices[0], 1)
+        if col_indices == list(range(
+            col_indices[0], col_indices[0] + stride * len(col_indices),
+            stride)):
+            runs = [(slice(col_indices[0], col_indices[-1] + 1, stride),
+                len(col_indices))]
+        else:
+            # Runs of consecutive columns, as (slice, number of columns)
+            runs = []
+            run_start = 0
+            for index in range(1, len(col_indices) + 1):
+                if (index == len(col_indices) or
+                    col_indices[index] != col_indices[index - 1] + 1):
+                    runs.append((
+                        slice(col_indices[run_start],
+                            col_indices[index - 1] + 1),
+                        index - run_start))
+                    run_start = index
+        array = np.load(vec_handles[0].vec_path, mmap_mode='r')
+        vecs = []
+        for col_slice, num_cols in runs:
+            block = np.array(array[vec_handles[0]._get_index(col_slice)])
+            vecs.extend(block[..., block_index] for block_index in range(
+                num_cols))
+            del block
+        del array
+        return [
+            vec_handle._subtract_base_and_scale(vec)
+            for vec_handle, vec in zip(vec_handles, vecs)]
+
+
+    def cache_key(self):
+        """Returns a string that identifies the vector retrieved by this
+        handle, including the column and elements, for caching inner
+        products."""
+        key = VecHandle.cache_key(self)
+        if key is None:
+            return None
+        return '%s:%r:%r' % (key, self.col_index, self.elements)
+
+
+    def __eq__(self, other):
+        if type(other) != type(self):
+            return False
+        return (
+            self.vec_path == other.vec_path and
+            self.col_index == other.col_index and
+            self.elements == other.elements)
+
+
 def inner_product_array_uniform(vec1, vec2):
     """Takes inner product of numpy arrays without weighting. The first element
     is conjugated, i.e., IP = np.dot(vec1.conj().T, v2)
@@ -197,8 +513,135 @@ class InnerProductTrapz(object):
         return IP
 
 
+class InnerProductBlockArrays(object):
+    """Callable that computes arrays of inner products between blocks of
+    vectors that are numpy arrays (or objects exposing the array interface),
+    using one matrix multiplication per block.
+
+    Kwargs:
+        ``weights``: Array of inner product weights, with one weight per vector
+        element (it is flattened like the vectors).  Corresponds to a diagonal
+        :math:`W` in inner product :math:`v_1^* W v_2`.  Default is uniform
+        weights.
+
+    Usage::
+
+      block_IP = InnerProductBlockArrays(weights=my_weights)
+      vec_space = VectorSpaceHandles(block_inner_product=block_IP)
+
+      # Inner products of two lists of array vectors
+      IP_array = block_IP(vecs1, vecs2)
+
+    The vectors are flattened and stacked into the rows of a contiguous 2D
+    array (see :py:meth:`stack`), so that the inner products of a whole block
+    are computed at BLAS speed rather than one pair at a time.  Blocks that
+    were already stacked are used as is.
+    """
+    def __init__(self, weights=None):
+        if weights is not None:
+            weights = np.array(weights).ravel()
+        self.weights = weights
+
+
+    def __call__(self, vecs1, vecs2):
+        return self.inner_product_array(vecs1, vecs2)
+
+
+    def stack(self, vecs, num_vecs=None):
+        """Stacks vectors into a 2D C-contiguous array whose rows are the
+        flattened vectors.
+
+        Args:
+            ``vecs``: List or iterator of array vectors, or a block returned by
+            a previous call to this method (returned unchanged).
+
+        Kwargs:
+            ``num_vecs``: Number of vectors, if ``vecs`` is an iterator.
+
+        Returns:
+            ``block``: 2D array with one row per vector.
+
+        Each vector is copied into the block as it is produced, so if ``vecs``
+        is an iterator that creates them, e.g., by loading them from file, only
+        one of them is in memory besides the block.  A list of vectors is in
+        memory twice until the block is built.
+        """
+        if isinstance(vecs, np.ndarray):
+            return vecs
+        if num_vecs is None:
+            vecs = list(vecs)
+            num_vecs = len(vecs)
+        if num_vecs == 0:
+            return np.zeros((0, 0))
+        block = None
+        for vec_index, vec in enumerate(vecs):
+            vec = np.asarray(vec)
+            if block is None:
+                block = np.empty((num_vecs, vec.size), dtype=vec.dtype)
+            elif not np.can_cast(vec.dtype, block.dtype):
+                block = block.astype(np.result_type(block, vec))
+            block[vec_index] = vec.reshape(-1)
+        return block
+
+
+    def inner_product_array(self, vecs1, vecs2):
+        """Computes the array of inner products between two sets of vectors.
+
+        Args:
+            ``vecs1``: List or block of vectors corresponding to rows.
+
+            ``vecs2``: List or block of vectors corresponding to columns.
+
+        Returns:
+            ``IP_array``: 2D array of inner products.
+        """
+        block1 = self.stack(vecs1)
+        block2 = self.stack(vecs2)
+        if block1.shape[0] == 0 or block2.shape[0] == 0:
+            return np.zeros((block1.shape[0], block2.shape[0]))
+        if not np.iscomplexobj(block1) and self.weights is None:
+            return np.dot(block1, block2.T)
+
+        # The conjugation and weights are applied to one copy of the smaller
+        # block.  For the columns, this uses v_1^* W v_2 = (v_1^T (W v_2)^*)^*.
+        if block1.shape[0] <= block2.shape[0]:
+            return np.dot(self._conj_and_weigh(block1), block2.T)
+        return np.conj(np.dot(
+            block1, self._conj_and_weigh(block2, conj_weights=True).T))
+
+
+    def _conj_and_weigh(self, block, conj_weights=False):
+        """Returns a copy of a block, conjugated and multiplied by the
+        weights, or by their conjugates if ``conj_weights`` is true."""
+        block = np.conj(block)
+        if self.weights is not None:
+            weights = self.weights
+            if conj_weights:
+                weights = np.conj(weights)
+            if np.can_cast(np.result_type(block, weights), block.dtype):
+                block *= weights
+            else:
+                block = block * weights
+        return block
+
+
+    def inner_product(self, vec1, vec2):
+        """Computes inner product of two vectors."""
+        return self.inner_product_array([vec1], [vec2])[0, 0]
+
+
 class Vector(object):
-    """Recommended base class for vector objects (not required)."""
+    """Recommended base class for vector objects (not required).
+
+    Subclasses must define ``__add__`` and ``__mul__``.  Optionally, they can
+    also define in-place operations, which modred uses to avoid creating new
+    vector objects, e.g., when forming linear combinations of vectors:
+
+    - ``__iadd__(other)`` and ``__imul__(scalar)``, for ``+=`` and ``*=``.
+
+    - ``axpy(scalar, other)``, which adds ``other * scalar`` to the vector in
+      place, without temporaries.  See :py:func:`add_scaled`.
+    """
     def __init__(self):
         """Must overwrite"""
         raise NotImplementedError('constructor must be implemented by subclass')
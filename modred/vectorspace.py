@@ -1,11 +1,194 @@
 import copy
+from collections import namedtuple
+import hashlib
+import os
+import pickle
+import threading
+import types
 from time import time
 
 import numpy as np
+import scipy.linalg
 
 from . import parallel
 from . import util
 from .py2to3 import print_msg, range
+from .vectors import add_scaled
+
+
+ChunkPlan = namedtuple(
+    'ChunkPlan',
+    ['num_rows_per_proc_chunk', 'num_cols_per_proc_chunk',
+    'num_row_get_loops', 'num_col_get_loops', 'num_gets_per_proc',
+    'num_passes_per_proc'])
+
+SymmTilePlan = namedtuple(
+    'SymmTilePlan',
+    ['tile_size', 'proc_tiles', 'proc_block_loads', 'num_gets_per_proc'])
+
+# Message tags of the exchanges of vecs between processors, so that
+# overlapping exchanges between the same processors do not share tags
+_EXCHANGE_TAG = 0
+_RING_TAGS = [1, 2]
+
+
+def _get_proc_chunk_ranges(proc_tasks, num_per_chunk, num_chunks):
+    """Returns the (start, end) index ranges of the chunks of consecutive
+    tasks that a processor works on, one range per chunk.  Processors without
+    tasks get empty ranges."""
+    chunk_ranges = []
+    for chunk_index in range(num_chunks):
+        if len(proc_tasks) > 0:
+            start_index = min(
+                proc_tasks[0] + chunk_index * num_per_chunk,
+                proc_tasks[-1] + 1)
+            end_index = min(proc_tasks[-1] + 1, start_index + num_per_chunk)
+        else:
+            start_index = 0
+            end_index = 0
+        chunk_ranges.append((start_index, end_index))
+    return chunk_ranges
+
+
+def _add_array_sums(sum_block, basis_vecs, coeffs):
+    """Adds the linear combinations of ``basis_vecs`` given by ``coeffs`` to
+    the columns of ``sum_block`` with one matrix multiplication, and returns
+    it.  ``sum_block`` is allocated if it is None.  Returns None if the vecs
+    are not numpy arrays with the same number of elements as the sums."""
+    if not all(
+        isinstance(vec, np.ndarray) and not vec.dtype.hasobject
+        for vec in basis_vecs):
+        return None
+    num_elements = basis_vecs[0].size
+    if any(vec.size != num_elements for vec in basis_vecs) or (
+        sum_block is not None and sum_block.shape[0] != num_elements):
+        return None
+    if sum_block is None:
+        dtype = np.result_type(coeffs, *basis_vecs)
+        sum_block = np.zeros(
+            (num_elements, coeffs.shape[1]), dtype=dtype, order='F')
+    else:
+        dtype = np.result_type(sum_block, coeffs, *basis_vecs)
+
+    # Stack the basis vecs as the columns of a contiguous block, and add its
+    # product with the coefficients to the sums in place
+    basis_block = np.empty(
+        (num_elements, len(basis_vecs)), dtype=dtype, order='F')
+    for basis_index, basis_vec in enumerate(basis_vecs):
+        basis_block[:, basis_index] = np.asarray(basis_vec).ravel()
+    gemm = scipy.linalg.get_blas_funcs('gemm', (basis_block, sum_block))
+    return gemm(
+        1., basis_block, np.asfortranarray(coeffs, dtype=gemm.dtype),
+        beta=1., c=sum_block, overwrite_c=True)
+
+
+def _get_needed_col_indices(needed_blocks, start_row_index, end_row_index):
+    """Returns the sorted indices of the columns, from ``end_row_index`` on,
+    of the blocks in ``needed_blocks`` (pairs of row and column slices) that
+    have rows from ``start_row_index`` to ``end_row_index``."""
+    col_indices = set()
+    for row_slice, col_slice in needed_blocks:
+        if (
+            row_slice.start < end_row_index and
+            row_slice.stop > start_row_index):
+            col_indices.update(range(
+                max(col_slice.start, end_row_index), col_slice.stop))
+    return sorted(col_indices)
+
+
+def _count_needed_IPs(needed_blocks):
+    """Returns the number of upper-triangular elements in ``needed_blocks``
+    (pairs of row and column slices), for estimates of the work."""
+    num_IPs = 0
+    for row_slice, col_slice in needed_blocks:
+        row_indices = np.arange(row_slice.start, row_slice.stop)
+        num_IPs += np.maximum(
+            col_slice.stop - np.maximum(row_indices, col_slice.start), 0).sum()
+    return num_IPs
+
+
+class _VecPrefetcher(object):
+    """Retrieves chunks of vectors in a background thread, in the order they
+    will be used, so that reading vectors overlaps with computations.
+
+    Args:
+        ``get_vecs``: Function that takes a list of handles and returns the
+        vectors.
+
+        ``handle_chunks``: List of lists of handles, in the order in which
+        :py:meth:`get_vecs` will be called.
+
+        ``max_num_vecs``: Maximum number of vectors retrieved ahead of time,
+        i.e., not yet returned by :py:meth:`get_vecs`.  A chunk that does not
+        fit is only retrieved once it is requested.  If 0, vectors are
+        retrieved when requested, without a thread.
+    """
+    def __init__(self, get_vecs, handle_chunks, max_num_vecs):
+        self._get_vecs = get_vecs
+        self._handle_chunks = handle_chunks
+        self._max_num_vecs = max_num_vecs
+        self._next_index = 0
+        self._requested_index = None
+        self._num_loaded_vecs = 0
+        self._loaded = {}
+        self._closed = False
+        self._thread = None
+        if max_num_vecs > 0:
+            self._condition = threading.Condition()
+            self._thread = threading.Thread(target=self._load_chunks)
+            self._thread.daemon = True
+            self._thread.start()
+
+
+    def _load_chunks(self):
+        """Retrieves the chunks in order while there is room for them."""
+        for chunk_index, handles in enumerate(self._handle_chunks):
+            with self._condition:
+                while not self._closed and (
+                    self._num_loaded_vecs + len(handles) > self._max_num_vecs
+                    and chunk_index != self._requested_index):
+                    self._condition.wait()
+                if self._closed:
+                    return
+                self._num_loaded_vecs += len(handles)
+            try:
+                loaded = (self._get_vecs(handles), None)
+            except Exception as error:
+                loaded = (None, error)
+            with self._condition:
+                self._loaded[chunk_index] = loaded
+                self._condition.notify_all()
+            if loaded[1] is not None:
+                return
+
+
+    def get_vecs(self):
+        """Returns the vectors of the next chunk of handles."""
+        chunk_index = self._next_index
+        self._next_index += 1
+        if self._thread is None:
+            return self._get_vecs(self._handle_chunks[chunk_index])
+        with self._condition:
+            self._requested_index = chunk_index
+            self._condition.notify_all()
+            while chunk_index not in self._loaded:
+                self._condition.wait()
+            vecs, error = self._loaded.pop(chunk_index)
+            self._num_loaded_vecs -= len(self._handle_chunks[chunk_index])
+            self._condition.notify_all()
+        if error is not None:
+            raise error
+        return vecs
+
+
+    def close(self):
+        """Stops retrieving chunks and frees those not yet used."""
+        if self._thread is not None:
+            with self._condition:
+                self._closed = True
+                self._loaded = {}
+                self._condition.notify_all()
+            self._thread.join()
 
 
 class VectorSpaceArrays(object):
@@ -73,18 +256,98 @@ class VectorSpaceHandles(object):
         objects.
 
         ``max_vecs_per_node``: Maximum number of vectors that can be stored in
-        memory, per node.
+        memory, per node.  If ``'auto'``, it is set from the available memory
+        and the size of the first vector used, see
+        :py:meth:`set_max_vecs_from_memory`.
 
         ``verbosity``: 1 prints progress and warnings, 0 prints almost nothing.
 
         ``print_interval``: Minimum time (in seconds) between printed progress
         messages.
 
+        ``block_inner_product``: Function that computes the array of inner
+        products between two lists of vector objects, e.g.,
+        :py:class:`vectors.InnerProductBlockArrays`.  If given, the inner
+        products of all vectors in memory are computed with one call per chunk
+        of rows and columns, rather than one call to ``inner_product`` per
+        pair.  If it has a ``stack(vecs, num_vecs=None)`` method, each chunk
+        of vectors is stacked into a single block as it is retrieved, and
+        memory for one chunk of vectors is kept for the copies it makes.
+
+        ``sizeof``: Function that returns the size of a vector object in bytes,
+        used when ``max_vecs_per_node`` is ``'auto'``.  Default uses the
+        vector's ``nbytes`` attribute.
+
+        ``prefetch_depth``: Number of chunks of vectors that are retrieved in
+        a background thread while the previous chunks are used in
+        computations.  Memory for these chunks is taken from
+        ``max_vecs_per_node``.  Default is 0 (no prefetching).  Prefetching
+        cannot be used with groups of MPI workers (see
+        :py:func:`parallel.init_groups`).
+
+        ``bidirectional_ring``: If true, vectors are passed between MPI
+        workers (processors) in both directions around a ring, which halves
+        the number of steps but doubles the memory used for vectors in
+        transit.
+
+        ``symm_schedule``: How :py:meth:`compute_symm_inner_product_array`
+        divides the work.  With ``'rows'``, chunks of rows stay in memory and
+        vectors are passed between MPI workers (processors).  With
+        ``'tiles'``, the upper triangle is split into square tiles that are
+        divided among MPI workers, each of which retrieves the vectors for its
+        own tiles, without communication (see :py:meth:`plan_symm_tiles`).
+
+        ``lin_combine_schedule``: How :py:meth:`lin_combine` divides the work.
+        With ``'ring'``, the basis vectors are divided among MPI workers
+        (processors) and passed between them.  With ``'stream'``, each MPI
+        worker retrieves the basis vectors needed for its own sum vectors,
+        without communication, which is faster when retrieving vectors (e.g.,
+        from a shared file system) is cheaper than passing them.  With
+        ``'auto'``, the schedule with the shorter estimated time is used.  The
+        time to pass a vector is measured by the first linear combination
+        that passes vectors, and stored in ``pass_time``.  A computation
+        resumed from a checkpoint keeps the schedule of the checkpoint.
+        Default is ``'ring'``.
+
+        ``IP_cache_path``: Path to a file in which computed inner products are
+        stored.  If given, :py:meth:`compute_inner_product_array` and
+        :py:meth:`compute_symm_inner_product_array` reuse any inner products
+        already in the file and add the ones they compute (see
+        :py:meth:`get_cached_inner_products`).
+
+        ``inner_product_key``: String identifying the inner product in the
+        cache.  Default is a hash of the module and name of ``inner_product``
+        (or ``block_inner_product``) if it is a function, or of its type and
+        ``weights`` (or ``grids``) if it is an object that has them, like
+        :py:class:`vectors.InnerProductBlockArrays`.  It must be given for
+        other inner products, e.g., lambdas or bound methods, or if the
+        definition of the inner product changes.
+
+        ``checkpoint_dir``: Directory in which the progress of inner product
+        arrays and linear combinations is saved.  If given, each MPI worker
+        (processor) periodically saves the part of the computation it has
+        completed, and a computation that is interrupted (e.g., by the time
+        limit of a job) skips the completed work when it is called again with
+        the same vectors.  The vectors are identified by the cache keys of
+        their handles (see :py:meth:`vectors.VecHandle.cache_key`), so
+        checkpoints are not used for handles without them, e.g.,
+        :py:class:`vectors.VecHandleInMemory`.  The checkpoint files are
+        removed once the computation is done.
+
+        ``checkpoint_interval``: Minimum time (in seconds) between saved
+        checkpoints.
+
     This class implements low-level functions for computing large numbers of
     vector sums and inner products.  These functions are used by high-level
     classes in :py:mod:`pod`, :py:mod:`bpod`, :py:mod:`dmd` and
     :py:mod:`ltigalerkinproj`.
 
+    With :py:func:`parallel.init_groups`, the vector objects can be
+    distributed among the MPI workers of a group, each of which holds a part of
+    each vector.  Then ``inner_product`` and ``block_inner_product`` compute
+    the inner products of the parts on one MPI worker, which are summed over
+    the group, and ``max_vecs_per_node`` counts whole vectors.
+
     Note: Computations are often sped up by using all available processors,
     even if this lowers ``max_vecs_per_node`` proportionally.
     However, this depends on the computer and the nature of the functions
@@ -92,12 +355,35 @@ class VectorSpaceHandles(object):
     """
     def __init__(
         self, inner_product=None, max_vecs_per_node=None, verbosity=1,
-        print_interval=10):
+        print_interval=10, block_inner_product=None, sizeof=None,
+        prefetch_depth=0, bidirectional_ring=False, symm_schedule='rows',
+        IP_cache_path=None, inner_product_key=None, checkpoint_dir=None,
+        checkpoint_interval=600, lin_combine_schedule='ring'):
         """Constructor."""
         self.inner_product = inner_product
+        self.IP_cache_path = IP_cache_path
+        self.inner_product_key = inner_product_key
+        self.block_inner_product = block_inner_product
+        self.sizeof = sizeof
+        self.prefetch_depth = prefetch_depth
+        self.bidirectional_ring = bidirectional_ring
+        if symm_schedule not in ['rows', 'tiles']:
+            raise ValueError('symm_schedule must be "rows" or "tiles"')
+        self.symm_schedule = symm_schedule
+        if lin_combine_schedule not in ['auto', 'ring', 'stream']:
+            raise ValueError(
+                'lin_combine_schedule must be "auto", "ring" or "stream"')
+        self.lin_combine_schedule = lin_combine_schedule
+
+        # Time to pass a vec to the next processor, measured once for the
+        # 'auto' lin_combine_schedule
+        self.pass_time = None
         self.verbosity = verbosity
         self.print_interval = print_interval
         self.prev_print_time = 0.
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_interval = checkpoint_interval
+        self.prev_checkpoint_time = 0.
 
         if max_vecs_per_node is None:
             self.max_vecs_per_node = 10000 # different default?
@@ -108,6 +394,19 @@ class VectorSpaceHandles(object):
         else:
             self.max_vecs_per_node = max_vecs_per_node
 
+        # With 'auto', the limit is set once the first vector is retrieved
+        if isinstance(self.max_vecs_per_node, str):
+            if self.max_vecs_per_node != 'auto':
+                raise ValueError(
+                    'max_vecs_per_node must be an integer or "auto"')
+            self.max_vecs_per_proc = None
+        else:
+            self._set_max_vecs_per_proc()
+
+
+    def _set_max_vecs_per_proc(self):
+        """Sets ``max_vecs_per_proc`` from ``max_vecs_per_node``, requiring
+        at least three vecs per processor."""
         if (
             self.max_vecs_per_node <
             3 * parallel.get_num_procs() / parallel.get_num_nodes()):
@@ -125,18 +424,364 @@ class VectorSpaceHandles(object):
                 parallel.get_num_nodes() // parallel.get_num_procs())
 
 
+    def _get_vec_nbytes(self, vec_handle):
+        """Returns the size in bytes of the vector retrieved from
+        ``vec_handle``."""
+        vec = vec_handle.get()
+        if self.sizeof is not None:
+            return self.sizeof(vec)
+        if hasattr(vec, 'nbytes'):
+            return vec.nbytes
+        raise TypeError(
+            'Cannot determine the size of vector objects of type %s, must '
+            'provide sizeof' % type(vec))
+
+
+    def set_max_vecs_from_memory(
+        self, test_vec_handle, memory_fraction=0.5, num_scratch_vecs=2):
+        """Sets ``max_vecs_per_node`` from the memory available on each node
+        and the size of a vector object.
+
+        Args:
+            ``test_vec_handle``: Handle for a vector object whose size is
+            representative of all vectors.
+
+        Kwargs:
+            ``memory_fraction``: Fraction of the available memory that can be
+            used for vectors.
+
+            ``num_scratch_vecs``: Number of vectors per processor to leave
+            free as scratch space for the user's functions, e.g., temporaries
+            created by sums and inner products.
+
+        Returns:
+            ``max_vecs_per_node``: The new maximum number of vecs per node.
+
+        The vector is retrieved on rank zero and its size is given by
+        ``sizeof`` (if provided) or its ``nbytes`` attribute.  The available
+        memory is given by :py:func:`util.get_available_memory` and includes
+        container limits.  All processors use the smallest limit found on any
+        node.  This is called automatically when ``max_vecs_per_node`` is
+        ``'auto'``.
+        """
+        # With groups of MPI workers, a vector is made of the parts on all
+        # workers of a group
+        vec_nbytes = parallel.group_allreduce(parallel.call_and_bcast(
+            self._get_vec_nbytes, test_vec_handle))
+        node_memory = util.get_available_memory()
+        procs_per_node = int(np.ceil(
+            1. * parallel.get_num_procs() / parallel.get_num_nodes()))
+        if node_memory is None:
+            max_vecs_per_node = np.inf
+        else:
+            max_vecs_per_node = (
+                int(memory_fraction * node_memory / max(vec_nbytes, 1)) -
+                num_scratch_vecs * procs_per_node)
+        max_vecs_per_node = parallel.allreduce_min(max_vecs_per_node)
+        if np.isinf(max_vecs_per_node):
+            self.max_vecs_per_node = 10000
+            self.print_msg((
+                'Warning: could not determine the available memory. Assuming '
+                '%d vecs can be in memory per node.') % self.max_vecs_per_node)
+        else:
+            self.max_vecs_per_node = int(max_vecs_per_node)
+            self.print_msg((
+                'Setting max_vecs_per_node to %d for vecs of %.3g MB') % (
+                    self.max_vecs_per_node, vec_nbytes / 1e6))
+        self._set_max_vecs_per_proc()
+        return self.max_vecs_per_node
+
+
     def _check_inner_product(self):
-        """Check that ``inner_product`` is defined"""
-        if self.inner_product is None:
+        """Check that ``inner_product`` or ``block_inner_product`` is
+        defined"""
+        if self.inner_product is None and self.block_inner_product is None:
             raise RuntimeError('inner product function is not defined')
 
 
+    def _inner_product(self, vec1, vec2):
+        """Computes the inner product of two vectors, using
+        ``block_inner_product`` if ``inner_product`` is not defined."""
+        if self.inner_product is not None:
+            return parallel.group_allreduce(self.inner_product(vec1, vec2))
+        return parallel.group_allreduce(
+            self.block_inner_product([vec1], [vec2])[0, 0])
+
+
+    def _get_vecs(self, vec_handles, stack=True):
+        """Retrieves the vectors for a list of handles, all at once if the
+        handles have a ``get_vecs`` method (see
+        :py:meth:`vectors.VecHandle.get_vecs`).  If ``stack`` is true and the
+        block inner product can stack vectors, they are returned as a single
+        block."""
+        if len(vec_handles) > 0 and hasattr(vec_handles[0], 'get_vecs'):
+            vecs = vec_handles[0].get_vecs(vec_handles)
+        elif stack and hasattr(self.block_inner_product, 'stack'):
+            # Stack each vec as it is retrieved, so that the vecs are not in
+            # memory twice
+            return self.block_inner_product.stack(
+                (vec_handle.get() for vec_handle in vec_handles),
+                num_vecs=len(vec_handles))
+        else:
+            vecs = [vec_handle.get() for vec_handle in vec_handles]
+        if stack and hasattr(self.block_inner_product, 'stack'):
+            vecs = self.block_inner_product.stack(vecs)
+        return vecs
+
+
+    def _exchange_vecs(self, send_chunks, dest, source):
+        """Generator that sends chunks of vecs to processor ``dest`` and yields
+        the same number of chunks received from processor ``source``.  Each
+        exchange is started before the previously received chunk is
+        yielded, so that communication overlaps with computation."""
+        # Receive buffers are reused once the chunk received into them has
+        # been used, i.e., two exchanges later.
+        recv_bufs = [None, None]
+        requests = None
+        for chunk_index in range(len(send_chunks)):
+            if requests is None:
+                requests = (
+                    parallel.isend(
+                        send_chunks[chunk_index], dest=dest, tag=_EXCHANGE_TAG),
+                    parallel.irecv(source=source, tag=_EXCHANGE_TAG))
+            recv_chunk = requests[1].wait()
+            requests[0].wait()
+            recv_bufs = [recv_bufs[1], requests[1].bufs]
+            if chunk_index + 1 < len(send_chunks):
+                requests = (
+                    parallel.isend(
+                        send_chunks[chunk_index + 1], dest=dest,
+                        tag=_EXCHANGE_TAG),
+                    parallel.irecv(
+                        source=source, tag=_EXCHANGE_TAG, bufs=recv_bufs[0]))
+            yield recv_chunk
+
+
+    def _pass_vecs_around_ring(self, vecs, indices):
+        """Generator that yields ``(vecs, indices)`` for the chunk of vecs on
+        this processor, then for the chunks of all other processors, which
+        are passed around the ring of processors.
+
+        Each chunk is sent on, and the next one is received, while the
+        current one is used.  No global synchronization is needed, since
+        each processor only waits for its neighbors.  If
+        ``bidirectional_ring`` is true, chunks are passed in both directions,
+        halving the number of steps.
+        """
+        num_procs = parallel.get_num_procs()
+        rank = parallel.get_rank()
+        if self.bidirectional_ring:
+            ring_directions = [(1, num_procs // 2), (-1, (num_procs - 1) // 2)]
+        else:
+            ring_directions = [(1, num_procs - 1)]
+        chunks = [(vecs, indices)] * len(ring_directions)
+        del vecs
+
+        # Receive buffers are reused once the chunk received into them has
+        # been used and passed on, i.e., two steps later.
+        recv_bufs = [[None, None] for direction in ring_directions]
+        for step_index in range(ring_directions[0][1] + 1):
+            # Pass the current chunks on and start receiving the next ones
+            # before using the current ones.  Tags are unique for each
+            # direction, since with two processors both directions have the
+            # same neighbor.
+            requests = []
+            for direction_index, (shift, num_steps) in enumerate(
+                ring_directions):
+                if step_index < num_steps:
+                    dest = (rank + shift) % num_procs
+                    source = (rank - shift) % num_procs
+                    requests.append((
+                        direction_index,
+                        parallel.isend(
+                            chunks[direction_index], dest=dest,
+                            tag=_RING_TAGS[direction_index]),
+                        parallel.irecv(
+                            source=source, tag=_RING_TAGS[direction_index],
+                            bufs=recv_bufs[direction_index][0])))
+
+            # The chunk on this processor is used once, the others once for
+            # each direction they were received from
+            if step_index == 0:
+                yield chunks[0]
+            else:
+                for direction_index, (shift, num_steps) in enumerate(
+                    ring_directions):
+                    if step_index <= num_steps:
+                        yield chunks[direction_index]
+            chunks = [None] * len(ring_directions)
+            for direction_index, send_request, recv_request in requests:
+                chunks[direction_index] = recv_request.wait()
+                send_request.wait()
+                recv_bufs[direction_index] = [
+                    recv_bufs[direction_index][1], recv_request.bufs]
+
+
+    def _compute_IP_block(self, row_vecs, col_vecs):
+        """Computes the array of inner products between the row vectors and
+        column vectors currently in memory."""
+        if len(row_vecs) == 0 or len(col_vecs) == 0:
+            return np.zeros((len(row_vecs), len(col_vecs)))
+        if self.block_inner_product is not None:
+            IP_block = np.array(self.block_inner_product(row_vecs, col_vecs))
+        else:
+            IP_block = np.array([
+                [self.inner_product(row_vec, col_vec) for col_vec in col_vecs]
+                for row_vec in row_vecs])
+
+        # With groups of MPI workers, sum the inner products of the parts of
+        # the vectors
+        return parallel.group_allreduce(IP_block)
+
+
     def print_msg(self, msg, output_channel='stdout'):
         """Print a message from rank zero MPI worker/processor."""
         if self.verbosity > 0 and parallel.is_rank_zero():
             print_msg(msg, output_channel=output_channel)
 
 
+    def _prefetch(self, handle_chunks, num_vecs_per_chunk, get_vecs=None):
+        """Returns a :py:class:`_VecPrefetcher` that retrieves
+        ``prefetch_depth`` chunks of ``num_vecs_per_chunk`` vecs ahead of
+        time.  Default ``get_vecs`` is :py:meth:`_get_vecs`."""
+        # With groups, gets are collective on the group communicator, on which
+        # the main thread sums inner products at the same time.  MPI does not
+        # allow concurrent collectives on one communicator.
+        if self.prefetch_depth > 0 and parallel.get_group_size() > 1:
+            raise ValueError(
+                'prefetch_depth must be 0 with groups of MPI workers')
+        if get_vecs is None:
+            get_vecs = self._get_vecs
+        return _VecPrefetcher(
+            get_vecs, handle_chunks, self.prefetch_depth * num_vecs_per_chunk)
+
+
+    def _get_num_col_buffers(self, pass_cols=True):
+        """Returns the number of chunks of columns in memory at once in the
+        chunked, handle-based algorithms.  See :py:meth:`plan_chunks`."""
+        if not pass_cols:
+            return 1 + self.prefetch_depth
+        if parallel.is_distributed() and self.bidirectional_ring:
+            return 4 + self.prefetch_depth
+        if parallel.is_distributed():
+            return 2 + self.prefetch_depth
+        return 1 + self.prefetch_depth
+
+
+    def _get_num_stack_buffers(self):
+        """Returns the number of chunks of columns in memory for copies made
+        by the block inner product, i.e., 1 if it stacks vecs, else 0."""
+        if hasattr(self.block_inner_product, 'stack'):
+            return 1
+        return 0
+
+
+    def plan_chunks(
+        self, num_rows, num_cols, pass_cols=True, num_extra_col_buffers=0,
+        print_plan=True):
+        """Chooses how many vectors each MPI worker (processor) retrieves at
+        once in the chunked, handle-based algorithms.
+
+        Args:
+            ``num_rows``: Number of vectors that stay in memory while others
+            are passed around, e.g., rows of an inner product array or sum
+            vectors in a linear combination.
+
+            ``num_cols``: Number of vectors that are passed between MPI
+            workers, e.g., columns of an inner product array or basis vectors
+            in a linear combination.
+
+        Kwargs:
+            ``pass_cols``: If false, the columns are not passed between MPI
+            workers.  Instead, each MPI worker retrieves ``num_cols`` columns
+            itself.
+
+            ``num_extra_col_buffers``: Number of additional chunks of columns
+            in memory at once, e.g., copies made for computations.
+
+            ``print_plan``: If false, the plan is not printed, e.g., when it
+            is only a candidate.
+
+        Returns:
+            ``plan``: Namedtuple with attributes ``num_rows_per_proc_chunk``,
+            ``num_cols_per_proc_chunk``, ``num_row_get_loops``,
+            ``num_col_get_loops``, ``num_gets_per_proc`` and
+            ``num_passes_per_proc``.
+
+        ``max_vecs_per_proc`` is split between a chunk of rows and a chunk of
+        columns.  When distributed, two chunks of columns are in memory at once
+        (one being sent and one being received), or four with
+        ``bidirectional_ring``, plus ``prefetch_depth`` chunks retrieved ahead
+        of time.  A ``ValueError`` is raised if ``max_vecs_per_proc`` is too
+        small for one row and one column in each of these chunks.  Every
+        column vector is retrieved once per row chunk, so the split first
+        minimizes the number of retrieves, then the number of passes between
+        MPI workers, and then the number of chunks.
+        """
+        num_procs = parallel.get_num_procs()
+        max_num_row_tasks = max(
+            len(tasks) for tasks in parallel.find_assignments(
+                list(range(num_rows))))
+        max_num_col_tasks = max(
+            len(tasks) for tasks in parallel.find_assignments(
+                list(range(num_cols))))
+        if not pass_cols:
+            # No passes, and no chunks in transit
+            max_num_col_tasks = num_cols
+            num_procs = 1
+        num_col_buffers = (
+            self._get_num_col_buffers(pass_cols=pass_cols) +
+            num_extra_col_buffers)
+        if self.max_vecs_per_proc < 1 + num_col_buffers:
+            raise ValueError((
+                'max_vecs_per_proc (%d) must be at least %d, for one row vec '
+                'and %d col vecs in memory at once.  Increase '
+                'max_vecs_per_node, reduce prefetch_depth, or disable '
+                'bidirectional_ring.') % (
+                    self.max_vecs_per_proc, 1 + num_col_buffers,
+                    num_col_buffers))
+
+        best_cost = None
+        plan = None
+        for num_cols_per_proc_chunk in range(
+            1, max(max_num_col_tasks, 1) + 1):
+            num_rows_per_proc_chunk = (
+                self.max_vecs_per_proc -
+                num_col_buffers * num_cols_per_proc_chunk)
+            if num_rows_per_proc_chunk < 1:
+                break
+            num_row_get_loops = int(np.ceil(
+                max_num_row_tasks * 1. / num_rows_per_proc_chunk))
+            num_col_get_loops = int(np.ceil(
+                max_num_col_tasks * 1. / num_cols_per_proc_chunk))
+            num_gets = max_num_row_tasks + num_row_get_loops * max_num_col_tasks
+            num_passes = num_row_get_loops * num_col_get_loops * (num_procs - 1)
+            cost = (
+                num_gets, num_passes, num_row_get_loops * num_col_get_loops)
+            if best_cost is None or cost < best_cost:
+                best_cost = cost
+                plan = ChunkPlan(
+                    num_rows_per_proc_chunk=num_rows_per_proc_chunk,
+                    num_cols_per_proc_chunk=num_cols_per_proc_chunk,
+                    num_row_get_loops=num_row_get_loops,
+                    num_col_get_loops=num_col_get_loops,
+                    num_gets_per_proc=num_gets,
+                    num_passes_per_proc=num_passes)
+
+        if print_plan:
+            self._print_chunk_plan(plan)
+        return plan
+
+
+    def _print_chunk_plan(self, plan):
+        """Prints a plan returned by :py:meth:`plan_chunks`."""
+        self.print_msg((
+            'Chunking plan: %d row vecs and %d col vecs per processor at once, '
+            '%d gets and %d passes per processor') % (
+                plan.num_rows_per_proc_chunk, plan.num_cols_per_proc_chunk,
+                plan.num_gets_per_proc, plan.num_passes_per_proc))
+
+
     def sanity_check(self, test_vec_handle):
         """Checks that user-supplied vector handle and vector satisfy
         requirements.
@@ -164,13 +809,13 @@ class VectorSpaceHandles(object):
         # Copy vector for comparisons before doing anything else, to later check
         # if other operations change the internal data.
         vec_copy = copy.deepcopy(test_vec)
-        vec_copy_mag_sq = self.inner_product(vec_copy, vec_copy)
+        vec_copy_mag_sq = self._inner_product(vec_copy, vec_copy)
 
         # Check that inner product of scaled vector is correct
         scale_factor = 2.
         vec_mult = test_vec * scale_factor
         if abs(
-            self.inner_product(vec_mult, vec_mult) -
+            self._inner_product(vec_mult, vec_mult) -
             vec_copy_mag_sq * scale_factor ** 2) > tol:
             raise ValueError(
                 'Inner product of vector with itself is incorrect after scalar '
@@ -179,7 +824,7 @@ class VectorSpaceHandles(object):
         # Check that inner product of original vector hasn't changed due to
         # scalar multiplication.
         if abs(
-            self.inner_product(test_vec, test_vec) - vec_copy_mag_sq) > tol:
+            self._inner_product(test_vec, test_vec) - vec_copy_mag_sq) > tol:
             raise ValueError(
                 'Inner product of original test vector with itself has changed '
                 'value after scalar multiplication.')
@@ -187,14 +832,14 @@ class VectorSpaceHandles(object):
         # Check that the inner product of a summed vector is correct
         vec_add = test_vec + test_vec
         if abs(
-            self.inner_product(vec_add, vec_add) - vec_copy_mag_sq * 4) > tol:
+            self._inner_product(vec_add, vec_add) - vec_copy_mag_sq * 4) > tol:
             raise ValueError(
                 'Inner product of vector with itself is incorrect after '
                 'vector addition.')
 
         # Check that inner product of original vector hasn't changed due to
         # vector addition.
-        if abs(self.inner_product(test_vec, test_vec) - vec_copy_mag_sq) > tol:
+        if abs(self._inner_product(test_vec, test_vec) - vec_copy_mag_sq) > tol:
             raise ValueError(
                 'Inner product of original test vector with itself has changed '
                 'value after vector addition.')
@@ -203,7 +848,7 @@ class VectorSpaceHandles(object):
         # multiplication and vector addition.
         vec_add_mult = test_vec * scale_factor + test_vec
         if abs(
-            self.inner_product(vec_add_mult, vec_add_mult) -
+            self._inner_product(vec_add_mult, vec_add_mult) -
                 vec_copy_mag_sq * (scale_factor + 1) ** 2) > tol:
             raise ValueError(
                 'Inner product of vector is incorrect after scalar '
@@ -211,7 +856,7 @@ class VectorSpaceHandles(object):
 
         # Check that inner product of original vector hasn't changed due to
         # scalar multiplication and vector addition.
-        if abs(self.inner_product(test_vec, test_vec) - vec_copy_mag_sq) > tol:
+        if abs(self._inner_product(test_vec, test_vec) - vec_copy_mag_sq) > tol:
             raise ValueError(
                 'Inner product of original test vector with itself has changed '
                 'value after scalar multiplication and vector addition.')
@@ -289,6 +934,18 @@ class VectorSpaceHandles(object):
         self._check_inner_product()
         row_vec_handles = util.make_iterable(row_vec_handles)
         col_vec_handles = util.make_iterable(col_vec_handles)
+        if self.IP_cache_path is not None:
+            return self._compute_IP_array_with_cache(
+                row_vec_handles, col_vec_handles)
+        return self._compute_inner_product_array(
+            row_vec_handles, col_vec_handles)
+
+
+    def _compute_inner_product_array(self, row_vec_handles, col_vec_handles):
+        """Computes an inner product array, without the cache.  See
+        :py:meth:`compute_inner_product_array`."""
+        if self.max_vecs_per_proc is None:
+            self.set_max_vecs_from_memory(row_vec_handles[0])
 
         num_cols = len(col_vec_handles)
         num_rows = len(row_vec_handles)
@@ -307,32 +964,18 @@ class VectorSpaceHandles(object):
         # convenience
         rank = parallel.get_rank()
 
-        ## Old way that worked
-        # num_cols_per_proc_chunk is the number of cols each proc gets at once
-        num_cols_per_proc_chunk = 1
-        num_rows_per_proc_chunk = (
-            self.max_vecs_per_proc - num_cols_per_proc_chunk)
-
-        ## New way
-        #if self.max_vecs_per_node > max_num_row_tasks:
-        #    num_cols_per_proc_chunk =
-        #num_rows_per_proc_chunk = self.max_vecs_per_proc - \
-        #    num_cols_per_proc_chunk
+        # Split the memory between rows and columns
+        plan = self.plan_chunks(
+            num_rows, num_cols,
+            num_extra_col_buffers=self._get_num_stack_buffers())
+        num_rows_per_proc_chunk = plan.num_rows_per_proc_chunk
+        num_cols_per_proc_chunk = plan.num_cols_per_proc_chunk
+        num_row_get_loops = plan.num_row_get_loops
+        num_col_get_loops = plan.num_col_get_loops
 
         # Determine how the retrieving and inner products will be split up.
         row_tasks = parallel.find_assignments(list(range(num_rows)))
         col_tasks = parallel.find_assignments(list(range(num_cols)))
-
-        # Find max number of col tasks among all processors
-        max_num_row_tasks = max([len(tasks) for tasks in row_tasks])
-        max_num_col_tasks = max([len(tasks) for tasks in col_tasks])
-
-        # These variables are the number of iters through loops that retrieve
-        # ("get") row and column vecs.
-        num_row_get_loops = \
-            int(np.ceil(max_num_row_tasks*1./num_rows_per_proc_chunk))
-        num_col_get_loops = \
-            int(np.ceil(max_num_col_tasks*1./num_cols_per_proc_chunk))
         if num_row_get_loops > 1:
             self.print_msg((
                 'Warning: The column vecs, of which '
@@ -343,7 +986,7 @@ class VectorSpaceHandles(object):
         # Burn the first inner product, it sometimes contains slow imports
         row_vec = row_vec_handles[0].get()
         col_vec = col_vec_handles[0].get()
-        IP_burn = self.inner_product(row_vec, col_vec)
+        IP_burn = self._compute_IP_block([row_vec], [col_vec])
 
         # Time the get method
         start_time = time()
@@ -353,21 +996,14 @@ class VectorSpaceHandles(object):
         # Time the inner product method and get inner product type (real or
         # complex)
         start_time = time()
-        IP = self.inner_product(row_vec, col_vec)
+        IP = self._compute_IP_block([row_vec], [col_vec])
         IP_time = time() - start_time
-        IP_type = type(IP)
+        IP_type = IP.dtype
 
         # Estimate time to compute entire inner product array
         total_IP_time = (
             num_rows * num_cols * IP_time / parallel.get_num_procs())
-        vecs_per_proc = (
-            self.max_vecs_per_node * parallel.get_num_nodes() /
-            parallel.get_num_procs())
-        num_gets =  (
-            num_rows * num_cols /
-            ((vecs_per_proc - 2) * parallel.get_num_procs() ** 2) +
-            num_rows / parallel.get_num_procs())
-        total_get_time = num_gets * get_time
+        total_get_time = plan.num_gets_per_proc * get_time
         self.print_msg((
             'Computing the inner product array will take at least %.1f '
             'minutes.') % ((total_IP_time + total_get_time) / 60.))
@@ -377,108 +1013,88 @@ class VectorSpaceHandles(object):
         # processor has a full IP_array with size
         # num_rows x num_cols even though each processor is not responsible for
         # filling in all of these entries. After each proc fills in what it is
-        # responsible for, the other entries remain 0's. Then, an allreduce
-        # is done and all the IP_arrays are summed. This is simpler than
-        # concatenating chunks of the IP_arrays.
-        # The efficiency is not an issue; the size of the arrays
-        # are small compared to the size of the vecs for large data.
+        # responsible for (all columns of its rows), the rows of all procs are
+        # gathered into the IP_arrays.  Only the filled-in rows are sent.
         IP_array = np.zeros((num_rows, num_cols), dtype=IP_type)
-        for row_get_index in range(num_row_get_loops):
-            if len(row_tasks[rank]) > 0:
-                start_row_index = min(
-                    row_tasks[rank][0] + (
-                        row_get_index * num_rows_per_proc_chunk),
-                    row_tasks[rank][-1] + 1)
-                end_row_index = min(
-                    row_tasks[rank][-1] + 1,
-                    start_row_index + num_rows_per_proc_chunk)
-                row_vecs = [
-                    row_vec_handle.get() for row_vec_handle in
-                    row_vec_handles[start_row_index:end_row_index]]
-            else:
-                row_vecs = []
-
-            for col_get_index in range(num_col_get_loops):
-                if len(col_tasks[rank]) > 0:
-                    start_col_index = min(
-                        col_tasks[rank][0] + (
-                            col_get_index * num_cols_per_proc_chunk),
-                        col_tasks[rank][-1] + 1)
-                    end_col_index = min(
-                        col_tasks[rank][-1] + 1,
-                        start_col_index + num_cols_per_proc_chunk)
-                else:
-                    start_col_index = 0
-                    end_col_index = 0
-
-                # Cycle the col vecs to proc with rank -> mod(rank+1,num_procs)
-                # Must do this for each processor, until data makes a circle
-                col_vecs_recv = (None, None)
-                col_indices = list(range(start_col_index, end_col_index))
-                for pass_index in range(parallel.get_num_procs()):
-                    # If on the first pass, get the col vecs, no send/recv
-                    # This is all that is called when in serial, loop iterates
-                    # once.
-                    if pass_index == 0:
-                        col_vecs = [
-                            col_handle.get() for col_handle in
-                            col_vec_handles[start_col_index:end_col_index]]
-                    else:
-                        # Determine with whom to communicate
-                        dest = (rank + 1) % parallel.get_num_procs()
-                        source = (rank - 1) % parallel.get_num_procs()
-
-                        # Create unique tag based on send/recv ranks
-                        send_tag = (
-                            rank * (parallel.get_num_procs() + 1) + dest)
-                        recv_tag = (
-                            source * (parallel.get_num_procs() + 1) + rank)
-
-                        # Collect data and send/receive
-                        col_vecs_send = (col_vecs, col_indices)
-                        request = parallel.comm.isend(
-                            col_vecs_send, dest=dest, tag=send_tag)
-                        col_vecs_recv = parallel.comm.recv(
-                            source=source, tag=recv_tag)
-                        request.Wait()
-                        parallel.barrier()
-                        col_indices = col_vecs_recv[1]
-                        col_vecs = col_vecs_recv[0]
-
-                    # Compute the IPs for this set of data col_indices stores
-                    # the indices of the IP_array columns to be filled in.
-                    if len(row_vecs) > 0:
-                        for row_index in range(start_row_index, end_row_index):
-                            for col_vec_index, col_vec in enumerate(col_vecs):
-                                IP_array[
-                                    row_index,
-                                    col_indices[col_vec_index]
-                                ] = self.inner_product(
-                                    row_vecs[row_index - start_row_index],
-                                    col_vec)
-                        if (
-                            (time() - self.prev_print_time) >
-                            self.print_interval):
-                            num_completed_IPs = (np.abs(IP_array) > 0.).sum()
-                            percent_completed_IPs = (
-                                num_completed_IPs *
-                                parallel.get_num_MPI_workers() /
-                                (num_cols * num_rows)) * 100.
-                            self.print_msg(
-                                'Completed %.1f%% of inner products' %
-                                percent_completed_IPs,
-                                output_channel='stderr')
-                            self.prev_print_time = time()
 
-                # Clear the retrieved column vecs after done this pass cycle
-                del col_vecs
+        # Resume from a checkpoint, skipping the chunks of rows completed on
+        # all procs.  Entries of chunks completed on only some procs are
+        # computed again.
+        signature = self._get_checkpoint_signature(
+            'IP_array', [row_vec_handles, col_vec_handles], plan)
+        num_done, checkpoint_IP_array = self._get_checkpoint(
+            'IP_array', signature)
+        if checkpoint_IP_array is not None:
+            IP_array = checkpoint_IP_array
+
+        # Each proc retrieves its chunks of rows, and for each, all of its
+        # chunks of columns, possibly ahead of time.
+        row_chunk_ranges = _get_proc_chunk_ranges(
+            row_tasks[rank], num_rows_per_proc_chunk, num_row_get_loops)
+        row_chunk_ranges = row_chunk_ranges[num_done:]
+        col_chunk_ranges = _get_proc_chunk_ranges(
+            col_tasks[rank], num_cols_per_proc_chunk, num_col_get_loops)
+        handle_chunks = []
+        for start_row_index, end_row_index in row_chunk_ranges:
+            handle_chunks.append(
+                row_vec_handles[start_row_index:end_row_index])
+            handle_chunks.extend([
+                col_vec_handles[start_col_index:end_col_index]
+                for start_col_index, end_col_index in col_chunk_ranges])
+        prefetcher = self._prefetch(handle_chunks, num_cols_per_proc_chunk)
+        try:
+            for row_chunk_index, (start_row_index, end_row_index) in enumerate(
+                row_chunk_ranges, num_done):
+                row_vecs = prefetcher.get_vecs()
+                for start_col_index, end_col_index in col_chunk_ranges:
+                    # Pass the col vecs around the ring of processors, until
+                    # each processor has used the col vecs of all others.  In
+                    # serial, the loop iterates once.
+                    for col_vecs, col_indices in self._pass_vecs_around_ring(
+                        prefetcher.get_vecs(),
+                        list(range(start_col_index, end_col_index))):
+                        # Compute the IPs for this set of data col_indices
+                        # stores the indices of the IP_array columns to be
+                        # filled in.
+                        if len(row_vecs) > 0:
+                            IP_array[
+                                start_row_index:end_row_index, col_indices
+                            ] = self._compute_IP_block(row_vecs, col_vecs)
+                            if (
+                                (time() - self.prev_print_time) >
+                                self.print_interval):
+                                num_completed_IPs = (
+                                    np.abs(IP_array) > 0.).sum()
+                                percent_completed_IPs = (
+                                    num_completed_IPs *
+                                    parallel.get_num_MPI_workers() /
+                                    (num_cols * num_rows)) * 100.
+                                self.print_msg(
+                                    'Completed %.1f%% of inner products' %
+                                    percent_completed_IPs,
+                                    output_channel='stderr')
+                                self.prev_print_time = time()
+
+                    # Clear the retrieved column vecs after done this pass
+                    # cycle
+                    del col_vecs
 
-            # Completed a chunk of rows and all columns on all processors.
-            del row_vecs
+                # Completed a chunk of rows and all columns on all processors.
+                del row_vecs
+                self._put_checkpoint(
+                    'IP_array', signature, row_chunk_index + 1, IP_array)
+        finally:
+            prefetcher.close()
 
         # Assign these chunks into IP_array.
-        if parallel.is_distributed():
-            IP_array = parallel.custom_comm.allreduce(IP_array)
+        if len(row_tasks[rank]) > 0:
+            proc_blocks = [(
+                slice(row_tasks[rank][0], row_tasks[rank][-1] + 1),
+                slice(None))]
+        else:
+            proc_blocks = []
+        IP_array = parallel.allgather_array_blocks(IP_array, proc_blocks)
+        self._remove_checkpoint('IP_array', signature)
 
         if transpose:
             IP_array = IP_array.conj().T
@@ -516,24 +1132,154 @@ class VectorSpaceHandles(object):
         # :py:meth:`compute_inner_product_array`.
         self._check_inner_product()
         vec_handles = util.make_iterable(vec_handles)
+        if self.IP_cache_path is not None:
+            return self._compute_IP_array_with_cache(vec_handles)
+        return self._compute_symm_inner_product_array(vec_handles)
+
+
+    def compute_inner_product_arrays(self, vec_handles_lists, index_pairs):
+        """Computes several inner product arrays among lists of vector objects
+        in one pass over the vector objects.
+
+        Args:
+            ``vec_handles_lists``: List of lists of handles for vector
+            objects, e.g., ``[vec_handles, adv_vec_handles]``.
+
+            ``index_pairs``: List of ``(row_index, col_index)`` pairs of
+            indices into ``vec_handles_lists``, one for each inner product
+            array to compute.  For example, ``[(0, 0), (0, 1), (1, 1)]`` gives
+            the arrays :math:`X^* W X`, :math:`X^* W Y`, and :math:`Y^* W Y`.
+
+        Returns:
+            ``IP_arrays``: List of 2D arrays of inner products, one for each
+            pair in ``index_pairs``.
+
+        The lists of vector objects are joined, in the order given, and only
+        the blocks of a symmetric inner product array among them that hold
+        the requested arrays are computed.  Each chunk of rows is retrieved
+        once and used for all of its blocks, with only the columns those
+        blocks need.  For example, with the pairs ``[(0, 0), (0, 1)]``, each
+        chunk of :math:`X` is used for both :math:`X^* W X` and
+        :math:`X^* W Y`, and :math:`Y^* W Y` is not computed.  Lists that
+        should be rows, like :math:`X` here, should thus come first.  Lists
+        that appear in no pair are not retrieved.  The tiles schedule is only
+        used if every pair is of a list with itself.  With ``IP_cache_path``,
+        each requested array is taken from the cache, and only its missing
+        inner products are computed.
+        """
+        vec_handles_lists = [
+            list(util.make_iterable(vec_handles))
+            for vec_handles in vec_handles_lists]
+        for row_index, col_index in index_pairs:
+            if (not 0 <= row_index < len(vec_handles_lists) or
+                not 0 <= col_index < len(vec_handles_lists)):
+                raise ValueError(
+                    'Index pair (%d, %d) is out of range.' %
+                    (row_index, col_index))
+
+        # Join the lists that are used, keeping the slice of each list
+        list_indices = sorted(set(
+            index for index_pair in index_pairs for index in index_pair))
+        all_vec_handles = []
+        list_slices = {}
+        for list_index in list_indices:
+            list_slices[list_index] = slice(
+                len(all_vec_handles),
+                len(all_vec_handles) + len(vec_handles_lists[list_index]))
+            all_vec_handles.extend(vec_handles_lists[list_index])
+        if len(all_vec_handles) == 0:
+            return [
+                np.zeros((
+                    len(vec_handles_lists[row_index]),
+                    len(vec_handles_lists[col_index])))
+                for row_index, col_index in index_pairs]
+
+        # The blocks in the upper triangle of the joined array that hold the
+        # requested arrays.  The others are their conjugate transposes.
+        needed_blocks = []
+        for row_index, col_index in index_pairs:
+            needed_block = sorted(
+                [list_slices[row_index], list_slices[col_index]],
+                key=lambda list_slice: list_slice.start)
+            if (needed_block[0].stop > needed_block[0].start and
+                needed_block[1].stop > needed_block[1].start):
+                needed_blocks.append(tuple(needed_block))
+        self._check_inner_product()
+        if self.IP_cache_path is not None:
+            # Take each needed block from the cache separately, so that
+            # blocks that were not requested are neither computed nor cached
+            IP_array = np.zeros((len(all_vec_handles), len(all_vec_handles)))
+            computed_blocks = []
+            for row_slice, col_slice in needed_blocks:
+                bounds = (
+                    row_slice.start, row_slice.stop,
+                    col_slice.start, col_slice.stop)
+                if bounds in computed_blocks:
+                    continue
+                computed_blocks.append(bounds)
+                if row_slice == col_slice:
+                    block = self._compute_IP_array_with_cache(
+                        all_vec_handles[row_slice])
+                else:
+                    block = self._compute_IP_array_with_cache(
+                        all_vec_handles[row_slice],
+                        all_vec_handles[col_slice])
+                IP_array = IP_array.astype(np.result_type(IP_array, block))
+                IP_array[row_slice, col_slice] = block
+                IP_array[col_slice, row_slice] = block.conj().T
+        elif len(needed_blocks) > 0:
+            IP_array = self._compute_symm_inner_product_array(
+                all_vec_handles, needed_blocks=needed_blocks)
+        else:
+            IP_array = np.zeros((len(all_vec_handles), len(all_vec_handles)))
+        return [
+            IP_array[list_slices[row_index], list_slices[col_index]]
+            for row_index, col_index in index_pairs]
+
+
+    def _compute_symm_inner_product_array(
+        self, vec_handles, needed_blocks=None):
+        """Computes a symmetric inner product array, without the cache.  See
+        :py:meth:`compute_symm_inner_product_array`.
+
+        If ``needed_blocks`` (a list of pairs of row and column slices of
+        blocks in the upper triangle) is given, only the vecs and inner
+        products needed for these blocks are computed.  Rows after the last
+        block are not retrieved, and for each chunk of rows only the columns
+        of its blocks are.  Other elements are zero, except for elements
+        computed along with the needed ones.  The tiles schedule is only used
+        if all of the blocks are on the diagonal, since tiles off the diagonal
+        retrieve their rows again for every block of columns."""
+        if self.max_vecs_per_proc is None:
+            self.set_max_vecs_from_memory(vec_handles[0])
         num_vecs = len(vec_handles)
-        total_num_IPs = num_vecs * (num_vecs + 1) / 2.
+        if needed_blocks is None:
+            needed_blocks = [(slice(0, num_vecs), slice(0, num_vecs))]
+        if self.symm_schedule == 'tiles' and all(
+            row_slice == col_slice for row_slice, col_slice in needed_blocks):
+            return self._compute_symm_inner_product_array_tiles(
+                vec_handles, needed_blocks=needed_blocks)
+        num_row_vecs = max(
+            row_slice.stop for row_slice, col_slice in needed_blocks)
+        total_num_IPs = _count_needed_IPs(needed_blocks)
 
         # num_cols_per_chunk is the number of cols each proc gets at once.
         # Columns are retrieved if the array must be broken up into sets of
         # chunks.  Then symmetric upper triangular portions will be computed,
         # followed by a rectangular piece that uses columns not already in
         # memory.
-        num_cols_per_proc_chunk = 1
-        num_rows_per_proc_chunk = (
-            self.max_vecs_per_proc - num_cols_per_proc_chunk)
+        plan = self.plan_chunks(
+            num_row_vecs, num_vecs,
+            num_extra_col_buffers=self._get_num_stack_buffers())
+        num_cols_per_proc_chunk = plan.num_cols_per_proc_chunk
+        num_rows_per_proc_chunk = plan.num_rows_per_proc_chunk
 
         # <nprocs> chunks are computed simulaneously, making up a set.
         num_cols_per_chunk = num_cols_per_proc_chunk * parallel.get_num_procs()
         num_rows_per_chunk = num_rows_per_proc_chunk * parallel.get_num_procs()
 
         # <num_row_chunks> is the number of sets that must be computed.
-        num_row_chunks = int(np.ceil(num_vecs * 1. / num_rows_per_chunk))
+        num_row_chunks = int(np.ceil(num_row_vecs * 1. / num_rows_per_chunk))
         if num_row_chunks > 1:
             self.print_msg((
                 'Warning: The vecs, of which there are %d, will be retrieved '
@@ -543,7 +1289,7 @@ class VectorSpaceHandles(object):
 
         # Burn the first inner product, as it sometimes contains slow imports
         test_vec = vec_handles[0].get()
-        IP_burn = self.inner_product(test_vec, test_vec)
+        IP_burn = self._compute_IP_block([test_vec], [test_vec])
 
         # Time the get method
         start_time = time()
@@ -553,21 +1299,13 @@ class VectorSpaceHandles(object):
         # Time the inner product method and determine the inner product type
         # (real or complex)
         start_time = time()
-        IP = self.inner_product(test_vec, test_vec)
+        IP = self._compute_IP_block([test_vec], [test_vec])
         IP_time = time() - start_time
-        IP_type = type(IP)
+        IP_type = IP.dtype
 
         # Estimate the time to compute the total inner product array
-        total_IP_time = (
-            num_vecs ** 2 * IP_time / 2. / parallel.get_num_procs())
-        vecs_per_proc = (
-            self.max_vecs_per_node * parallel.get_num_nodes() /
-            parallel.get_num_procs())
-        num_gets =  (
-            (num_vecs ** 2 / 2.) / ((vecs_per_proc - 2) *
-            parallel.get_num_procs() ** 2) +
-            num_vecs / parallel.get_num_procs() / 2.)
-        total_get_time = num_gets * get_time
+        total_IP_time = total_num_IPs * IP_time / parallel.get_num_procs()
+        total_get_time = plan.num_gets_per_proc / 2. * get_time
         self.print_msg((
             'Computing the inner product array will take at least %.1f '
             'minutes' % ((total_IP_time + total_get_time) / 60.)))
@@ -579,202 +1317,135 @@ class VectorSpaceHandles(object):
         # For the rectangular portions, the inner product array is filled
         # in directly.
         IP_array = np.zeros((num_vecs, num_vecs), dtype=IP_type)
-        for start_row_index in range(0, num_vecs, num_rows_per_chunk):
-            end_row_index = min(num_vecs, start_row_index + num_rows_per_chunk)
-            proc_row_tasks_all = parallel.find_assignments(list(range(
-                start_row_index, end_row_index)))
-            num_active_procs = len([
-                task for task in proc_row_tasks_all if task != []])
-            proc_row_tasks = proc_row_tasks_all[parallel.get_rank()]
-            if len(proc_row_tasks)!=0:
-                row_vecs = [
-                    vec_handle.get() for vec_handle in
-                    vec_handles[proc_row_tasks[0]:proc_row_tasks[-1] + 1]]
-            else:
-                row_vecs = []
 
-            # Triangular chunks
+        # Resume from a checkpoint, skipping the sets of chunks of rows
+        # completed on all procs
+        signature = self._get_checkpoint_signature(
+            'symm_IP_array', [vec_handles], plan, [
+                (row_slice.start, row_slice.stop, col_slice.start,
+                col_slice.stop) for row_slice, col_slice in needed_blocks])
+        num_done, checkpoint_IP_array = self._get_checkpoint(
+            'symm_IP_array', signature)
+        if checkpoint_IP_array is not None:
+            IP_array = checkpoint_IP_array
+        start_row_indices = list(
+            range(0, num_row_vecs, num_rows_per_chunk))[num_done:]
+
+        # Chunks of vecs retrieved by this proc, in the order they are used:
+        # the rows of each set of chunks, then the columns of the rectangular
+        # portion next to it that are needed.
+        def get_col_index_chunks(start_row_index, end_row_index):
+            needed_col_indices = _get_needed_col_indices(
+                needed_blocks, start_row_index, end_row_index)
+            return [
+                needed_col_indices[
+                    start_col_index:start_col_index + num_cols_per_chunk]
+                for start_col_index in range(
+                    0, len(needed_col_indices), num_cols_per_chunk)]
+        handle_chunks = []
+        for start_row_index in start_row_indices:
+            end_row_index = min(
+                num_row_vecs, start_row_index + num_rows_per_chunk)
+            proc_row_tasks = parallel.find_assignments(list(range(
+                start_row_index, end_row_index)))[parallel.get_rank()]
             if len(proc_row_tasks) > 0:
-                # Test that indices are consecutive
-                if proc_row_tasks[0:] != list(range(
-                    proc_row_tasks[0], proc_row_tasks[-1] + 1)):
-                    raise ValueError('Indices are not consecutive.')
-
-                # Per-processor triangles (using only vecs in memory)
-                for row_index in range(proc_row_tasks[0],
-                    proc_row_tasks[-1] + 1):
-                    # Diagonal term
-                    IP_array[row_index, row_index] = self.inner_product(
-                        row_vecs[row_index - proc_row_tasks[0]],
-                        row_vecs[row_index - proc_row_tasks[0]])
-
-                    # Off-diagonal terms
-                    for col_index in range(
-                        row_index + 1, proc_row_tasks[-1] + 1):
-                        IP_array[row_index, col_index] = self.inner_product(
-                            row_vecs[row_index - proc_row_tasks[0]],
-                            row_vecs[col_index - proc_row_tasks[0]])
-
-            # Number of square chunks to fill in is n * (n-1) / 2.  At each
-            # iteration we fill in n of them, so we need (n-1) / 2
-            # iterations (round up).
-            for set_index in range(int(np.ceil((num_active_procs - 1.) / 2))):
-                # The current proc is "sender"
-                my_rank = parallel.get_rank()
-                my_row_indices = proc_row_tasks
-                my_num_rows = len(my_row_indices)
-
-                # The proc to send to is "destination"
-                dest_rank = (my_rank + set_index + 1) % num_active_procs
-
-                # The proc that data is received from is the "source"
-                source_rank = (my_rank - set_index - 1) % num_active_procs
-
-                # Find the maximum number of sends/recv to be done by any proc
-                max_num_to_send = int(np.ceil(1. * max([len(tasks) for \
-                    tasks in proc_row_tasks_all]) /\
-                    num_cols_per_proc_chunk))
-                '''
-                # Pad tasks with nan so that everyone has the same
-                # number of things to send.  Same for list of vecs with None.
-                # The empty lists will not do anything when enumerated, so no
-                # inner products will be taken.  nan is inserted into the
-                # indices because then min/max of the indices can be taken.
-                if my_num_rows != len(row_vecs):
-                    raise ValueError('Number of rows assigned does not ' +\
-                        'match number of vecs in memory.')
-                if my_num_rows > 0 and my_num_rows < max_num_to_send:
-                    my_row_indices += [np.nan] * (max_num_to_send - my_num_rows)
-                    row_vecs += [[]] * (max_num_to_send - my_num_rows)
-                '''
-                for send_index in range(max_num_to_send):
-                    # Only processors responsible for rows communicate
-                    if my_num_rows > 0:
-                        # Send row vecs, in groups of num_cols_per_proc_chunk
-                        # These become columns in the ensuing computation
-                        start_col_index = send_index * num_cols_per_proc_chunk
-                        end_col_index = min(
-                            start_col_index + num_cols_per_proc_chunk,
-                            my_num_rows)
-                        col_vecs_send = (
-                            row_vecs[start_col_index:end_col_index],
-                            my_row_indices[start_col_index:end_col_index])
-
-                        # Create unique tags based on ranks
-                        send_tag = my_rank * (
-                            parallel.get_num_procs() + 1) + dest_rank
-                        recv_tag = source_rank * (
-                            parallel.get_num_procs() + 1) + my_rank
-
-                        # Send and receieve data.  The Wait() command after the
-                        # receive prevents a race condition not fixed by sync().
-                        # The Wait() is very important for the non-
-                        # blocking send (though we are unsure why).
-                        request = parallel.comm.isend(
-                            col_vecs_send, dest=dest_rank, tag=send_tag)
-                        col_vecs_recv = parallel.comm.recv(
-                            source=source_rank, tag=recv_tag)
-                        request.Wait()
-                        col_vecs = col_vecs_recv[0]
-                        my_col_indices = col_vecs_recv[1]
-
-                        for row_index in range(
-                            my_row_indices[0], my_row_indices[-1] + 1):
-                            for col_vec_index, col_vec in enumerate(col_vecs):
-                                IP_array[
-                                    row_index,
-                                    my_col_indices[col_vec_index]
-                                ] = self.inner_product(
-                                    row_vecs[row_index - my_row_indices[0]],
-                                    col_vec)
-                            if (
-                                (time() - self.prev_print_time) >
-                                self.print_interval):
-                                num_completed_IPs = np.sum(
-                                    np.abs(np.triu(IP_array)) > 0.)
-                                percent_completed_IPs = (
-                                    num_completed_IPs *
-                                    parallel.get_num_MPI_workers() /
-                                    total_num_IPs) * 100.
-                                self.print_msg(
-                                    'Completed %.1f%% of inner products' %
-                                    percent_completed_IPs,
-                                    output_channel='stderr')
-                                self.prev_print_time = time()
-
-                    # Sync after send/receive
-                    parallel.barrier()
-
-            # Fill in the rectangular portion next to each triangle (if nec.).
-            # Start at index after last row, continue to last column. This part
-            # of the code is the same as in compute_IP_array, as of
-            # revision 141.
-            for start_col_index in range(
-                end_row_index, num_vecs, num_cols_per_chunk):
-                end_col_index = min(
-                    start_col_index + num_cols_per_chunk, num_vecs)
-                proc_col_tasks = parallel.find_assignments(list(range(
-                    start_col_index, end_col_index)))[parallel.get_rank()]
-
-                # Pass the col vecs to proc with rank -> mod(rank+1,numProcs)
-                # Must do this for each processor, until data makes a circle
-                col_vecs_recv = (None, None)
+                handle_chunks.append(
+                    vec_handles[proc_row_tasks[0]:proc_row_tasks[-1] + 1])
+            for col_index_chunk in get_col_index_chunks(
+                start_row_index, end_row_index):
+                proc_col_tasks = parallel.find_assignments(
+                    col_index_chunk)[parallel.get_rank()]
                 if len(proc_col_tasks) > 0:
-                    col_indices = list(range(
-                        proc_col_tasks[0], proc_col_tasks[-1] + 1))
+                    handle_chunks.append(
+                        [vec_handles[col_index] for col_index in
+                        proc_col_tasks])
+        prefetcher = self._prefetch(handle_chunks, num_cols_per_proc_chunk)
+        try:
+            for row_chunk_index, start_row_index in enumerate(
+                start_row_indices, num_done):
+                end_row_index = min(
+                    num_row_vecs, start_row_index + num_rows_per_chunk)
+                proc_row_tasks_all = parallel.find_assignments(list(range(
+                    start_row_index, end_row_index)))
+                num_active_procs = len([
+                    task for task in proc_row_tasks_all if task != []])
+                proc_row_tasks = proc_row_tasks_all[parallel.get_rank()]
+                if len(proc_row_tasks)!=0:
+                    row_vecs = prefetcher.get_vecs()
                 else:
-                    col_indices = []
-
-                for num_passes in range(parallel.get_num_procs()):
-                    # If on the first pass, get the col vecs, no send/recv
-                    # This is all that is called when in serial, loop iterates
-                    # once.
-                    if num_passes == 0:
-                        if len(col_indices) > 0:
-                            col_vecs = [
-                                col_handle.get() for col_handle in
-                                vec_handles[col_indices[0]:col_indices[-1] + 1]]
-                        else:
-                            col_vecs = []
+                    row_vecs = []
+
+                # Triangular chunks
+                if len(proc_row_tasks) > 0:
+                    # Test that indices are consecutive
+                    if proc_row_tasks[0:] != list(range(
+                        proc_row_tasks[0], proc_row_tasks[-1] + 1)):
+                        raise ValueError('Indices are not consecutive.')
+
+                    # Per-processor triangles (using only vecs in memory).
+                    # Only the upper-triangular elements (including the
+                    # diagonal) are kept.
+                    IP_array[
+                        proc_row_tasks[0]:proc_row_tasks[-1] + 1,
+                        proc_row_tasks[0]:proc_row_tasks[-1] + 1
+                    ] = np.triu(self._compute_IP_block(row_vecs, row_vecs))
+
+                # Number of square chunks to fill in is n * (n-1) / 2.  At
+                # each iteration we fill in n of them, so we need (n-1) / 2
+                # iterations (round up).
+                for set_index in range(
+                    int(np.ceil((num_active_procs - 1.) / 2))):
+                    # The current proc is "sender"
+                    my_rank = parallel.get_rank()
+                    my_row_indices = proc_row_tasks
+                    my_num_rows = len(my_row_indices)
+
+                    # The proc to send to is "destination"
+                    dest_rank = (my_rank + set_index + 1) % num_active_procs
+
+                    # The proc that data is received from is the "source"
+                    source_rank = (my_rank - set_index - 1) % num_active_procs
+
+                    # Find the maximum number of sends/recv to be done by any
+                    # proc
+                    max_num_to_send = int(np.ceil(1. * max([len(tasks) for \
+                        tasks in proc_row_tasks_all]) /\
+                        num_cols_per_proc_chunk))
+                    '''
+                    # Pad tasks with nan so that everyone has the same
+                    # number of things to send.  Same for list of vecs with
+                    # None.  The empty lists will not do anything when
+                    # enumerated, so no inner products will be taken.  nan is
+                    # inserted into the indices because then min/max of the
+                    # indices can be taken.
+                    if my_num_rows != len(row_vecs):
+                        raise ValueError('Number of rows assigned does not ' +\
+                            'match number of vecs in memory.')
+                    if my_num_rows > 0 and my_num_rows < max_num_to_send:
+                        my_row_indices += (
+                            [np.nan] * (max_num_to_send - my_num_rows))
+                        row_vecs += [[]] * (max_num_to_send - my_num_rows)
+                    '''
+                    # Only processors responsible for rows communicate.  Send
+                    # row vecs, in groups of num_cols_per_proc_chunk.  These
+                    # become columns in the ensuing computation.
+                    if my_num_rows > 0:
+                        col_vecs_send = [
+                            (row_vecs[start_col_index:start_col_index +
+                                num_cols_per_proc_chunk],
+                            my_row_indices[start_col_index:start_col_index +
+                                num_cols_per_proc_chunk])
+                            for start_col_index in range(
+                                0, max_num_to_send * num_cols_per_proc_chunk,
+                                num_cols_per_proc_chunk)]
                     else:
-                        # Determine whom to communicate with
-                        dest = (
-                            (parallel.get_rank() + 1) %
-                            parallel.get_num_procs())
-                        source = (
-                            (parallel.get_rank() - 1) %
-                            parallel.get_num_procs())
-
-                        # Create unique tag based on ranks
-                        send_tag = parallel.get_rank() * (
-                            parallel.get_num_procs() + 1) + dest
-                        recv_tag = source * (
-                            parallel.get_num_procs() + 1) + parallel.get_rank()
-
-                        # Collect data and send/receive
-                        col_vecs_send = (col_vecs, col_indices)
-                        request = parallel.comm.isend(
-                            col_vecs_send, dest=dest, tag=send_tag)
-                        col_vecs_recv = parallel.comm.recv(
-                            source=source, tag=recv_tag)
-                        request.Wait()
-                        parallel.barrier()
-                        col_indices = col_vecs_recv[1]
-                        col_vecs = col_vecs_recv[0]
-
-                    # Compute the IPs for this set of data col_indices stores
-                    # the indices of the IP_array columns to be
-                    # filled in.
-                    if len(proc_row_tasks) > 0:
-                        for row_index in range(
-                            proc_row_tasks[0], proc_row_tasks[-1] + 1):
-                            for col_vec_index, col_vec in enumerate(col_vecs):
-                                IP_array[
-                                    row_index,
-                                    col_indices[col_vec_index]
-                                ] = self.inner_product(
-                                    row_vecs[row_index - proc_row_tasks[0]],
-                                    col_vec)
+                        col_vecs_send = []
+                    for col_vecs, my_col_indices in self._exchange_vecs(
+                        col_vecs_send, dest_rank, source_rank):
+                        IP_array[
+                            my_row_indices[0]:my_row_indices[-1] + 1,
+                            my_col_indices
+                        ] = self._compute_IP_block(row_vecs, col_vecs)
                         if (
                             (time() - self.prev_print_time) >
                             self.print_interval):
@@ -790,14 +1461,77 @@ class VectorSpaceHandles(object):
                                 output_channel='stderr')
                             self.prev_print_time = time()
 
-            # Completed a chunk of rows and all columns on all processors.
-            # Finished row_vecs loop, delete memory used
-            del row_vecs
+                # Fill in the rectangular portion next to each triangle (if
+                # nec.).  Start at index after last row, continue to last
+                # needed column. This part of the code is the same as in
+                # compute_IP_array, as of revision 141.
+                for col_index_chunk in get_col_index_chunks(
+                    start_row_index, end_row_index):
+                    proc_col_tasks = parallel.find_assignments(
+                        col_index_chunk)[parallel.get_rank()]
+
+                    # Pass the col vecs around the ring of processors, until
+                    # each processor has used the col vecs of all others.  In
+                    # serial, the loop iterates once.
+                    if len(proc_col_tasks) > 0:
+                        col_vecs = prefetcher.get_vecs()
+                        col_indices = list(proc_col_tasks)
+                    else:
+                        col_vecs = []
+                        col_indices = []
+                    for col_vecs, col_indices in self._pass_vecs_around_ring(
+                        col_vecs, col_indices):
+                        # Compute the IPs for this set of data col_indices
+                        # stores the indices of the IP_array columns to be
+                        # filled in.
+                        if len(proc_row_tasks) > 0:
+                            IP_array[
+                                proc_row_tasks[0]:proc_row_tasks[-1] + 1,
+                                col_indices
+                            ] = self._compute_IP_block(row_vecs, col_vecs)
+                            if (
+                                (time() - self.prev_print_time) >
+                                self.print_interval):
+                                num_completed_IPs = np.sum(
+                                    np.abs(np.triu(IP_array)) > 0.)
+                                percent_completed_IPs = (
+                                    num_completed_IPs *
+                                    parallel.get_num_MPI_workers() /
+                                    total_num_IPs) * 100.
+                                self.print_msg(
+                                    'Completed %.1f%% of inner products' %
+                                    percent_completed_IPs,
+                                    output_channel='stderr')
+                                self.prev_print_time = time()
 
-        # Assign the triangular portion chunks into IP_array.
-        if parallel.is_distributed():
-            IP_array = parallel.custom_comm.allreduce(IP_array)
+                # Completed a chunk of rows and all columns on all processors.
+                # Finished row_vecs loop, delete memory used
+                del row_vecs
+                self._put_checkpoint(
+                    'symm_IP_array', signature, row_chunk_index + 1, IP_array)
+        finally:
+            prefetcher.close()
+
+        # Assign the chunks into IP_array.  Each proc filled in its rows of
+        # each set of chunks, from the start of the set to the last column.
+        proc_blocks = []
+        for start_row_index in range(0, num_row_vecs, num_rows_per_chunk):
+            end_row_index = min(
+                num_row_vecs, start_row_index + num_rows_per_chunk)
+            proc_row_tasks = parallel.find_assignments(list(range(
+                start_row_index, end_row_index)))[parallel.get_rank()]
+            if len(proc_row_tasks) > 0:
+                proc_blocks.append((
+                    slice(proc_row_tasks[0], proc_row_tasks[-1] + 1),
+                    slice(start_row_index, None)))
+        IP_array = parallel.allgather_array_blocks(IP_array, proc_blocks)
+        self._remove_checkpoint('symm_IP_array', signature)
+        return self._symmetrize_IP_array(IP_array)
 
+
+    def _symmetrize_IP_array(self, IP_array):
+        """Fills in the lower triangle of an inner product array from the
+        computed upper-triangular elements, and returns it."""
         # Create a mask for the repeated values.  Select values that are zero
         # in the upper triangular portion (not computed there) but nonzero in
         # the lower triangular portion (computed there).  For the case where
@@ -821,6 +1555,576 @@ class VectorSpaceHandles(object):
         return IP_array
 
 
+    def plan_symm_tiles(self, num_vecs, needed_blocks=None):
+        """Divides the upper triangle of a symmetric inner product array into
+        square tiles and assigns them to MPI workers (processors).
+
+        Args:
+            ``num_vecs``: Number of vectors (rows and columns).
+
+        Kwargs:
+            ``needed_blocks``: List of pairs of row and column slices of the
+            blocks in the upper triangle that are needed.  Only the tiles that
+            overlap them are computed.  By default, the whole upper triangle
+            is needed.
+
+        Returns:
+            ``plan``: Namedtuple with attributes ``tile_size`` (number of
+            vecs per block of rows or columns), ``proc_tiles`` (list of
+            ``(row_block, col_block)`` tiles computed by this processor, in
+            order), ``proc_block_loads`` (list of the blocks to retrieve
+            before computing each of those tiles), and ``num_gets_per_proc``
+            (maximum number of vecs retrieved by any processor).
+
+        Two blocks of vecs (plus ``prefetch_depth`` blocks, and one for the
+        copies made by a ``block_inner_product`` that stacks vecs) fit in
+        memory.
+        The tiles are ordered row by row, alternating the direction along the
+        rows, so that consecutive tiles share a block, and the diagonal tiles
+        only need one block.  This list is split into consecutive pieces with
+        equal numbers of inner products plus vecs retrieved.
+        """
+        tile_size = max(1, self.max_vecs_per_proc // (
+            2 + self.prefetch_depth + self._get_num_stack_buffers()))
+        num_blocks = int(np.ceil(num_vecs * 1. / tile_size))
+        block_sizes = [
+            min(num_vecs, (block + 1) * tile_size) - block * tile_size
+            for block in range(num_blocks)]
+        tiles = []
+        for row_block in range(num_blocks):
+            row_tiles = [
+                (row_block, col_block)
+                for col_block in range(row_block, num_blocks)]
+            if row_block % 2 == 1:
+                row_tiles.reverse()
+            tiles.extend(row_tiles)
+        if needed_blocks is not None:
+            tiles = [
+                (row_block, col_block) for row_block, col_block in tiles
+                if any(
+                    row_slice.start < (row_block + 1) * tile_size and
+                    row_slice.stop > row_block * tile_size and
+                    col_slice.start < (col_block + 1) * tile_size and
+                    col_slice.stop > col_block * tile_size
+                    for row_slice, col_slice in needed_blocks)]
+        tile_weights = [
+            block_sizes[row_block] * block_sizes[col_block] * (
+                0.5 if row_block == col_block else 1.) + block_sizes[col_block]
+            for row_block, col_block in tiles]
+        tile_assignments = parallel.find_assignments(
+            tiles, task_weights=tile_weights)
+
+        # Retrieve each block that is not in memory, after freeing the blocks
+        # that the tile does not use
+        num_gets_per_proc = 0
+        for rank, proc_tiles in enumerate(tile_assignments):
+            proc_block_loads = []
+            blocks_in_memory = []
+            for tile in proc_tiles:
+                blocks_in_memory = [
+                    block for block in blocks_in_memory if block in tile]
+                tile_loads = [
+                    block for block in sorted(set(tile))
+                    if block not in blocks_in_memory]
+                blocks_in_memory += tile_loads
+                proc_block_loads.append(tile_loads)
+            num_gets_per_proc = max(
+                num_gets_per_proc, sum(
+                    block_sizes[block] for tile_loads in proc_block_loads
+                    for block in tile_loads))
+            if rank == parallel.get_rank():
+                plan = SymmTilePlan(
+                    tile_size=tile_size, proc_tiles=proc_tiles,
+                    proc_block_loads=proc_block_loads,
+                    num_gets_per_proc=None)
+        plan = plan._replace(num_gets_per_proc=num_gets_per_proc)
+
+        self.print_msg((
+            'Tile plan: %d tiles of up to %d x %d vecs, %d gets per '
+            'processor') % (
+                len(tiles), tile_size, tile_size, plan.num_gets_per_proc))
+        return plan
+
+
+    def _compute_symm_inner_product_array_tiles(
+        self, vec_handles, needed_blocks=None):
+        """Computes the symmetric inner product array using the tiles from
+        :py:meth:`plan_symm_tiles`, only those that overlap ``needed_blocks``
+        if given."""
+        num_vecs = len(vec_handles)
+        plan = self.plan_symm_tiles(num_vecs, needed_blocks=needed_blocks)
+        tile_size = plan.tile_size
+
+        # Get the inner product type (real or complex)
+        test_vec = vec_handles[0].get()
+        IP_type = self._compute_IP_block([test_vec], [test_vec]).dtype
+        del test_vec
+
+        # Resume from a checkpoint, skipping the tiles this proc completed.
+        # The first remaining tile needs both of its blocks of vecs.
+        IP_array = np.zeros((num_vecs, num_vecs), dtype=IP_type)
+        signature = self._get_checkpoint_signature(
+            'symm_IP_array_tiles', [vec_handles], plan, [
+                (row_slice.start, row_slice.stop, col_slice.start,
+                col_slice.stop) for row_slice, col_slice in needed_blocks])
+        num_done, checkpoint_IP_array = self._get_checkpoint(
+            'symm_IP_array_tiles', signature, collective=False)
+        if checkpoint_IP_array is not None:
+            IP_array = checkpoint_IP_array
+        block_loads = list(plan.proc_block_loads)
+        if 0 < num_done < len(plan.proc_tiles):
+            block_loads[num_done] = sorted(set(plan.proc_tiles[num_done]))
+
+        handle_chunks = [
+            vec_handles[block * tile_size:(block + 1) * tile_size]
+            for tile_loads in block_loads[num_done:] for block in tile_loads]
+        prefetcher = self._prefetch(handle_chunks, tile_size)
+        block_vecs = {}
+        try:
+            for tile_index, (row_block, col_block) in enumerate(
+                plan.proc_tiles):
+                if tile_index < num_done:
+                    continue
+                for block in list(block_vecs.keys()):
+                    if block not in (row_block, col_block):
+                        del block_vecs[block]
+                for block in block_loads[tile_index]:
+                    block_vecs[block] = prefetcher.get_vecs()
+                row_slice = slice(
+                    row_block * tile_size, (row_block + 1) * tile_size)
+                col_slice = slice(
+                    col_block * tile_size, (col_block + 1) * tile_size)
+                IP_tile = self._compute_IP_block(
+                    block_vecs[row_block], block_vecs[col_block])
+                if row_block == col_block:
+                    IP_tile = np.triu(IP_tile)
+                IP_array[row_slice, col_slice] = IP_tile
+                if (time() - self.prev_print_time) > self.print_interval:
+                    self.print_msg(
+                        'Completed %.1f%% of inner product tiles' % (
+                            (tile_index + 1) * 100. / len(plan.proc_tiles)),
+                        output_channel='stderr')
+                    self.prev_print_time = time()
+                self._put_checkpoint(
+                    'symm_IP_array_tiles', signature, tile_index + 1, IP_array,
+                    collective=False)
+            del block_vecs
+        finally:
+            prefetcher.close()
+
+        proc_blocks = [
+            (slice(row_block * tile_size, (row_block + 1) * tile_size),
+            slice(col_block * tile_size, (col_block + 1) * tile_size))
+            for row_block, col_block in plan.proc_tiles]
+        IP_array = parallel.allgather_array_blocks(IP_array, proc_blocks)
+        self._remove_checkpoint('symm_IP_array_tiles', signature)
+        return self._symmetrize_IP_array(IP_array)
+
+
+    def _get_inner_product_key(self):
+        """Returns the string that identifies the inner product in the
+        cache."""
+        if self.inner_product_key is not None:
+            return self.inner_product_key
+        inner_product = self.inner_product
+        if inner_product is None:
+            inner_product = self.block_inner_product
+
+        # Functions are identified by their module and name.  Callable
+        # objects are identified by their type and weights (or grids), not by
+        # the rest of their state, which may change as they are used.
+        name = getattr(
+            inner_product, '__qualname__',
+            getattr(inner_product, '__name__', None))
+        if name is not None and not isinstance(
+            inner_product, types.MethodType) and '<' not in name:
+            definition = (getattr(inner_product, '__module__', None), name)
+        elif hasattr(inner_product, 'weights') or hasattr(
+            inner_product, 'grids'):
+            definition = (
+                type(inner_product).__module__, type(inner_product).__name__,
+                getattr(inner_product, 'weights', None),
+                getattr(inner_product, 'grids', None))
+        else:
+            raise ValueError(
+                'Cannot identify an inner product that is not a module-level '
+                'function and has no weights in the inner product cache; '
+                'give inner_product_key.')
+        try:
+            return hashlib.sha1(
+                pickle.dumps(definition, protocol=2)).hexdigest()
+        except (pickle.PicklingError, AttributeError, TypeError):
+            raise ValueError(
+                'Cannot pickle the inner product to identify it in the inner '
+                'product cache; give inner_product_key.')
+
+
+    def get_cached_inner_products(self):
+        """Loads the inner product cache from ``IP_cache_path``.
+
+        Returns:
+            ``keys``: 1D array of hashes of the vector handle cache keys (see
+            :py:meth:`vectors.VecHandle.cache_key`).
+
+            ``IP_array``: 2D array of cached inner products between the
+            vectors corresponding to ``keys``, with ``nan`` for inner products
+            that have not been computed.
+
+        The cache is stored as a ``.npz`` file together with the key of the
+        inner product it was computed with.  If the file does not exist or was
+        computed with a different inner product, the cache is empty.  Inner
+        products are assumed to be Hermitian, so each computed inner product
+        fills two elements of ``IP_array``.
+        """
+        IP_key = self._get_inner_product_key()
+        if os.path.exists(self.IP_cache_path):
+            with np.load(self.IP_cache_path) as cache_file:
+                if str(cache_file['inner_product_key']) == IP_key:
+                    return cache_file['keys'], cache_file['IP_array']
+        return np.array([], dtype=str), np.zeros((0, 0))
+
+
+    def _put_cached_inner_products(self, keys, IP_array):
+        """Writes the inner product cache to ``IP_cache_path``, through a
+        temporary file so the cache is never partially written."""
+        cache_dir = os.path.dirname(os.path.abspath(self.IP_cache_path))
+        file_desc, tmp_path = util.make_temp_file(
+            suffix='.npz', dir=cache_dir)
+        try:
+            with os.fdopen(file_desc, 'wb') as file_obj:
+                np.savez(
+                    file_obj, inner_product_key=self._get_inner_product_key(),
+                    keys=keys, IP_array=IP_array)
+            getattr(os, 'replace', os.rename)(tmp_path, self.IP_cache_path)
+        except:
+            os.remove(tmp_path)
+            raise
+
+
+    def _compute_IP_array_with_cache(
+        self, row_vec_handles, col_vec_handles=None):
+        """Computes an inner product array, reusing inner products in the
+        cache and adding the new ones to it.  If ``col_vec_handles`` is None,
+        the array is symmetric."""
+        is_symm = col_vec_handles is None
+        if is_symm:
+            col_vec_handles = row_vec_handles
+
+        # Identify the vectors on rank zero, so all MPI workers agree
+        def get_keys(vec_handles):
+            keys = []
+            for vec_handle in vec_handles:
+                key = getattr(vec_handle, 'cache_key', lambda: None)()
+                if key is None:
+                    return None
+                keys.append(hashlib.sha1(key.encode()).hexdigest())
+            return keys
+        row_keys, col_keys = parallel.call_and_bcast(
+            lambda: (get_keys(row_vec_handles), get_keys(col_vec_handles)))
+        if row_keys is None or col_keys is None:
+            self.print_msg(
+                'Warning: Not all vec handles have cache keys, so the inner '
+                'product cache is not used.')
+            if is_symm:
+                return self._compute_symm_inner_product_array(row_vec_handles)
+            return self._compute_inner_product_array(
+                row_vec_handles, col_vec_handles)
+
+        # Fill in the cached inner products
+        cache_keys, cache_array = parallel.call_and_bcast(
+            self.get_cached_inner_products)
+        cache_indices = dict(zip(cache_keys, range(len(cache_keys))))
+        row_indices = np.array([cache_indices.get(k, -1) for k in row_keys])
+        col_indices = np.array([cache_indices.get(k, -1) for k in col_keys])
+        IP_array = np.full(
+            (len(row_keys), len(col_keys)), np.nan,
+            dtype=np.result_type(cache_array, float))
+        IP_array[np.ix_(row_indices >= 0, col_indices >= 0)] = cache_array[
+            np.ix_(row_indices[row_indices >= 0],
+                col_indices[col_indices >= 0])]
+
+        # Compute the missing inner products, as whole rows or columns,
+        # whichever needs fewer inner products.  For a symmetric array, the
+        # rows are those of vectors that are not in the cache (or whose inner
+        # products with the others are incomplete).
+        is_missing = np.isnan(IP_array)
+        if is_symm:
+            is_new = row_indices < 0
+            is_new[~is_new] = is_missing[np.ix_(~is_new, ~is_new)].any(axis=1)
+            missing_rows = np.where(is_new)[0]
+        else:
+            missing_rows = np.where(is_missing.any(axis=1))[0]
+        missing_cols = np.where(is_missing.any(axis=0))[0]
+        num_rows, num_cols = IP_array.shape
+        if not is_missing.any():
+            self.print_msg(
+                'Reused all %d inner products from the cache' % IP_array.size,
+                output_channel='stderr')
+            return IP_array
+        if is_symm and missing_rows.size > num_rows // 2:
+            IP_array = self._compute_symm_inner_product_array(
+                row_vec_handles)
+        elif is_symm or (
+            missing_rows.size * num_cols <= num_rows * missing_cols.size):
+            new_rows = self._compute_inner_product_array(
+                [row_vec_handles[i] for i in missing_rows], col_vec_handles)
+            IP_array = IP_array.astype(np.result_type(IP_array, new_rows))
+            IP_array[missing_rows] = new_rows
+            if is_symm:
+                IP_array[:, missing_rows] = new_rows.conj().T
+        else:
+            new_cols = self._compute_inner_product_array(
+                row_vec_handles, [col_vec_handles[i] for i in missing_cols])
+            IP_array = IP_array.astype(np.result_type(IP_array, new_cols))
+            IP_array[:, missing_cols] = new_cols
+
+        # Add the new inner products to the cache
+        if parallel.is_rank_zero():
+            new_keys = [
+                k for k in dict.fromkeys(row_keys + col_keys)
+                if k not in cache_indices]
+            all_keys = np.array(list(cache_keys) + new_keys)
+            all_indices = dict(zip(all_keys, range(len(all_keys))))
+            new_cache_array = np.full(
+                (len(all_keys), len(all_keys)), np.nan,
+                dtype=np.result_type(cache_array, IP_array))
+            new_cache_array[:len(cache_keys), :len(cache_keys)] = cache_array
+            row_indices = [all_indices[k] for k in row_keys]
+            col_indices = [all_indices[k] for k in col_keys]
+            new_cache_array[np.ix_(col_indices, row_indices)] =\
+                IP_array.conj().T
+            new_cache_array[np.ix_(row_indices, col_indices)] = IP_array
+            self._put_cached_inner_products(all_keys, new_cache_array)
+        parallel.barrier()
+        return IP_array
+
+
+    def _get_checkpoint_signature(self, name, vec_handles_lists, *args):
+        """Returns a string identifying a computation, so that a checkpoint
+        is only used to resume the same computation, or None if checkpoints
+        are not used.  Checkpoints are not used if not all vec handles have
+        cache keys, since the vectors could then differ from those of the
+        checkpoint."""
+        if self.checkpoint_dir is None:
+            return None
+        handle_keys = [
+            [getattr(handle, 'cache_key', lambda: None)()
+            for handle in vec_handles]
+            for vec_handles in vec_handles_lists]
+        if any(key is None for keys in handle_keys for key in keys):
+            self.print_msg(
+                'Warning: Not all vec handles have cache keys, so no '
+                'checkpoints are used.')
+            return None
+        return hashlib.sha1(pickle.dumps(
+            (name, parallel.get_num_procs(), handle_keys) + args,
+            protocol=2)).hexdigest()
+
+
+    def _get_checkpoint_path(self, name):
+        """Returns the path of this processor's checkpoint file."""
+        return os.path.join(
+            self.checkpoint_dir,
+            '%s_rank%d.pkl' % (name, parallel.get_world_rank()))
+
+
+    def _find_checkpoint_signature(self, name, signatures):
+        """Returns the key of the signature in the dictionary ``signatures``
+        that matches a checkpoint of any processor, or None if there is none.
+        All processors must call this together."""
+        if self.checkpoint_dir is None:
+            return None
+        checkpoint_signature = None
+        checkpoint_path = self._get_checkpoint_path(name)
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, 'rb') as checkpoint_file:
+                checkpoint_signature = pickle.load(checkpoint_file)[
+                    'signature']
+        for key in sorted(signatures):
+            is_match = int(
+                signatures[key] is not None and
+                checkpoint_signature == signatures[key])
+            if -parallel.allreduce_min(-is_match) > 0:
+                return key
+        return None
+
+
+    def _get_checkpoint(self, name, signature, collective=True):
+        """Returns the number of completed steps and the state saved in the
+        checkpoint of a computation, or 0 and None if there is none.
+
+        If ``collective``, all processors must call this together, and the
+        number of steps is the minimum over all processors.  The state of a
+        processor can then be further along."""
+        self.prev_checkpoint_time = time()
+        if self.checkpoint_dir is None or signature is None:
+            return 0, None
+        num_done, state = 0, None
+        checkpoint_path = self._get_checkpoint_path(name)
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, 'rb') as checkpoint_file:
+                checkpoint = pickle.load(checkpoint_file)
+            if checkpoint['signature'] == signature:
+                num_done = checkpoint['num_done']
+                state = checkpoint['state']
+        if collective:
+            num_done = parallel.allreduce_min(num_done)
+        if num_done > 0:
+            self.print_msg(
+                'Resuming from checkpoint after %d completed steps' % num_done)
+        return num_done, state
+
+
+    def _put_checkpoint(
+        self, name, signature, num_done, state, collective=True):
+        """Saves the number of completed steps and the state of a computation
+        if ``checkpoint_interval`` has passed since the last checkpoint.
+
+        If ``collective``, all processors must call this together, and they
+        all save a checkpoint or none does."""
+        if self.checkpoint_dir is None or signature is None:
+            return
+        is_due = (
+            (time() - self.prev_checkpoint_time) >= self.checkpoint_interval)
+        if collective:
+            is_due = parallel.bcast(is_due)
+        if not is_due:
+            return
+        if not os.path.isdir(self.checkpoint_dir):
+            try:
+                os.makedirs(self.checkpoint_dir)
+            except OSError:
+                if not os.path.isdir(self.checkpoint_dir):
+                    raise
+
+        # Write through a temporary file so a checkpoint is never partially
+        # written
+        file_desc, tmp_path = util.make_temp_file(
+            suffix='.pkl', dir=self.checkpoint_dir)
+        try:
+            with os.fdopen(file_desc, 'wb') as checkpoint_file:
+                pickle.dump(
+                    {'signature': signature, 'num_done': num_done,
+                    'state': state},
+                    checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+            getattr(os, 'replace', os.rename)(
+                tmp_path, self._get_checkpoint_path(name))
+        except:
+            os.remove(tmp_path)
+            raise
+        self.prev_checkpoint_time = time()
+
+
+    def _remove_checkpoint(self, name, signature):
+        """Removes this processor's checkpoint of a completed computation."""
+        if self.checkpoint_dir is None or signature is None:
+            return
+        checkpoint_path = self._get_checkpoint_path(name)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+
+    def extend_inner_product_array(
+        self, IP_array, row_vec_handles, col_vec_handles,
+        new_row_vec_handles=None, new_col_vec_handles=None):
+        """Appends rows and columns for new vector objects to an existing
+        inner product array, computing only the new inner products.
+
+        Args:
+            ``IP_array``: 2D array of inner products of the vector objects in
+            ``row_vec_handles`` and ``col_vec_handles``.
+
+            ``row_vec_handles``: List of handles for vector objects
+            corresponding to rows of ``IP_array``.
+
+            ``col_vec_handles``: List of handles for vector objects
+            corresponding to columns of ``IP_array``.
+
+        Kwargs:
+            ``new_row_vec_handles``: List of handles for vector objects
+            corresponding to new rows.
+
+            ``new_col_vec_handles``: List of handles for vector objects
+            corresponding to new columns.
+
+        Returns:
+            ``IP_array``: 2D array of inner products of the old and new row
+            vector objects with the old and new column vector objects.
+
+        The existing block is not recomputed.  Appending :math:`k` rows and
+        :math:`k` columns to an :math:`n \\times n` array thus costs
+        :math:`O(nk)` inner products rather than :math:`O(n^2)`.
+        """
+        row_vec_handles = list(util.make_iterable(row_vec_handles))
+        col_vec_handles = list(util.make_iterable(col_vec_handles))
+        new_row_vec_handles = list(util.make_iterable(
+            new_row_vec_handles if new_row_vec_handles is not None else []))
+        new_col_vec_handles = list(util.make_iterable(
+            new_col_vec_handles if new_col_vec_handles is not None else []))
+        if IP_array.shape != (len(row_vec_handles), len(col_vec_handles)):
+            raise ValueError(
+                'Shape of IP_array does not match the number of vec handles.')
+
+        # New columns for the old rows
+        if len(new_col_vec_handles) > 0:
+            IP_array = np.hstack((
+                IP_array,
+                self.compute_inner_product_array(
+                    row_vec_handles, new_col_vec_handles)))
+
+        # New rows for all of the columns, old and new
+        if len(new_row_vec_handles) > 0:
+            IP_array = np.vstack((
+                IP_array,
+                self.compute_inner_product_array(
+                    new_row_vec_handles,
+                    col_vec_handles + new_col_vec_handles)))
+        return IP_array
+
+
+    def extend_symm_inner_product_array(
+        self, IP_array, vec_handles, new_vec_handles):
+        """Appends rows and columns for new vector objects to an existing
+        symmetric inner product array, computing only the new inner products.
+
+        Args:
+            ``IP_array``: 2D symmetric array of inner products of the vector
+            objects in ``vec_handles`` with each other.
+
+            ``vec_handles``: List of handles for vector objects corresponding
+            to both rows and columns of ``IP_array``.
+
+            ``new_vec_handles``: List of handles for vector objects to append.
+
+        Returns:
+            ``IP_array``: 2D symmetric array of inner products of the old and
+            new vector objects with each other.
+
+        Only the new rows are computed, as a single rectangular inner product
+        array of the new vector objects with all of the vector objects.  The
+        new columns are filled in by symmetry.
+        """
+        vec_handles = list(util.make_iterable(vec_handles))
+        new_vec_handles = list(util.make_iterable(new_vec_handles))
+        num_vecs = len(vec_handles)
+        if IP_array.shape != (num_vecs, num_vecs):
+            raise ValueError(
+                'Shape of IP_array does not match the number of vec handles.')
+        if len(new_vec_handles) == 0:
+            return IP_array
+
+        new_rows = self.compute_inner_product_array(
+            new_vec_handles, vec_handles + new_vec_handles)
+
+        # Keep the upper triangle of the new diagonal block, as is done for
+        # full symmetric inner product arrays.
+        new_block = new_rows[:, num_vecs:]
+        new_block = np.triu(new_block) + np.triu(new_block, 1).conj().T
+        return np.vstack((
+            np.hstack((IP_array, new_rows[:, :num_vecs].conj().T)),
+            np.hstack((new_rows[:, :num_vecs], new_block))))
+
+
     def lin_combine(
         self, sum_vec_handles, basis_vec_handles, coeff_array,
         coeff_array_col_indices=None):
@@ -844,14 +2148,19 @@ class VectorSpaceHandles(object):
             array are computed.  If no column indices are specified, then all
             columns will be used.
 
-        Each MPI worker (processor) retrieves a subset of the basis vectors to
-        compute as many outputs as an MPI worker (processor) can have in memory
-        at once. Each MPI worker (processor) computes the "layers" from the
-        basis it is responsible for, and for as many modes as it can fit in
-        memory. The layers from all MPI workers (processors) are summed
-        together to form the ``sum_vecs`` and ``put`` is called on each.
+        Each MPI worker (processor) computes a subset of the ``sum_vecs``, as
+        many at once as it can have in memory, and calls ``put`` on each.
+        With the ``'ring'`` schedule (see ``lin_combine_schedule``), each MPI
+        worker (processor) retrieves a subset of the basis vectors, which are
+        passed around the other MPI workers (processors) to add their
+        "layers" to the sums.  With the ``'stream'`` schedule, each MPI worker
+        (processor) retrieves the basis vectors with nonzero coefficients for
+        its own sums, and nothing is passed.
+        When the basis vectors are numpy arrays, each chunk of them is stacked
+        into a 2D array and multiplied by the coefficients at once, adding to
+        a preallocated array of sums.
 
-        Scaling is:
+        Scaling of the ``'ring'`` schedule is:
 
           num gets/worker = :math:`n_s/(n_p*(max-2)) * n_b/n_p`
 
@@ -863,9 +2172,13 @@ class VectorSpaceHandles(object):
         number of basis vecs,
         :math:`n_p` is number of processors,
         :math:`max` = ``max_vecs_per_node``.
+        The ``'stream'`` schedule has :math:`n_s/(n_p*(max-1)) * n_b` gets and
+        no passes per worker.
         """
         sum_vec_handles = util.make_iterable(sum_vec_handles)
         basis_vec_handles = util.make_iterable(basis_vec_handles)
+        if self.max_vecs_per_proc is None:
+            self.set_max_vecs_from_memory(basis_vec_handles[0])
         num_bases = len(basis_vec_handles)
         num_sums = len(sum_vec_handles)
 
@@ -916,43 +2229,111 @@ class VectorSpaceHandles(object):
         start_time = time()
         test_vec_3 = test_vec + 2.*test_vec
         add_scale_time = time() - start_time
-        del test_vec, test_vec_3
-
-        # Estimate time for all linear combinations
-        vecs_per_worker = (
-            self.max_vecs_per_node * parallel.get_num_nodes() /
-            parallel.get_num_MPI_workers())
-        num_gets = (
-            num_sums /
-            (parallel.get_num_MPI_workers()* (vecs_per_worker - 2)) +
-            num_bases / parallel.get_num_MPI_workers())
-        num_add_scales = num_sums * num_bases / parallel.get_num_MPI_workers()
-        self.print_msg(
-            'Linear combinations will take at least %.1f minutes' %
-            (num_gets * get_time / 60. + num_add_scales * add_scale_time / 60.))
+        del test_vec_3
 
         # Convenience variable
         rank = parallel.get_rank()
 
-        # num_bases_per_proc_chunk is the num of bases each proc gets at once.
-        num_bases_per_proc_chunk = 1
-        num_sums_per_proc_chunk = (
-            self.max_vecs_per_proc - num_bases_per_proc_chunk)
-
-        # Divide up tasks
+        # Numpy arrays are combined with one matrix multiplication, for which
+        # a chunk of basis vecs is stacked into a block, i.e., copied.  If
+        # there is no room for this copy, they are added one at a time.
+        stack_arrays = (
+            isinstance(test_vec, np.ndarray) and
+            not test_vec.dtype.hasobject and
+            self.max_vecs_per_proc >= 2 + self._get_num_col_buffers())
+        num_stack_buffers = 1 if stack_arrays else 0
+
+        # Divide up tasks.  With the stream schedule, each proc only needs the
+        # basis vecs with nonzero coefficients for its sums (at least one, so
+        # that sums with zero coefficients are formed).
         basis_tasks = parallel.find_assignments(list(range(num_bases)))
         sum_tasks = parallel.find_assignments(list(range(num_sums)))
+        needed_basis_tasks = []
+        for proc_sum_tasks in sum_tasks:
+            needed_basis_indices = [
+                int(basis_index) for basis_index in np.nonzero(np.any(
+                    coeff_array[:, proc_sum_tasks] != 0, axis=1))[0]]
+            if len(proc_sum_tasks) > 0 and len(needed_basis_indices) == 0:
+                needed_basis_indices = [0]
+            needed_basis_tasks.append(needed_basis_indices)
+        max_num_sum_tasks = max(len(tasks) for tasks in sum_tasks)
+
+        # Split the memory between sums (which stay in memory) and bases
+        # (which are passed between processors or, with the stream schedule,
+        # retrieved by each processor).  The number of gets is only that of
+        # the basis vecs.
+        schedule = self.lin_combine_schedule
+        if schedule == 'auto':
+            ring_plan = self.plan_chunks(
+                num_sums, num_bases, num_extra_col_buffers=num_stack_buffers,
+                print_plan=False)
+            stream_plan = self.plan_chunks(
+                num_sums, max(len(tasks) for tasks in needed_basis_tasks),
+                pass_cols=False, num_extra_col_buffers=num_stack_buffers,
+                print_plan=False)
+
+            # Time passing a vec to the next processor, once per vec space
+            # and only if the ring schedule passes vecs at all
+            num_procs = parallel.get_num_procs()
+            if ring_plan.num_passes_per_proc > 0 and self.pass_time is None:
+                start_time = time()
+                for vecs, indices in self._pass_vecs_around_ring(
+                    [test_vec], [0]):
+                    pass
+                self.pass_time = parallel.bcast(
+                    (time() - start_time) / max(num_procs - 1, 1))
+
+            # Estimate times for the gets and passes of each schedule
+            ring_time = (
+                ring_plan.num_gets_per_proc - max_num_sum_tasks) * get_time
+            if ring_plan.num_passes_per_proc > 0:
+                ring_time += (
+                    ring_plan.num_row_get_loops * (num_procs - 1) *
+                    max(len(tasks) for tasks in basis_tasks) * self.pass_time)
+            stream_time = (
+                stream_plan.num_gets_per_proc - max_num_sum_tasks) * get_time
+            schedule = parallel.bcast(
+                'stream' if stream_time <= ring_time else 'ring')
+
+            # Resume with the schedule of an existing checkpoint, even if the
+            # timings now favor the other one
+            checkpoint_schedule = self._find_checkpoint_signature(
+                'lin_combine', {
+                    'ring': self._get_checkpoint_signature(
+                        'lin_combine', [basis_vec_handles], coeff_array,
+                        ring_plan, 'ring'),
+                    'stream': self._get_checkpoint_signature(
+                        'lin_combine', [basis_vec_handles], coeff_array,
+                        stream_plan, 'stream')})
+            if checkpoint_schedule is not None:
+                schedule = checkpoint_schedule
+            self.print_msg(
+                'Linear combinations use the %s schedule' % schedule)
+            if schedule == 'stream':
+                plan = stream_plan
+            else:
+                plan = ring_plan
+            self._print_chunk_plan(plan)
+        elif schedule == 'stream':
+            plan = self.plan_chunks(
+                num_sums, max(len(tasks) for tasks in needed_basis_tasks),
+                pass_cols=False, num_extra_col_buffers=num_stack_buffers)
+        else:
+            plan = self.plan_chunks(
+                num_sums, num_bases, num_extra_col_buffers=num_stack_buffers)
+        del test_vec
+        num_sums_per_proc_chunk = plan.num_rows_per_proc_chunk
+        num_bases_per_proc_chunk = plan.num_cols_per_proc_chunk
+        num_sum_put_iters = plan.num_row_get_loops
+        num_basis_get_iters = plan.num_col_get_loops
 
-        # Find max number tasks among all processors
-        max_num_basis_tasks = max([len(tasks) for tasks in basis_tasks])
-        max_num_sum_tasks = max([len(tasks) for tasks in sum_tasks])
+        # Estimate time for all linear combinations
+        num_gets = plan.num_gets_per_proc - max_num_sum_tasks
+        num_add_scales = num_sums * num_bases / parallel.get_num_MPI_workers()
+        self.print_msg(
+            'Linear combinations will take at least %.1f minutes' %
+            (num_gets * get_time / 60. + num_add_scales * add_scale_time / 60.))
 
-        # These variables are the number of iters through loops that get and put
-        # basis and sum vecs.
-        num_basis_get_iters = int(np.ceil(
-            max_num_basis_tasks*1./num_bases_per_proc_chunk))
-        num_sum_put_iters = int(np.ceil(
-            max_num_sum_tasks*1./num_sums_per_proc_chunk))
         if num_sum_put_iters > 1:
             self.print_msg((
                 'Warning: The basis vecs, of which there are %d, will be '
@@ -960,110 +2341,163 @@ class VectorSpaceHandles(object):
                 'nodes or max_vecs_per_node to reduce redundant retrieves and '
                 'get a big speedup.') % (num_bases, num_sum_put_iters))
 
-        for sum_put_index in range(num_sum_put_iters):
-            if len(sum_tasks[rank]) > 0:
-                start_sum_index = min(
-                    sum_tasks[rank][0] + (
-                        sum_put_index * num_sums_per_proc_chunk),
-                    sum_tasks[rank][-1] + 1)
-                end_sum_index = min(
-                    start_sum_index + num_sums_per_proc_chunk,
-                    sum_tasks[rank][-1] + 1)
-
-                # Create empty list on each processor
-                sum_layers = [None] * (end_sum_index - start_sum_index)
-            else:
-                start_sum_index = 0
-                end_sum_index = 0
-                sum_layers = []
-
-            for basis_get_index in range(num_basis_get_iters):
-                if len(basis_tasks[rank]) > 0:
-                    start_basis_index = min(
-                        basis_tasks[rank][0] +(
-                            basis_get_index*num_bases_per_proc_chunk),
-                        basis_tasks[rank][-1] + 1)
-                    end_basis_index = min(
-                        start_basis_index + num_bases_per_proc_chunk,
-                        basis_tasks[rank][-1] + 1)
-                    basis_indices = list(range(
-                        start_basis_index, end_basis_index))
+        # Each proc retrieves all of its chunks of bases for each of its chunks
+        # of sums, possibly ahead of time.  With the stream schedule, procs
+        # without sums retrieve nothing.
+        sum_chunk_ranges = _get_proc_chunk_ranges(
+            sum_tasks[rank], num_sums_per_proc_chunk, num_sum_put_iters)
+        if schedule == 'stream':
+            sum_chunk_ranges = [
+                (start_sum_index, end_sum_index)
+                for start_sum_index, end_sum_index in sum_chunk_ranges
+                if end_sum_index > start_sum_index]
+            basis_index_chunks = [
+                needed_basis_tasks[rank][
+                    start_index:start_index + num_bases_per_proc_chunk]
+                for start_index in range(
+                    0, len(needed_basis_tasks[rank]),
+                    num_bases_per_proc_chunk)]
+        else:
+            basis_index_chunks = [
+                list(range(start_basis_index, end_basis_index))
+                for start_basis_index, end_basis_index in (
+                    _get_proc_chunk_ranges(
+                        basis_tasks[rank], num_bases_per_proc_chunk,
+                        num_basis_get_iters))]
+        num_basis_chunks = len(basis_index_chunks)
+
+        # Resume from a checkpoint.  A step is a chunk of bases used for a
+        # chunk of sums, and the state is the partial sums of the chunk of
+        # sums.  Earlier chunks of sums have already been put.  The partial
+        # sums are only used if all procs saved them at the same step.
+        signature = self._get_checkpoint_signature(
+            'lin_combine', [basis_vec_handles], coeff_array, plan, schedule)
+        num_done, checkpoint_sums = self._get_checkpoint(
+            'lin_combine', signature, collective=False)
+        if (
+            self.checkpoint_dir is not None and parallel.is_distributed() and
+            schedule == 'ring'):
+            min_num_done = parallel.allreduce_min(num_done)
+            if -parallel.allreduce_min(-num_done) != min_num_done:
+                num_done = min_num_done - min_num_done % num_basis_chunks
+                checkpoint_sums = None
+        start_sum_chunk_index, start_basis_chunk_index = divmod(
+            num_done, max(num_basis_chunks, 1))
+
+        handle_chunks = [
+            [basis_vec_handles[basis_index] for basis_index in basis_indices]
+            for sum_chunk_range in sum_chunk_ranges
+            for basis_indices in basis_index_chunks
+        ][num_done:]
+        prefetcher = self._prefetch(
+            handle_chunks, num_bases_per_proc_chunk,
+            get_vecs=lambda handles: self._get_vecs(handles, stack=False))
+        try:
+            for sum_chunk_index, (start_sum_index, end_sum_index) in (
+                enumerate(sum_chunk_ranges)):
+                if sum_chunk_index < start_sum_chunk_index:
+                    continue
+                # Sums of numpy arrays are the columns of sum_block, with
+                # shape sum_shape.  Sums of other vecs are in sum_layers.
+                if (
+                    sum_chunk_index == start_sum_chunk_index and
+                    start_basis_chunk_index > 0):
+                    sum_layers, sum_block, sum_shape = checkpoint_sums
                 else:
-                    basis_indices = []
-
-                # Pass the basis vecs to proc with rank -> mod(rank+1,num_procs)
-                # Must do this for each processor, until data makes a circle
-                basis_vecs_recv = (None, None)
-                for pass_index in range(parallel.get_num_procs()):
-                    # If on the first pass, retrieve the basis vecs,
-                    # no send/recv.
-                    # This is all that is called when in serial,
-                    # loop iterates once.
-                    if pass_index == 0:
-                        if len(basis_indices) > 0:
-                            basis_vecs = [
-                                basis_handle.get() for basis_handle in
-                                basis_vec_handles[
-                                    basis_indices[0]:basis_indices[-1] + 1]]
-                        else:
-                            basis_vecs = []
+                    # Create empty list on each processor
+                    sum_layers = [None] * (end_sum_index - start_sum_index)
+                    sum_block = None
+                    sum_shape = None
+
+                for basis_chunk_index, basis_index_chunk in enumerate(
+                    basis_index_chunks):
+                    if (
+                        sum_chunk_index == start_sum_chunk_index and
+                        basis_chunk_index < start_basis_chunk_index):
+                        continue
+                    # Pass the basis vecs around the ring of processors, until
+                    # each processor has used the basis vecs of all others.  In
+                    # serial, or with the stream schedule, the loop iterates
+                    # once.
+                    if schedule == 'stream':
+                        basis_chunks = [
+                            (prefetcher.get_vecs(), basis_index_chunk)]
                     else:
-                        # Figure out with whom to communicate
-                        source = (
-                            parallel.get_rank() - 1) % parallel.get_num_procs()
-                        dest = (
-                            parallel.get_rank() + 1) % parallel.get_num_procs()
-
-                        #Create unique tags based on ranks
-                        send_tag = (
-                            parallel.get_rank() *
-                            (parallel.get_num_procs() + 1) + dest)
-                        recv_tag = source * (
-                            parallel.get_num_procs() + 1) + parallel.get_rank()
-
-                        # Send/receive data
-                        basis_vecs_send = (basis_vecs, basis_indices)
-                        request = parallel.comm.isend(
-                            basis_vecs_send, dest=dest, tag=send_tag)
-                        basis_vecs_recv = parallel.comm.recv(
-                            source=source, tag=recv_tag)
-                        request.Wait()
-                        parallel.barrier()
-                        basis_indices = basis_vecs_recv[1]
-                        basis_vecs = basis_vecs_recv[0]
-
-                    # Compute the scalar multiplications for this set of data.
-                    # basis_indices stores the indices of the coeff_array to
-                    # use.
-                    for sum_index in range(start_sum_index, end_sum_index):
-                        for basis_index, basis_vec in enumerate(basis_vecs):
-                            sum_layer = basis_vec * coeff_array[
-                                    basis_indices[basis_index], sum_index]
-                            if sum_layers[sum_index - start_sum_index] is None:
-                                sum_layers[
-                                    sum_index-start_sum_index] = sum_layer
-                            else:
-                                sum_layers[
-                                    sum_index - start_sum_index] += sum_layer
+                        basis_chunks = self._pass_vecs_around_ring(
+                            prefetcher.get_vecs(), basis_index_chunk)
+                    for basis_vecs, basis_indices in basis_chunks:
+                        # Compute the scalar multiplications for this set of
+                        # data.  basis_indices stores the indices of the
+                        # coeff_array to use.  Numpy arrays are combined with
+                        # one matrix multiplication.
                         if (
-                            (time() - self.prev_print_time) >
-                            self.print_interval):
-                            self.print_msg(
-                                'Completed %.1f%% of linear combinations' %
-                                (sum_index * 100. / len(sum_tasks[rank])),
-                                output_channel='stderr')
-                            self.prev_print_time = time()
-
-            # Completed this set of sum vecs, puts them to memory or file
-            for sum_index in range(start_sum_index, end_sum_index):
-                sum_vec_handles[sum_index].put(
-                    sum_layers[sum_index - start_sum_index])
-            del sum_layers
+                            stack_arrays and len(basis_vecs) > 0 and
+                            end_sum_index > start_sum_index):
+                            new_sum_block = _add_array_sums(
+                                sum_block, basis_vecs, coeff_array[np.ix_(
+                                    basis_indices,
+                                    list(range(start_sum_index, end_sum_index))
+                                )])
+                            if new_sum_block is not None:
+                                sum_block = new_sum_block
+                                sum_shape = basis_vecs[0].shape
+                                basis_vecs = []
+                        for sum_index in range(start_sum_index, end_sum_index):
+                            for basis_index, basis_vec in enumerate(
+                                basis_vecs):
+                                # Add to the sums in place (via axpy or +=)
+                                # when the vector objects support it
+                                coeff = coeff_array[
+                                    basis_indices[basis_index], sum_index]
+                                layer_index = sum_index - start_sum_index
+                                if sum_layers[layer_index] is None:
+                                    sum_layers[layer_index] = basis_vec * coeff
+                                else:
+                                    sum_layers[layer_index] = add_scaled(
+                                        sum_layers[layer_index], coeff,
+                                        basis_vec)
+                            if (
+                                (time() - self.prev_print_time) >
+                                self.print_interval):
+                                self.print_msg(
+                                    'Completed %.1f%% of linear combinations' %
+                                    (sum_index * 100. / len(sum_tasks[rank])),
+                                    output_channel='stderr')
+                                self.prev_print_time = time()
+                    if basis_chunk_index + 1 < num_basis_chunks:
+                        self._put_checkpoint(
+                            'lin_combine', signature,
+                            sum_chunk_index * num_basis_chunks +
+                            basis_chunk_index + 1,
+                            (sum_layers, sum_block, sum_shape),
+                            collective=(schedule == 'ring'))
+
+                # Completed this set of sum vecs, puts them to memory or file.
+                # Sums from sum_block are copied, so that they do not keep the
+                # whole block in memory.
+                for sum_index in range(start_sum_index, end_sum_index):
+                    sum_vec = sum_layers[sum_index - start_sum_index]
+                    if sum_block is not None:
+                        block_sum_vec = sum_block[
+                            :, sum_index - start_sum_index].reshape(sum_shape)
+                        if sum_vec is None:
+                            sum_vec = block_sum_vec.copy()
+                        else:
+                            sum_vec = sum_vec + block_sum_vec
+                    sum_vec_handles[sum_index].put(sum_vec)
+                del sum_layers, sum_block
+                self._put_checkpoint(
+                    'lin_combine', signature,
+                    (sum_chunk_index + 1) * num_basis_chunks, None,
+                    collective=(schedule == 'ring'))
+        finally:
+            prefetcher.close()
 
         self.print_msg(
             'Completed 100% of linear combinations', output_channel='stderr')
         self.prev_print_time = time()
         parallel.barrier()
+        self._remove_checkpoint('lin_combine', signature)
 
 
     def __eq__(self, other):